@@ -30,6 +30,7 @@ except ImportError as e:
 logger.info("Attempting to import routes.padel_iq")
 try:
     from routes.padel_iq import padel_iq_bp
+    from routes.padel_iq.responses import PadelJSONProvider
     logger.info("Successfully imported routes.padel_iq")
 except ImportError as e:
     logger.error(f"Error importing routes.padel_iq: {e}")
@@ -56,6 +57,8 @@ except ImportError as e:
 # Configurar la aplicación Flask
 logger.info("Starting Flask application")
 app = Flask(__name__)
+# JSON con escalares y arrays de NumPy nativos (orjson si está instalado)
+app.json = PadelJSONProvider(app)
 
 # Registrar blueprints
 app.register_blueprint(padel_iq_bp)
@@ -1,7 +1,12 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from firebase_admin import firestore
 import logging
 from .analysis_manager import AnalysisManager
+from .utils import calcular_metricas_padel_iq
+from .live_stream import LiveAnalysisSession, LiveSessionRegistry, is_valid_source, sse_events
+from .checkpoints import checkpoint_id, get_checkpoint, list_checkpoints
+from .rating import rating_summary, update_user_rating
+from .responses import ResultStore, compress_response, parse_page_args, shape_response
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -9,75 +14,76 @@ logger = logging.getLogger(__name__)
 db = firestore.client()
 
 analysis_manager = AnalysisManager()
+live_sessions = LiveSessionRegistry()
+result_store = ResultStore()
 
 padel_iq_bp = Blueprint('padel_iq', __name__)
+# Respuestas JSON comprimidas con brotli o gzip si el cliente las acepta
+padel_iq_bp.after_request(compress_response)
 
 @padel_iq_bp.route('/api/calculate_padel_iq', methods=['POST'])
 def calculate_padel_iq():
     """Procesa un video y calcula métricas de Padel IQ."""
-    data = request.get_json()
+    return _calculate_padel_iq(request.get_json())
+
+def _calculate_padel_iq(data):
     user_id = data.get('user_id')
     video_url = data.get('video_url')
     tipo_video = data.get('tipo_video')
     player_position = data.get('player_position', {'side': 'left', 'zone': 'back'})
     game_splits = data.get('game_splits', None)
+    diagnostics_enabled = data.get('diagnostics', False)
+    resume = data.get('resume', True)
+    camera_id = data.get('camera_id')
+    court_polygon = data.get('court_polygon')
 
     if not user_id or not video_url or not tipo_video:
         logger.error("Faltan datos requeridos en la solicitud")
         return jsonify({'error': 'Faltan datos requeridos (user_id, video_url, tipo_video)'}), 400
+    try:
+        # summary / strokes / full (por defecto, la respuesta completa de siempre)
+        response_mode, offset, limit = parse_page_args(data.get('response_mode') or request.args.get('mode'),
+                                                       limit=data.get('limit') or request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     logger.info(f"Procesando video para user_id: {user_id}, video_url: {video_url}, tipo_video: {tipo_video}")
 
+    # Solo el análisis de juego escribe diagnósticos por track
+    diagnostics_id, diagnostics_path = analysis_manager.new_diagnostics() if diagnostics_enabled and tipo_video == 'juego' else (None, None)
+    checkpoint_path = None
+    if tipo_video == 'juego':
+        # Un análisis interrumpido de la misma solicitud se reanuda desde el último juego completado
+        checkpoint = get_checkpoint(checkpoint_id(user_id, video_url, player_position, game_splits))
+        if not resume:
+            checkpoint.clear()
+        checkpoint_path = analysis_manager.checkpoint_path(user_id, video_url, tipo_video, player_position, game_splits,
+                                                           camera_id, court_polygon)
+
     try:
         if tipo_video == 'entrenamiento':
             logger.info("Iniciando procesamiento de video de entrenamiento")
-            golpes_clasificados, video_duration, pair_metrics = analysis_manager.process_video(video_url, player_position, game_splits, video_id=user_id)
+            golpes_clasificados, video_duration, pair_metrics = analysis_manager.process_training_video(video_url, video_id=user_id)
         elif tipo_video == 'juego':
             logger.info("Iniciando procesamiento de video de juego")
-            golpes_clasificados, video_duration, pair_metrics = analysis_manager.process_video(video_url, player_position, game_splits, video_id=user_id)
+            golpes_clasificados, video_duration, pair_metrics = analysis_manager.process_video(video_url, player_position, game_splits, video_id=user_id, diagnostics_path=diagnostics_path, checkpoint_path=checkpoint_path, camera_id=camera_id, court_polygon=court_polygon)
         else:
             logger.error("Tipo de video no soportado")
             return jsonify({'error': 'Tipo de video no soportado'}), 400
 
         logger.info(f"Video duration received: {video_duration} seconds")
-        logger.info(f"Golpes clasificados: {golpes_clasificados}")
-
-        total_golpes = 0
-        tecnica_total = 0
-        ritmo = 0
-        fuerza = 0
-        repeticion = 0
-        golpes_en_red = 0
-        golpes_exitosos_en_red = 0
-
-        for tipo, golpes in golpes_clasificados.items():
-            total_golpes += len(golpes)
-            for golpe in golpes:
-                tecnica_total += golpe.get('calidad', 0)
-                fuerza += golpe.get('max_wrist_speed', 0)
-                if tipo_video == 'juego':
-                    if golpe.get('posicion_cancha') == 'red':
-                        golpes_en_red += 1
-                        if tipo in ['smash', 'volea_derecha', 'volea_reves', 'derecha', 'reves', 'bandeja']:
-                            golpes_exitosos_en_red += 1
-
-        logger.info(f"Total golpes calculados: {total_golpes}")
-        tecnica = (tecnica_total / total_golpes) if total_golpes > 0 else 0
-        tecnica = min(tecnica, 100)
-        logger.info(f"Antes de calcular ritmo: total_golpes={total_golpes}, video_duration={video_duration}")
-        ritmo = (total_golpes / video_duration) * 120 if video_duration > 0 else 0  # Volver al factor 120
-        logger.info(f"Ritmo calculado: {ritmo}")
-        ritmo = min(ritmo, 100)
-        fuerza = (fuerza / total_golpes) if total_golpes > 0 else 0
-        fuerza = min(fuerza, 100)
-        repeticion = 2.0
-
-        padel_iq = (tecnica * 0.4 + ritmo * 0.3 + fuerza * 0.2 + repeticion * 0.1) + 15
-        padel_iq = min(padel_iq, 100)
-        player_level = "Principiante" if padel_iq < 30 else "Intermedio" if padel_iq < 60 else "Avanzado"
-        force_category = "quinta_fuerza"
-
-        efectividad_red = (golpes_exitosos_en_red / golpes_en_red * 100) if golpes_en_red > 0 else 0
+        logger.info(f"Golpes clasificados: {sum(len(golpes) for golpes in golpes_clasificados.values())} en {len(golpes_clasificados)} tipos")
+
+        metricas = calcular_metricas_padel_iq(golpes_clasificados, video_duration, tipo_video)
+        logger.info(f"Total golpes calculados: {metricas['total_golpes']}, ritmo: {metricas['ritmo']}")
+        tecnica = metricas['tecnica']
+        ritmo = metricas['ritmo']
+        fuerza = metricas['fuerza']
+        repeticion = metricas['repeticion']
+        padel_iq = metricas['padel_iq']
+        player_level = metricas['player_level']
+        force_category = metricas['force_category']
+        efectividad_red = metricas['efectividad_red']
 
         response = {
             'detected_positions': ["jugador unico"] if tipo_video == 'entrenamiento' else ["múltiples jugadores"],
@@ -96,10 +102,141 @@ def calculate_padel_iq():
             'player_level': player_level,
             'pair_metrics': pair_metrics
         }
+        if diagnostics_id:
+            response['diagnostics_id'] = diagnostics_id
 
         logger.info(f"Calculated Padel IQ for {user_id}: {padel_iq}")
-        return jsonify(response), 200
+        # Rating acumulado del usuario: se actualiza en O(1) con esta sesión y queda en su documento
+        try:
+            rating_state = update_user_rating(db, user_id, metricas, tipo_video,
+                                              session_id=checkpoint_id(user_id, video_url, player_position, game_splits))
+            response['rating'] = rating_summary(rating_state)
+        except Exception as e:
+            logger.error(f"Error al actualizar el rating de {user_id}: {str(e)}")
+            response['rating'] = None
+        # El resultado completo se guarda para pedir después otros modos y páginas de golpes
+        try:
+            response['analysis_id'] = result_store.save(response)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el resultado del análisis: {str(e)}")
+        return jsonify(shape_response(response, response_mode, offset, limit)), 200
 
     except Exception as e:
         logger.error(f"Error calculating Padel IQ: {str(e)}")
-        return jsonify({'error': f"Error calculating Padel IQ: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({'error': f"Error calculating Padel IQ: {str(e)}"}), 500
+
+@padel_iq_bp.route('/api/analyses/<analysis_id>', methods=['GET'])
+def get_analysis(analysis_id):
+    """Resultado guardado de un análisis: ?mode=summary|strokes|full, ?cursor= y ?limit= para paginar los golpes."""
+    try:
+        mode, offset, limit = parse_page_args(request.args.get('mode'), request.args.get('cursor'), request.args.get('limit'))
+        result = result_store.load(analysis_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if result is None:
+        return jsonify({'error': 'Análisis no encontrado'}), 404
+    return jsonify(shape_response(result, mode, offset, limit)), 200
+
+@padel_iq_bp.route('/api/analysis_checkpoints', methods=['GET'])
+def get_analysis_checkpoints():
+    """Lista los análisis interrumpidos que se pueden reanudar (opcionalmente de un usuario)."""
+    return jsonify({'checkpoints': list_checkpoints(request.args.get('user_id'))}), 200
+
+@padel_iq_bp.route('/api/analysis_checkpoints/<checkpoint_id_value>/resume', methods=['POST'])
+def resume_analysis(checkpoint_id_value):
+    """Reanuda un análisis interrumpido con la solicitud original guardada en su checkpoint."""
+    try:
+        meta = get_checkpoint(checkpoint_id_value).read_meta()
+    except ValueError:
+        meta = None
+    if meta is None:
+        return jsonify({'error': 'Checkpoint no encontrado'}), 404
+    logger.info(f"Reanudando análisis {checkpoint_id_value} ({meta.get('completed_games', 0)} juegos completados)")
+    return _calculate_padel_iq({
+        'user_id': meta['user_id'],
+        'video_url': meta['video_url'],
+        'tipo_video': meta['tipo_video'],
+        'player_position': meta['player_position'],
+        'game_splits': meta['game_splits'],
+        'camera_id': meta.get('camera_id'),
+        'court_polygon': meta.get('court_polygon')
+    })
+
+@padel_iq_bp.route('/api/analysis_checkpoints/<checkpoint_id_value>', methods=['DELETE'])
+def delete_analysis_checkpoint(checkpoint_id_value):
+    """Descarta un checkpoint; el siguiente análisis de esa solicitud empezará de cero."""
+    try:
+        checkpoint = get_checkpoint(checkpoint_id_value)
+    except ValueError:
+        checkpoint = None
+    if checkpoint is None or not checkpoint.exists():
+        return jsonify({'error': 'Checkpoint no encontrado'}), 404
+    checkpoint.clear()
+    return jsonify({'checkpoint_id': checkpoint_id_value, 'deleted': True}), 200
+
+@padel_iq_bp.route('/api/live/sessions', methods=['POST'])
+def create_live_session():
+    """Inicia el análisis en vivo de una URL RTSP/HLS o de fragmentos subidos por el cliente."""
+    data = request.get_json()
+    user_id = data.get('user_id')
+    source_url = data.get('source_url')
+    player_position = data.get('player_position', {'side': 'left', 'zone': 'back'})
+    realtime = data.get('realtime', False)
+    custom_params = dict(analysis_manager.default_params)
+    if data.get('camera_id'):
+        custom_params['camera_id'] = data['camera_id']
+    if data.get('court_polygon'):
+        custom_params['court_polygon'] = data['court_polygon']
+
+    if not user_id:
+        return jsonify({'error': 'Faltan datos requeridos (user_id)'}), 400
+    if source_url is not None and not is_valid_source(source_url):
+        logger.error(f"Fuente en vivo no soportada: {source_url}")
+        return jsonify({'error': 'Fuente en vivo no soportada'}), 400
+
+    session = LiveAnalysisSession(user_id, player_position, custom_params, source_url=source_url,
+                                  realtime=realtime, stroke_filter=analysis_manager.post_filter_strokes)
+    live_sessions.add(session)
+    session.start()
+    logger.info(f"Sesión en vivo {session.id} iniciada para user_id: {user_id}, fuente: {source_url or 'fragmentos'}")
+    return jsonify({
+        'session_id': session.id,
+        'events_url': f"/api/live/sessions/{session.id}/events",
+        'chunks_url': f"/api/live/sessions/{session.id}/chunks" if source_url is None else None
+    }), 201
+
+@padel_iq_bp.route('/api/live/sessions/<session_id>/chunks', methods=['POST'])
+def upload_live_chunk(session_id):
+    """Recibe el siguiente fragmento de video de una sesión en vivo; ?final=1 indica el último."""
+    session = live_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Sesión no encontrada'}), 404
+    if session.chunks is None:
+        return jsonify({'error': 'La sesión no acepta fragmentos'}), 400
+
+    data = request.get_data()
+    if data:
+        session.add_chunk(data)
+    if request.args.get('final') == '1':
+        session.finish_upload()
+    return jsonify({'session_id': session_id, 'chunks': session.chunk_count}), 202
+
+@padel_iq_bp.route('/api/live/sessions/<session_id>/events', methods=['GET'])
+def live_session_events(session_id):
+    """Eventos de golpe y métricas acumuladas de la sesión como Server-Sent Events."""
+    session = live_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Sesión no encontrada'}), 404
+
+    last_event_id = int(request.headers.get('Last-Event-ID', 0) or 0)
+    return Response(stream_with_context(sse_events(session, last_event_id)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@padel_iq_bp.route('/api/live/sessions/<session_id>', methods=['DELETE'])
+def stop_live_session(session_id):
+    """Detiene una sesión en vivo; los clientes reciben el evento 'end' con el resumen."""
+    session = live_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Sesión no encontrada'}), 404
+    session.stop()
+    return jsonify({'session_id': session_id, 'status': 'stopping'}), 202
@@ -1,9 +1,15 @@
 import logging
+import os
+import uuid
 import cv2
 import numpy as np
 from firebase_admin import firestore
-from .video_processing import procesar_video_juego
-from .pair_metrics import calculate_pair_metrics
+from .video_processing import descargar_video, limpiar_descarga, analizar_video_juego, analizar_video_entrenamiento
+from .downloader import temp_download_path
+from .video_proxy import get_analysis_video
+from .checkpoints import checkpoint_id, get_checkpoint
+from .pair_metrics import calculate_pair_metrics, empty_pair_metrics
+from .video_decoder import create_decoder
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -12,6 +18,9 @@ logger = logging.getLogger(__name__)
 # Firestore client
 db = firestore.client()
 
+# Directorio donde se guardan los archivos de diagnóstico por análisis
+DIAGNOSTICS_DIR = os.environ.get('PADEL_DIAGNOSTICS_DIR', 'diagnostics')
+
 class AnalysisManager:
     """Administra la flexibilidad del análisis y aprende de históricos para mejorar la precisión."""
     
@@ -22,7 +31,48 @@ class AnalysisManager:
             'frame_skip': 12,
             'scale_factor': 0.8,
             'min_detection_confidence': 0.05,
-            'min_tracking_confidence': 0.05
+            'min_tracking_confidence': 0.05,
+            'pose_gating': True,
+            'pose_gate_bbox_threshold': 0.05,
+            'pose_gate_pixel_threshold': 8.0,
+            'pose_gate_max_reuse': 3,
+            'adaptive_sampling': True,
+            'coarse_frame_skip': 30,
+            'dense_frame_skip': 2,
+            'min_activity': 2.0,
+            'activity_percentile': 60,
+            'segment_refinement': True,
+            'refinement_workers': None,
+            'decoder_backend': None,  # None usa PADEL_VIDEO_DECODER ('opencv' o 'pyav')
+            'proxy_enabled': True,
+            'proxy_width': 640,
+            'proxy_height': 480,
+            'proxy_fps': None,  # None conserva los fps originales
+            'proxy_gop': 15,
+            'scene_sample_fps': 2.0,
+            'scene_cut_threshold': 0.5,
+            'scene_merge_window': 10.0,  # Segundos: cortes más cercanos se fusionan en un solo límite
+            'scene_min_game_duration': 30.0,
+            'court_mask': True,  # Recortar la entrada del detector a la cancha y descartar detecciones fuera de ella
+            'court_mode': 'crop',  # 'crop' (solo recorte) o 'mask' (además, negro fuera del polígono)
+            'court_margin': 20,
+            'court_top_margin': 100,  # Píxeles por encima de la cancha para el cuerpo de los jugadores del fondo
+            'court_samples': 15,
+            'court_min_area': 0.15,
+            'detection_interval': 1,  # 1 = YOLO en cada muestra (comportamiento original)
+            'detection_adaptive': False,  # Ajustar N al error de la propagación entre detecciones
+            'detection_max_interval': 6,
+            'detection_propagation': 'flow',  # 'flow' (flujo óptico) o 'kalman' (predicción del tracker)
+            'tracker_backend': None,  # None usa PADEL_TRACKER_BACKEND ('deepsort' o 'motion')
+            'stroke_rules': 'juego',  # Tabla de umbrales de stroke_classifier (PADEL_STROKE_RULES puede redefinirla)
+            'bounded_memory': False,  # Videos de horas: keypoints en ventana fija, trayectorias en disco, tracks muertos desalojados
+            'keypoint_window': 8,
+            'track_eviction_seconds': 5.0,
+            'frame_bus': False,  # Decodificación, detección YOLO y pose MediaPipe en procesos separados (memoria compartida)
+            'frame_bus_slots': 8,
+            'detection_workers': 1,
+            'pose_workers': 2,
+            'live_flush_seconds': 1.0  # En vivo y en entrenamiento, los golpes cerrados se clasifican juntos cada tantos segundos de video
         }
         self.historical_data = []
         self.load_historical_data()
@@ -55,8 +105,8 @@ class AnalysisManager:
 
     def analyze_video_conditions(self, video_path):
         """Analiza las condiciones del video para ajustar parámetros dinámicamente."""
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
+        cap = create_decoder(video_path, self.default_params['decoder_backend'], width=640, height=480)
+        if not cap.is_opened():
             logger.error("No se pudo abrir el video para análisis de condiciones.")
             return self.default_params
 
@@ -65,7 +115,7 @@ class AnalysisManager:
         contrast_values = []
         frame_count = 0
 
-        while cap.isOpened() and frame_count < frames_to_analyze:
+        while cap.is_opened() and frame_count < frames_to_analyze:
             ret, frame = cap.read()
             if not ret:
                 break
@@ -135,17 +185,51 @@ class AnalysisManager:
 
         return filtered_golpes
 
-    def process_video(self, video_url, player_position, game_splits, video_id):
+    def new_diagnostics(self):
+        """Identificador y ruta del archivo de diagnóstico binario de un nuevo análisis.
+
+        El nombre lo genera el servidor: el cliente solo recibe el identificador.
+        """
+        diagnostics_id = uuid.uuid4().hex
+        return diagnostics_id, os.path.join(DIAGNOSTICS_DIR, f"{diagnostics_id}.pdiag")
+
+    def checkpoint_path(self, user_id, video_url, tipo_video, player_position, game_splits, camera_id=None, court_polygon=None):
+        """Ruta del checkpoint de este análisis; guarda la solicitud para poder reanudarla después."""
+        checkpoint = get_checkpoint(checkpoint_id(user_id, video_url, player_position, game_splits))
+        checkpoint.write_meta(user_id=user_id, video_url=video_url, tipo_video=tipo_video,
+                              player_position=player_position, game_splits=game_splits,
+                              camera_id=camera_id, court_polygon=court_polygon)
+        return checkpoint.path
+
+    def process_video(self, video_url, player_position, game_splits, video_id, diagnostics_path=None, checkpoint_path=None,
+                      camera_id=None, court_polygon=None):
         """Procesa un video con parámetros optimizados, aplica post-filtro y guarda los resultados históricos."""
-        video_conditions = self.analyze_video_conditions(video_url)
-        params = self.optimize_parameters(video_url)
+        # Ruta propia de esta petición: otros análisis del mismo proceso o de otro worker no la tocan
+        local_path = temp_download_path('temp_video_juego')
+        try:
+            descargar_video(video_url, local_path)
+            # Todas las pasadas (condiciones, transiciones, segmentación) leen el proxy de baja resolución
+            video_path = get_analysis_video(local_path, self.default_params)
+            video_conditions = self.analyze_video_conditions(video_path)
+            params = self.optimize_parameters(video_path)
+            if diagnostics_path:
+                params['diagnostics_path'] = diagnostics_path
+            if checkpoint_path:
+                params['checkpoint_path'] = checkpoint_path
+            # Calibración de cancha de una cámara fija o polígono indicado por el cliente
+            if camera_id:
+                params['camera_id'] = camera_id
+            if court_polygon:
+                params['court_polygon'] = court_polygon
 
-        golpes_clasificados, video_duration, player_trajectories = procesar_video_juego(
-            video_url,
-            player_position,
-            game_splits=game_splits,
-            custom_params=params
-        )
+            golpes_clasificados, video_duration, player_trajectories = analizar_video_juego(
+                video_path,
+                player_position,
+                game_splits=game_splits,
+                custom_params=params
+            )
+        finally:
+            limpiar_descarga(local_path)
 
         golpes_clasificados = self.post_filter_strokes(golpes_clasificados)
 
@@ -153,4 +237,27 @@ class AnalysisManager:
 
         self.save_historical_data(video_id, golpes_clasificados, video_conditions)
 
-        return golpes_clasificados, video_duration, pair_metrics
\ No newline at end of file
+        if checkpoint_path:
+            # Análisis completo: el checkpoint ya no hace falta
+            get_checkpoint(os.path.basename(checkpoint_path), os.path.dirname(checkpoint_path)).clear()
+
+        return golpes_clasificados, video_duration, pair_metrics
+
+    def process_training_video(self, video_url, video_id):
+        """Procesa un video de entrenamiento de un solo jugador: sin detección de juegos ni métricas de parejas."""
+        local_path = temp_download_path('temp_video_entrenamiento')
+        try:
+            descargar_video(video_url, local_path)
+            video_path = get_analysis_video(local_path, self.default_params)
+            video_conditions = self.analyze_video_conditions(video_path)
+            params = self.optimize_parameters(video_path)
+
+            golpes_clasificados, video_duration = analizar_video_entrenamiento(video_path, custom_params=params)
+        finally:
+            limpiar_descarga(local_path)
+
+        golpes_clasificados = self.post_filter_strokes(golpes_clasificados)
+
+        self.save_historical_data(video_id, golpes_clasificados, video_conditions)
+
+        return golpes_clasificados, video_duration, empty_pair_metrics()
\ No newline at end of file
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import shutil
+from datetime import datetime
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = os.environ.get('PADEL_CHECKPOINT_DIR', 'checkpoints')
+CHECKPOINT_VERSION = 1
+
+# Parámetros que cambian en cada ejecución sin afectar a los resultados
+_VOLATILE_PARAMS = ('diagnostics_path', 'checkpoint_path')
+
+def checkpoint_id(user_id, video_url, player_position, game_splits):
+    """Identificador estable de un análisis: mismo usuario, mismo video y misma solicitud, mismo checkpoint.
+
+    Incluye al usuario: dos usuarios que analizan la misma URL no comparten (ni borran) el progreso.
+    """
+    key = json.dumps({'user_id': user_id, 'video_url': video_url, 'player_position': player_position,
+                      'game_splits': game_splits}, sort_keys=True)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+def params_digest(custom_params):
+    """Huella de los parámetros de análisis; un checkpoint solo se reanuda con los mismos parámetros."""
+    params = {k: v for k, v in custom_params.items() if k not in _VOLATILE_PARAMS}
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class AnalysisCheckpoint:
+    """Checkpoint en disco de un análisis de juego: metadatos JSON y estado del segmentador en pickle.
+
+    El estado se reescribe de forma atómica al terminar cada juego, así que un proceso interrumpido
+    en cualquier punto deja siempre el último juego completado.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.meta_path = os.path.join(path, 'meta.json')
+        self.state_path = os.path.join(path, 'state.pkl')
+
+    @property
+    def id(self):
+        return os.path.basename(self.path)
+
+    def exists(self):
+        return os.path.exists(self.meta_path)
+
+    def write_meta(self, **fields):
+        """Crea o actualiza los metadatos (solicitud original y progreso)."""
+        os.makedirs(self.path, exist_ok=True)
+        meta = self.read_meta() or {'id': self.id, 'created_at': datetime.now().isoformat()}
+        meta.update(fields)
+        meta['updated_at'] = datetime.now().isoformat()
+        _write_atomic(self.meta_path, json.dumps(meta, default=str).encode('utf-8'))
+        return meta
+
+    def read_meta(self):
+        if not self.exists():
+            return None
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Metadatos de checkpoint ilegibles en {self.meta_path}: {str(e)}")
+            return None
+
+    def save(self, state, custom_params, video_size):
+        """Guarda el estado tras un juego completado."""
+        os.makedirs(self.path, exist_ok=True)
+        payload = {
+            'version': CHECKPOINT_VERSION,
+            'params_digest': params_digest(custom_params),
+            'video_size': video_size,
+            'state': state
+        }
+        _write_atomic(self.state_path, pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+        self.write_meta(completed_games=state['next_game'], total_games=len(state['game_boundaries']))
+        logger.info(f"Checkpoint guardado: {state['next_game']}/{len(state['game_boundaries'])} juegos en {self.path}")
+
+    def load(self, custom_params, video_size):
+        """Devuelve el estado guardado si corresponde al mismo video y parámetros, o None."""
+        if not os.path.exists(self.state_path):
+            return None
+        try:
+            with open(self.state_path, 'rb') as f:
+                payload = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Checkpoint ilegible en {self.state_path}, se empieza de cero: {str(e)}")
+            return None
+
+        if payload.get('version') != CHECKPOINT_VERSION or payload.get('video_size') != video_size:
+            logger.info("Checkpoint de otra versión o de otro video, se ignora")
+            return None
+        if payload.get('params_digest') != params_digest(custom_params):
+            logger.info("Checkpoint con parámetros distintos, se ignora")
+            return None
+        return payload['state']
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+def get_checkpoint(checkpoint_id_value, checkpoint_dir=CHECKPOINT_DIR):
+    """Checkpoint por identificador; solo se aceptan identificadores generados por checkpoint_id."""
+    if not re.fullmatch(r'[0-9a-f]{32}', checkpoint_id_value or ''):
+        raise ValueError(f"Identificador de checkpoint no válido: {checkpoint_id_value}")
+    return AnalysisCheckpoint(os.path.join(checkpoint_dir, checkpoint_id_value))
+
+def list_checkpoints(user_id=None, checkpoint_dir=CHECKPOINT_DIR):
+    """Metadatos de los análisis con checkpoint pendiente, opcionalmente filtrados por usuario."""
+    if not os.path.isdir(checkpoint_dir):
+        return []
+    metas = []
+    for name in sorted(os.listdir(checkpoint_dir)):
+        meta = AnalysisCheckpoint(os.path.join(checkpoint_dir, name)).read_meta()
+        if meta and (user_id is None or meta.get('user_id') == user_id):
+            metas.append(meta)
+    return metas
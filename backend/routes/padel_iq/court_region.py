@@ -0,0 +1,268 @@
+import json
+import logging
+import math
+import os
+import re
+import cv2
+import numpy as np
+from .scene_index import file_fingerprint
+from .video_decoder import create_decoder
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COURT_DIR = os.environ.get('PADEL_COURT_DIR', 'courts')  # Calibraciones por cámara
+COURT_VERSION = 1
+COURT_SUFFIX = '.court.json'
+FRAME_SIZE = (640, 480)
+
+def _court_center(polygon, frame_size):
+    """Centro de la cancha en la imagen (donde se cruzan la red y la línea central).
+
+    Con cuatro vértices es el cruce de las diagonales, que la perspectiva conserva; si no, el centroide.
+    """
+    if len(polygon) == 4:
+        p0, p1, p2, p3 = polygon.astype(np.float64)
+        d1, d2 = p2 - p0, p3 - p1
+        denominator = d1[0] * d2[1] - d1[1] * d2[0]
+        if abs(denominator) > 1e-9:
+            t = ((p1[0] - p0[0]) * d2[1] - (p1[1] - p0[1]) * d2[0]) / denominator
+            center = p0 + t * d1
+            return float(center[0]), float(center[1])
+    moments = cv2.moments(polygon)
+    if moments['m00'] > 0:
+        return moments['m10'] / moments['m00'], moments['m01'] / moments['m00']
+    return frame_size[0] / 2, frame_size[1] / 2
+
+class CourtRegion:
+    """Polígono de la cancha en coordenadas del frame de análisis (640x480).
+
+    Define el recorte (o la máscara) que recibe el detector, el filtro de detecciones fuera de la
+    cancha y el punto que separa izquierda/derecha y red/fondo.
+    """
+
+    def __init__(self, polygon, frame_size=FRAME_SIZE, margin=20, top_margin=100, mode='crop'):
+        self.polygon = np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+        self.frame_size = frame_size
+        self.margin = margin
+        self.top_margin = top_margin  # Los jugadores del fondo sobresalen por encima de la línea de fondo
+        self.mode = mode
+        width, height = frame_size
+        x, y, w, h = cv2.boundingRect(self.polygon.astype(np.int32))
+        self.crop_box = (max(0, x - margin), max(0, y - margin - top_margin),
+                         min(width, x + w + margin), min(height, y + h + margin))
+        self.split_point = _court_center(self.polygon, frame_size)
+        self._mask = None
+
+    @classmethod
+    def full_frame(cls, frame_size=FRAME_SIZE):
+        """Región sin calibrar: todo el frame, mismo comportamiento que sin máscara de cancha."""
+        width, height = frame_size
+        return cls([(0, 0), (width, 0), (width, height), (0, height)], frame_size, margin=0, top_margin=0)
+
+    @property
+    def is_full_frame(self):
+        width, height = self.frame_size
+        return self.crop_box == (0, 0, width, height) and self.mode == 'crop'
+
+    def side(self, x):
+        return 'left' if x < self.split_point[0] else 'right'
+
+    def zone(self, y):
+        return 'net' if y < self.split_point[1] else 'back'
+
+    def contains(self, x, y):
+        """Punto dentro del polígono, con margin píxeles de tolerancia."""
+        return cv2.pointPolygonTest(self.polygon, (float(x), float(y)), True) >= -self.margin
+
+    def _crop_mask(self):
+        if self._mask is None:
+            x1, y1, x2, y2 = self.crop_box
+            mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+            cv2.fillPoly(mask, [np.round(self.polygon - (x1, y1)).astype(np.int32)], 255)
+            # Extender hacia arriba (cuerpo de los jugadores) y hacia los lados
+            if self.top_margin > 0:
+                mask = cv2.dilate(mask, np.ones((self.top_margin + 1, 1), np.uint8), anchor=(0, 0))
+            if self.margin > 0:
+                mask = cv2.dilate(mask, np.ones((2 * self.margin + 1, 2 * self.margin + 1), np.uint8))
+            self._mask = mask
+        return self._mask
+
+    def detector_input(self, frame):
+        """Recorte del frame que se pasa al detector y su desplazamiento respecto al frame completo."""
+        x1, y1, x2, y2 = self.crop_box
+        crop = frame[y1:y2, x1:x2]
+        if self.mode == 'mask':
+            crop = cv2.bitwise_and(crop, crop, mask=self._crop_mask())
+        return crop, (x1, y1)
+
+    def inference_size(self, max_imgsz):
+        """Tamaño de inferencia del recorte: su lado mayor redondeado a múltiplo de 32, sin superar max_imgsz."""
+        x1, y1, x2, y2 = self.crop_box
+        return min(max_imgsz, int(math.ceil(max(x2 - x1, y2 - y1) / 32.0)) * 32)
+
+    def detect(self, detector, frame, min_confidence=0.5):
+        """Detecciones de personas dentro de la cancha, en coordenadas del frame completo."""
+        if self.is_full_frame:
+            return detector.detect(frame, min_confidence)
+        crop, (dx, dy) = self.detector_input(frame)
+        detections = []
+        for x1, y1, x2, y2, conf in detector.detect(crop, min_confidence, imgsz=self.inference_size(detector.imgsz)):
+            x1, y1, x2, y2 = x1 + dx, y1 + dy, x2 + dx, y2 + dy
+            # Se filtra por los pies: la cabeza de los jugadores del fondo queda fuera del polígono
+            if self.contains((x1 + x2) / 2, y2):
+                detections.append((x1, y1, x2, y2, conf))
+        return detections
+
+def polygon_from_background(frame, min_area=0.15, saturation_min=40, hue_tolerance=12):
+    """Polígono de la superficie de juego en un frame sin jugadores (color dominante de la mitad inferior)."""
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    height, width = frame.shape[:2]
+    lower = hsv[height // 2:]
+    saturated = lower[..., 1] > saturation_min
+    if saturated.sum() < 0.1 * lower.shape[0] * lower.shape[1]:
+        return None
+
+    # El color de la pista (azul, verde...) es el tono saturado más frecuente donde seguro hay cancha
+    hue_hist = np.bincount(lower[..., 0][saturated].ravel(), minlength=180).astype(np.float32)
+    hue_hist = np.convolve(np.concatenate([hue_hist[-2:], hue_hist, hue_hist[:2]]), np.ones(5), mode='valid')
+    peak = int(np.argmax(hue_hist))
+    hue_distance = np.abs(hsv[..., 0].astype(np.int16) - peak)
+    hue_distance = np.minimum(hue_distance, 180 - hue_distance)
+    mask = ((hue_distance <= hue_tolerance) & (hsv[..., 1] > saturation_min)).astype(np.uint8) * 255
+
+    # Cerrar las líneas blancas y la red, quitar ruido suelto
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((15, 15), np.uint8))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((5, 5), np.uint8))
+    contours = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]
+    if not contours:
+        return None
+    largest = max(contours, key=cv2.contourArea)
+    if cv2.contourArea(largest) < min_area * width * height:
+        return None
+    hull = cv2.convexHull(largest)
+    polygon = cv2.approxPolyDP(hull, 0.02 * cv2.arcLength(hull, True), True)
+    return polygon.reshape(-1, 2).astype(np.float32)
+
+def calibrate_court(video_path, samples=15, min_area=0.15, decoder_backend=None):
+    """Busca el polígono de la cancha en la mediana de varios frames repartidos por el video.
+
+    La mediana elimina a los jugadores y la pelota, que se mueven, y deja el fondo fijo de la cámara.
+    """
+    cap = create_decoder(video_path, decoder_backend, width=FRAME_SIZE[0], height=FRAME_SIZE[1])
+    if not cap.is_opened():
+        logger.error("No se pudo abrir el video para calibrar la cancha")
+        return None
+
+    frames = []
+    for i in range(samples):
+        cap.seek(int(cap.frame_count * (i + 1) / (samples + 1)))
+        ret, frame = cap.read()
+        if ret:
+            frames.append(frame)
+    cap.release()
+    if not frames:
+        return None
+
+    background = np.median(np.stack(frames), axis=0).astype(np.uint8)
+    return polygon_from_background(background, min_area)
+
+def court_cache_path(video_path):
+    """Ruta de la calibración guardada junto al video."""
+    return f"{video_path}{COURT_SUFFIX}"
+
+def camera_court_path(camera_id, court_dir=COURT_DIR):
+    """Ruta de la calibración de una cámara fija; solo se aceptan identificadores simples."""
+    if not re.fullmatch(r'[A-Za-z0-9_-]{1,64}', camera_id or ''):
+        raise ValueError(f"Identificador de cámara no válido: {camera_id}")
+    return os.path.join(court_dir, f"{camera_id}.json")
+
+def _load_calibration(path, fingerprint=None):
+    """Calibración guardada ({'polygon': ...}) o None si no existe o no corresponde al mismo archivo."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Calibración de cancha ilegible en {path}: {str(e)}")
+        return None
+    if data.get('version') != COURT_VERSION:
+        return None
+    if fingerprint is not None and any(data.get(k) != v for k, v in fingerprint.items()):
+        return None
+    return data
+
+def _save_calibration(path, polygon, fingerprint=None):
+    data = {'version': COURT_VERSION, 'polygon': polygon.tolist() if polygon is not None else None}
+    data.update(fingerprint or {})
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # Es una caché: si no se puede escribir se recalibra en la siguiente ejecución
+        logger.warning(f"No se pudo guardar la calibración de cancha en {path}: {str(e)}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def court_from_params(custom_params):
+    """Región de cancha indicada en los parámetros (polígono explícito o calibración de la cámara), o None."""
+    if not custom_params.get('court_mask', True):
+        return None
+    polygon = custom_params.get('court_polygon')
+    if polygon is None and custom_params.get('camera_id'):
+        try:
+            calibration = _load_calibration(camera_court_path(custom_params['camera_id']))
+        except ValueError as e:
+            logger.warning(str(e))
+            calibration = None
+        if calibration is not None:
+            polygon = calibration['polygon']
+    if polygon is None:
+        return None
+    return _make_region(polygon, custom_params)
+
+def _make_region(polygon, custom_params):
+    return CourtRegion(polygon, margin=custom_params.get('court_margin', 20),
+                       top_margin=custom_params.get('court_top_margin', 100),
+                       mode=custom_params.get('court_mode', 'crop'))
+
+def get_court_region(video_path, custom_params):
+    """Región de cancha del video: parámetros o cámara, si no la calibración en caché o una nueva.
+
+    Si no se encuentra la cancha se devuelve la región de frame completo (sin recorte ni filtro).
+    """
+    if not custom_params.get('court_mask', True):
+        return CourtRegion.full_frame()
+    region = court_from_params(custom_params)
+    if region is not None:
+        return region
+
+    fingerprint = file_fingerprint(video_path)
+    calibration = _load_calibration(court_cache_path(video_path), fingerprint)
+    if calibration is not None:
+        # Un polígono None guardado significa que el video ya se calibró sin encontrar cancha
+        polygon = calibration['polygon']
+        logger.info(f"Usando calibración de cancha en caché: {court_cache_path(video_path)}")
+    else:
+        polygon = calibrate_court(video_path, custom_params.get('court_samples', 15),
+                                  custom_params.get('court_min_area', 0.15), custom_params.get('decoder_backend'))
+        _save_calibration(court_cache_path(video_path), polygon, fingerprint)
+        if polygon is not None and custom_params.get('camera_id'):
+            # Cámara fija: los siguientes videos de la misma cámara reutilizan la calibración
+            try:
+                _save_calibration(camera_court_path(custom_params['camera_id']), polygon)
+            except ValueError as e:
+                logger.warning(str(e))
+
+    if polygon is None:
+        logger.warning("No se encontró la cancha, el detector usa el frame completo")
+        return CourtRegion.full_frame()
+    region = _make_region(polygon, custom_params)
+    logger.info(f"Cancha calibrada: {len(region.polygon)} vértices, recorte {region.crop_box}, "
+                f"separación en {tuple(round(v, 1) for v in region.split_point)}")
+    return region
@@ -0,0 +1,146 @@
+import logging
+import cv2
+import numpy as np
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROPAGATION_MODES = ('flow', 'kalman')
+
+def _box_center(box):
+    return (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+
+class DetectionScheduler:
+    """Ejecuta el detector solo cada N frames muestreados y propaga las cajas en los intermedios.
+
+    - 'flow': las cajas de la última muestra se desplazan con flujo óptico disperso (Lucas-Kanade)
+      sobre puntos de cada caja y se pasan al tracker como detecciones.
+    - 'kalman': no se pasan detecciones y el tracker avanza sus tracks con la predicción de Kalman.
+
+    Se fuerza una detección si una caja pierde el flujo (confianza por debajo del umbral) o si hay
+    tracks tentativos, que necesitan detecciones consecutivas para confirmarse. N se adapta al error
+    de la propagación en cada detección: crece si predijo bien y se reduce a la mitad si no.
+    """
+
+    def __init__(self, interval=1, mode='flow', adaptive=True, min_interval=1, max_interval=6,
+                 error_low=0.1, error_high=0.3, min_confidence=0.5, min_flow_points=6):
+        if mode not in PROPAGATION_MODES:
+            logger.warning(f"Modo de propagación desconocido '{mode}', se usa 'flow'")
+            mode = 'flow'
+        self.initial_interval = max(1, interval)
+        self.mode = mode
+        self.adaptive = adaptive
+        self.min_interval = max(1, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.error_low = error_low  # Error de predicción (relativo a la altura de la caja) para alargar N
+        self.error_high = error_high  # Error a partir del cual N se reduce a la mitad
+        self.min_confidence = min_confidence
+        self.min_flow_points = min_flow_points
+        self.stats = {'frames': 0, 'detected': 0, 'propagated': 0, 'forced': 0, 'interval_changes': 0}
+        self.reset()
+
+    @property
+    def enabled(self):
+        return self.initial_interval > 1 or self.adaptive
+
+    def reset(self):
+        """Olvida el estado al empezar un juego: la primera muestra siempre detecta."""
+        self.interval = self.initial_interval
+        self.since_detection = None
+        self.boxes = []
+        self.prev_gray = None
+
+    def _needs_detection(self, tracks):
+        """(detectar, forzada): toca por intervalo, o hay tracks tentativos y se fuerza."""
+        if self.since_detection is None or self.since_detection + 1 >= self.interval:
+            return True, False
+        # Un track tentativo se borraría al primer frame sin detección
+        if tracks is not None and any(track.is_tentative() for track in tracks):
+            return True, True
+        return False, False
+
+    def _propagate_flow(self, gray):
+        """Desplaza cada caja con la mediana del flujo de sus puntos; None si alguna se pierde."""
+        propagated = []
+        height, width = gray.shape
+        for x1, y1, x2, y2, conf in self.boxes:
+            ix1, iy1, ix2, iy2 = max(0, int(x1)), max(0, int(y1)), min(width, int(x2)), min(height, int(y2))
+            if ix2 - ix1 < 4 or iy2 - iy1 < 4:
+                return None
+            mask = np.zeros_like(gray)
+            mask[iy1:iy2, ix1:ix2] = 255
+            points = cv2.goodFeaturesToTrack(self.prev_gray, maxCorners=20, qualityLevel=0.01, minDistance=3, mask=mask)
+            if points is None or len(points) < self.min_flow_points:
+                return None
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, points, None, winSize=(15, 15), maxLevel=2)
+            good = status.ravel() == 1
+            # La confianza baja con la fracción de puntos que el flujo consigue seguir
+            conf = conf * good.sum() / len(points)
+            if good.sum() < self.min_flow_points or conf < self.min_confidence:
+                return None
+            dx, dy = np.median((moved - points).reshape(-1, 2)[good], axis=0)
+            propagated.append((x1 + dx, y1 + dy, x2 + dx, y2 + dy, float(conf)))
+        return propagated
+
+    def _adapt(self, detections, predicted):
+        """Ajusta N según lo lejos que quedaron las cajas propagadas de las detecciones reales."""
+        if not self.adaptive or not detections or not predicted:
+            return
+        errors = []
+        for box in detections:
+            cx, cy = _box_center(box)
+            height = max(box[3] - box[1], 1.0)
+            errors.append(min(np.hypot(cx - px, cy - py) for px, py in map(_box_center, predicted)) / height)
+        error = float(np.median(errors))
+        previous = self.interval
+        if error < self.error_low:
+            self.interval = min(self.max_interval, self.interval + 1)
+        elif error > self.error_high:
+            self.interval = max(self.min_interval, self.interval // 2)
+        if self.interval != previous:
+            self.stats['interval_changes'] += 1
+
+    def step(self, frame, detect_fn, tracks=None):
+        """Detecciones (x1, y1, x2, y2, conf) para este frame y si vienen del detector.
+
+        tracks son los que devolvió el tracker en la muestra anterior (tentativos y, en modo 'kalman',
+        las cajas predichas con las que se mide el error al volver a detectar).
+        """
+        self.stats['frames'] += 1
+        if not self.enabled:
+            self.stats['detected'] += 1
+            return detect_fn(frame), True
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if self.mode == 'flow' else None
+        detect, forced = self._needs_detection(tracks)
+        propagated = None
+        if self.mode == 'flow':
+            # También al detectar: las cajas propagadas a este frame miden el error de la propagación
+            propagated = self._propagate_flow(gray) if self.boxes and self.prev_gray is not None else []
+            if propagated is None and not detect:
+                detect = forced = True
+
+        if detect:
+            self.stats['forced'] += forced
+            detections = detect_fn(frame)
+            if self.mode == 'flow':
+                predicted = propagated
+            else:
+                predicted = [(x, y, x + w, y + h, 1.0) for x, y, w, h in
+                             (track.to_tlwh() for track in tracks or [] if track.is_confirmed())]
+            self._adapt(detections, predicted)
+            self.boxes = detections
+            self.since_detection = 0
+            self.stats['detected'] += 1
+        else:
+            if self.mode == 'flow':
+                self.boxes = propagated
+            self.since_detection += 1
+            self.stats['propagated'] += 1
+        self.prev_gray = gray
+        return (self.boxes if self.mode == 'flow' or detect else []), detect
+
+    def report(self):
+        frames = max(self.stats['frames'], 1)
+        return dict(self.stats, detection_ratio=round(self.stats['detected'] / frames, 3), interval=self.interval)
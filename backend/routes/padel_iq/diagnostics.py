@@ -0,0 +1,136 @@
+import logging
+import mmap
+import os
+import struct
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAGIC = b'PDIAG1'
+# magic, record_size, capacity, total de registros escritos
+HEADER = struct.Struct('<6sHIQ')
+# time, frame, track_id, player_position, stroke, flags, elbow_angle, wrist_speed, elbow_angle_speed, wrist_direction_change, velocidad
+RECORD = struct.Struct('<fIiBBHfffff')
+
+STROKE_TYPES = ('N/A', 'saque', 'smash', 'bandeja', 'globo', 'defensivo',
+                'volea_derecha', 'volea_reves', 'derecha', 'reves')
+STROKE_CODES = {tipo: code for code, tipo in enumerate(STROKE_TYPES)}
+
+# Bits del campo flags
+FLAG_POSE_DETECTED = 1 << 0
+FLAG_ANGLE_INTERPOLATED = 1 << 1
+FLAG_SPEED_THRESHOLD = 1 << 2
+FLAG_ANGLE_SPEED_THRESHOLD = 1 << 3
+FLAG_DIRECTION_THRESHOLD = 1 << 4
+FLAG_INVALID_EXCHANGE = 1 << 5
+FLAG_SEGMENT_START = 1 << 6
+FLAG_SEGMENT_EXTEND = 1 << 7
+FLAG_SEGMENT_CLOSE = 1 << 8
+FLAG_NEW_POSITION = 1 << 9
+FLAG_POSE_REUSED = 1 << 10
+FLAG_BOX_PROPAGATED = 1 << 11
+
+FLAG_NAMES = {
+    FLAG_POSE_DETECTED: 'pose_detected',
+    FLAG_ANGLE_INTERPOLATED: 'angle_interpolated',
+    FLAG_SPEED_THRESHOLD: 'speed_threshold',
+    FLAG_ANGLE_SPEED_THRESHOLD: 'angle_speed_threshold',
+    FLAG_DIRECTION_THRESHOLD: 'direction_threshold',
+    FLAG_INVALID_EXCHANGE: 'invalid_exchange',
+    FLAG_SEGMENT_START: 'segment_start',
+    FLAG_SEGMENT_EXTEND: 'segment_extend',
+    FLAG_SEGMENT_CLOSE: 'segment_close',
+    FLAG_NEW_POSITION: 'new_position',
+    FLAG_POSE_REUSED: 'pose_reused',
+    FLAG_BOX_PROPAGATED: 'box_propagated',
+}
+
+class NullDiagnosticsRecorder:
+    """Grabador vacío usado cuando el diagnóstico no está activado en la petición."""
+    enabled = False
+    path = None
+
+    def record(self, *args):
+        pass
+
+    def close(self):
+        pass
+
+class DiagnosticsRecorder:
+    """Escribe registros binarios de tamaño fijo por frame y track en un archivo circular mapeado en memoria."""
+    enabled = True
+
+    def __init__(self, path, capacity=200000):
+        self.path = path
+        self.capacity = capacity
+        self.count = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        size = HEADER.size + capacity * RECORD.size
+        self._file = open(path, 'w+b')
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        HEADER.pack_into(self._map, 0, MAGIC, RECORD.size, capacity, 0)
+
+    def record(self, time, frame, track_id, player_position, stroke, flags,
+               elbow_angle, wrist_speed, elbow_angle_speed, wrist_direction_change, velocidad):
+        """Guarda un registro; al llenarse el buffer se sobrescriben los más antiguos."""
+        offset = HEADER.size + (self.count % self.capacity) * RECORD.size
+        RECORD.pack_into(self._map, offset, time, frame, int(track_id), player_position,
+                         STROKE_CODES.get(stroke, 0), flags, elbow_angle, wrist_speed,
+                         elbow_angle_speed, wrist_direction_change, velocidad)
+        self.count += 1
+        if self.count % 1024 == 0:
+            # Mantener la cabecera razonablemente al día por si el análisis se interrumpe
+            HEADER.pack_into(self._map, 0, MAGIC, RECORD.size, self.capacity, self.count)
+
+    def close(self):
+        """Escribe la cabecera final y libera el archivo."""
+        if self._map is None:
+            return
+        HEADER.pack_into(self._map, 0, MAGIC, RECORD.size, self.capacity, self.count)
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+        self._map = None
+        logger.info(f"Diagnóstico guardado en {self.path}: {self.count} registros")
+
+def create_recorder(path=None, capacity=200000):
+    """Devuelve un grabador real si se indica una ruta, o uno vacío en caso contrario."""
+    if not path:
+        return NullDiagnosticsRecorder()
+    return DiagnosticsRecorder(path, capacity)
+
+def read_records(path):
+    """Lee un archivo de diagnóstico y devuelve los registros en orden cronológico."""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    magic, record_size, capacity, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or record_size != RECORD.size:
+        raise ValueError(f"Archivo de diagnóstico no válido: {path}")
+
+    stored = min(count, capacity)
+    first = count - stored
+    records = []
+    for i in range(first, count):
+        offset = HEADER.size + (i % capacity) * RECORD.size
+        (time, frame, track_id, player_position, stroke, flags, elbow_angle, wrist_speed,
+         elbow_angle_speed, wrist_direction_change, velocidad) = RECORD.unpack_from(data, offset)
+        records.append({
+            'time': time,
+            'frame': frame,
+            'track_id': track_id,
+            'player_position': player_position,
+            'stroke': STROKE_TYPES[stroke] if stroke < len(STROKE_TYPES) else 'N/A',
+            'flags': [name for bit, name in FLAG_NAMES.items() if flags & bit],
+            'elbow_angle': elbow_angle,
+            'wrist_speed': wrist_speed,
+            'elbow_angle_speed': elbow_angle_speed,
+            'wrist_direction_change': wrist_direction_change,
+            'velocidad': velocidad
+        })
+    return records
@@ -0,0 +1,233 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_WORKERS = int(os.environ.get('PADEL_DOWNLOAD_WORKERS', 4))
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get('PADEL_DOWNLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+DOWNLOAD_RETRIES = int(os.environ.get('PADEL_DOWNLOAD_RETRIES', 5))
+DOWNLOAD_DIR = os.environ.get('PADEL_DOWNLOAD_DIR', '.')
+READ_SIZE = 256 * 1024
+
+class DownloadError(Exception):
+    """Descarga fallida tras agotar los reintentos o con tamaño/checksum incorrecto."""
+
+def create_session(pool_size=DOWNLOAD_WORKERS):
+    """Sesión HTTP con un pool de conexiones reutilizables del tamaño del número de workers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def _remote_info(session, url, timeout):
+    """Tamaño, soporte de rangos y validadores (ETag, MD5) del recurso remoto."""
+    # GET de un solo byte: algunos servidores firmados (GCS/Firebase) no aceptan HEAD
+    response = session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=timeout)
+    response.raise_for_status()
+    info = {'etag': response.headers.get('ETag'), 'md5': None}
+    for part in response.headers.get('x-goog-hash', '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name == 'md5' and value:
+            info['md5'] = base64.b64decode(value).hex()
+
+    content_range = response.headers.get('Content-Range', '')
+    if response.status_code == 206 and '/' in content_range and not content_range.endswith('/*'):
+        info['size'] = int(content_range.rsplit('/', 1)[1])
+        info['ranges'] = True
+    else:
+        length = response.headers.get('Content-Length')
+        info['size'] = int(length) if length is not None else None
+        info['ranges'] = False
+    response.close()
+    return info
+
+def file_hash(path, algorithm='sha256'):
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class RangedDownload:
+    """Descarga de un archivo en trozos paralelos con rangos HTTP, reanudable tras un fallo.
+
+    El progreso (trozos completos) se guarda junto al archivo parcial, así que una nueva llamada con la
+    misma URL y el mismo recurso remoto solo pide los trozos que faltan.
+    """
+
+    def __init__(self, url, local_path, workers=DOWNLOAD_WORKERS, chunk_size=DOWNLOAD_CHUNK_SIZE,
+                 retries=DOWNLOAD_RETRIES, timeout=30, session=None):
+        self.url = url
+        self.local_path = local_path
+        self.part_path = f"{local_path}.part"
+        self.state_path = f"{local_path}.part.json"
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.timeout = timeout
+        self.session = session or create_session(workers)
+        self.lock = threading.Lock()
+        self.stats = {'bytes': 0, 'chunks': 0, 'resumed_chunks': 0, 'retries': 0}
+
+    def _load_state(self, info):
+        if not (os.path.exists(self.part_path) and os.path.exists(self.state_path)):
+            return set()
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return set()
+        if (state.get('url') != self.url or state.get('size') != info['size'] or state.get('etag') != info['etag']
+                or state.get('chunk_size') != self.chunk_size or os.path.getsize(self.part_path) != info['size']):
+            return set()
+        return set(state.get('done', []))
+
+    def _save_state(self, info, done):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'url': self.url, 'size': info['size'], 'etag': info['etag'],
+                       'chunk_size': self.chunk_size, 'done': sorted(done)}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _fetch_chunk(self, fd, index, start, end):
+        """Descarga bytes [start, end] y los escribe en su posición; reintenta con espera exponencial."""
+        for attempt in range(self.retries + 1):
+            offset = start
+            try:
+                with self.session.get(self.url, headers={'Range': f"bytes={start}-{end}"}, stream=True, timeout=self.timeout) as response:
+                    if response.status_code != 206:
+                        raise DownloadError(f"Respuesta {response.status_code} a una petición de rango")
+                    for block in response.iter_content(chunk_size=READ_SIZE):
+                        os.pwrite(fd, block, offset)
+                        offset += len(block)
+                if offset != end + 1:
+                    raise DownloadError(f"Trozo {index} incompleto: {offset - start} de {end - start + 1} bytes")
+                with self.lock:
+                    self.stats['bytes'] += offset - start
+                return index
+            except (requests.exceptions.RequestException, DownloadError) as e:
+                if attempt == self.retries:
+                    raise DownloadError(f"Trozo {index} fallido tras {self.retries} reintentos: {str(e)}")
+                with self.lock:
+                    self.stats['retries'] += 1
+                delay = min(2 ** attempt * 0.5, 30)
+                logger.warning(f"Error descargando el trozo {index} ({str(e)}), reintentando en {delay:.1f}s")
+                time.sleep(delay)
+
+    def _download_ranges(self, info):
+        size = info['size']
+        chunks = [(i, start, min(start + self.chunk_size, size) - 1) for i, start in enumerate(range(0, size, self.chunk_size))]
+        done = self._load_state(info)
+        if done:
+            self.stats['resumed_chunks'] = len(done)
+            logger.info(f"Reanudando descarga: {len(done)}/{len(chunks)} trozos ya descargados")
+        else:
+            with open(self.part_path, 'wb') as f:
+                f.truncate(size)
+        self._save_state(info, done)
+
+        pending = [chunk for chunk in chunks if chunk[0] not in done]
+        fd = os.open(self.part_path, os.O_WRONLY)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(self._fetch_chunk, fd, *chunk) for chunk in pending]
+                error = None
+                for future in futures:
+                    try:
+                        index = future.result()
+                    except DownloadError as e:
+                        error = error or e
+                        continue
+                    with self.lock:
+                        done.add(index)
+                        self.stats['chunks'] += 1
+                        self._save_state(info, done)
+                if error is not None:
+                    raise error
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _download_stream(self, info):
+        """Servidor sin rangos: una sola conexión, con reintentos desde el principio."""
+        for attempt in range(self.retries + 1):
+            try:
+                with self.session.get(self.url, stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    with open(self.part_path, 'wb') as f:
+                        for block in response.iter_content(chunk_size=READ_SIZE):
+                            f.write(block)
+                            self.stats['bytes'] += len(block)
+                return
+            except requests.exceptions.RequestException as e:
+                if attempt == self.retries:
+                    raise DownloadError(f"Descarga fallida tras {self.retries} reintentos: {str(e)}")
+                self.stats['retries'] += 1
+                delay = min(2 ** attempt * 0.5, 30)
+                logger.warning(f"Error en la descarga ({str(e)}), reintentando en {delay:.1f}s")
+                time.sleep(delay)
+
+    def run(self, expected_sha256=None):
+        started = time.monotonic()
+        try:
+            info = _remote_info(self.session, self.url, self.timeout)
+        except requests.exceptions.RequestException as e:
+            raise DownloadError(f"No se pudo consultar el video: {str(e)}")
+
+        if info['ranges'] and info['size']:
+            self._download_ranges(info)
+        else:
+            self._download_stream(info)
+
+        # Verificación: tamaño anunciado y checksum (el indicado o el MD5 de x-goog-hash)
+        actual_size = os.path.getsize(self.part_path)
+        if info['size'] is not None and actual_size != info['size']:
+            raise DownloadError(f"Tamaño incorrecto: {actual_size} bytes, se esperaban {info['size']}")
+        if expected_sha256 and file_hash(self.part_path, 'sha256') != expected_sha256.lower():
+            self._discard()
+            raise DownloadError("El checksum SHA-256 no coincide")
+        if info['md5'] and file_hash(self.part_path, 'md5') != info['md5']:
+            self._discard()
+            raise DownloadError("El checksum MD5 del servidor no coincide")
+
+        os.replace(self.part_path, self.local_path)
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        elapsed = time.monotonic() - started
+        logger.info(f"Descargados {actual_size / 1024 ** 2:.1f} MiB en {elapsed:.1f}s "
+                    f"({actual_size / 1024 ** 2 / elapsed if elapsed > 0 else 0:.1f} MiB/s, {self.stats})")
+        return self.local_path
+
+    def _discard(self):
+        for path in (self.part_path, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+def temp_download_path(prefix, directory=DOWNLOAD_DIR):
+    """Ruta de descarga propia de un análisis: análisis simultáneos (hilos o procesos) no comparten archivos."""
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix=f"{prefix}_", suffix='.mp4', dir=directory)
+    os.close(fd)
+    return path
+
+def remove_download(local_path):
+    """Elimina el archivo descargado y su estado parcial (.part y .part.json), si existen."""
+    for path in (local_path, f"{local_path}.part", f"{local_path}.part.json", f"{local_path}.part.json.tmp"):
+        if os.path.exists(path):
+            os.remove(path)
+
+def download_video(url, local_path, expected_sha256=None, **kwargs):
+    """Descarga url en local_path con trozos paralelos, reanudación y verificación de tamaño/checksum."""
+    return RangedDownload(url, local_path, **kwargs).run(expected_sha256)
@@ -0,0 +1,298 @@
+import logging
+import multiprocessing
+import queue
+import traceback
+import zlib
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from .frame_preprocessing import FramePreprocessor
+from .video_decoder import create_decoder
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Los trabajadores heredan por fork el detector ya cargado, la cancha y el plan de muestreo; con spawn
+# tendrían que reimportar routes.padel_iq, que inicializa Firebase
+START_METHOD = 'fork'
+FRAME_SHAPE = (480, 640, 3)
+POLL_SECONDS = 0.1
+
+def landmark_points(pose_results):
+    """Landmarks de un resultado de MediaPipe Pose como lista de (x, y) normalizados, o None."""
+    if not pose_results or not pose_results.pose_landmarks:
+        return None
+    return [(landmark.x, landmark.y) for landmark in pose_results.pose_landmarks.landmark]
+
+def iter_game_frames(cap, sampling_plan, games, fps):
+    """Recorre los juegos del video y genera mensajes en orden:
+
+    ('start', juego, inicio, fin), ('frame', índice, timestamp, frame) para cada frame del plan de
+    muestreo y ('end', juego, fin, frames) con el contador de frames al terminar el juego.
+    """
+    for game_idx, start_time, end_time in games:
+        yield ('start', game_idx, start_time, end_time)
+        cap.seek(int(start_time * fps))
+        frame_count = int(start_time * fps)
+        while cap.is_opened() and frame_count < int(end_time * fps):
+            # Los frames fuera del plan se avanzan sin convertirlos
+            if not sampling_plan.includes(frame_count):
+                if not cap.skip():
+                    break
+                frame_count += 1
+                continue
+
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield ('frame', frame_count, cap.timestamp, frame)
+            frame_count += 1
+        yield ('end', game_idx, end_time, frame_count)
+
+class FrameBus:
+    """Anillo de buffers de memoria compartida para repartir frames entre procesos sin copiarlos.
+
+    El escritor toma un buffer libre, copia el frame y lo publica con tantas referencias como
+    lectores lo vayan a usar; cada lector lo ve con view() (un array sobre la memoria compartida) y
+    llama a release() al terminar. El buffer vuelve a la cola de libres cuando su contador llega a
+    cero; si no queda ninguno, publish() espera: el decodificador nunca va más de slots frames por
+    delante del consumidor más lento.
+    """
+
+    def __init__(self, slots=8, shape=FRAME_SHAPE, ctx=None):
+        ctx = ctx or multiprocessing.get_context(START_METHOD)
+        self.slots = slots
+        self.shape = shape
+        self.frame_bytes = int(np.prod(shape))
+        self._shm = shared_memory.SharedMemory(create=True, size=self.frame_bytes * slots)
+        self._refcounts = ctx.Array('i', slots)
+        self._free = ctx.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    def view(self, slot):
+        """Frame del buffer como array de NumPy, sin copia."""
+        return np.ndarray(self.shape, dtype=np.uint8, buffer=self._shm.buf, offset=slot * self.frame_bytes)
+
+    def publish(self, frame, readers, stop=None):
+        """Copia el frame en un buffer libre con readers referencias; devuelve el buffer (None si se detuvo)."""
+        while True:
+            try:
+                slot = self._free.get(timeout=POLL_SECONDS)
+                break
+            except queue.Empty:
+                if stop is not None and stop.is_set():
+                    return None
+        target = self.view(slot)
+        if frame.shape == self.shape:
+            np.copyto(target, frame)
+        else:
+            cv2.resize(frame, (self.shape[1], self.shape[0]), dst=target)
+        with self._refcounts.get_lock():
+            self._refcounts[slot] = readers
+        return slot
+
+    def release(self, slot):
+        """Suelta una referencia al buffer; el último lector lo devuelve a la cola de libres."""
+        with self._refcounts.get_lock():
+            self._refcounts[slot] -= 1
+            free = self._refcounts[slot] == 0
+        if free:
+            self._free.put(slot)
+
+    def close(self, unlink=True):
+        try:
+            self._shm.close()
+        except BufferError:
+            # Quedan vistas vivas del buffer; la memoria se libera al salir del proceso
+            logger.debug("Bus de frames cerrado con vistas activas")
+        if unlink:
+            self._shm.unlink()
+        self._free.close()
+
+def _decoder_worker(bus, ruta_video, decoder_backend, games, sampling_plan, readers, output, stop):
+    """Proceso decodificador: escribe los frames del plan en el bus y encola los mensajes numerados."""
+    seq = 0
+    cap = create_decoder(ruta_video, decoder_backend, width=bus.shape[1], height=bus.shape[0])
+    try:
+        for message in iter_game_frames(cap, sampling_plan, games, cap.fps):
+            if message[0] == 'frame':
+                _, frame_index, timestamp, frame = message
+                slot = bus.publish(frame, readers, stop)
+                if slot is None:
+                    return
+                message = ('frame', frame_index, timestamp, slot, None)
+            output.put((seq, message))
+            seq += 1
+        output.put((seq, ('done',)))
+    except Exception:
+        output.put((seq, ('error', traceback.format_exc())))
+    finally:
+        cap.release()
+
+def _detection_worker(bus, detector, court, inbox, output):
+    """Proceso de detección: añade las cajas de personas a cada mensaje de frame y lo reenvía."""
+    while True:
+        item = inbox.get()
+        if item is None:
+            return
+        seq, message = item
+        try:
+            if message[0] == 'frame':
+                _, frame_index, timestamp, slot, _ = message
+                boxes = court.detect(detector, bus.view(slot), 0.5)
+                bus.release(slot)
+                message = ('frame', frame_index, timestamp, slot, boxes)
+        except Exception:
+            message = ('error', traceback.format_exc())
+        output.put((seq, message))
+
+def _pose_worker(bus, pose_factory, inbox, output):
+    """Proceso de pose: recorta la ROI del frame compartido y devuelve los landmarks de MediaPipe."""
+    pose = pose_factory()
+    preprocessor = FramePreprocessor(width=bus.shape[1], height=bus.shape[0])
+    while True:
+        item = inbox.get()
+        if item is None:
+            return
+        request_id, slot, (x1, y1, x2, y2), scale = item
+        try:
+            # Misma entrada que la ROI del frame RGB en el proceso principal
+            roi = cv2.cvtColor(bus.view(slot)[y1:y2, x1:x2], cv2.COLOR_BGR2RGB)
+            output.put((request_id, landmark_points(pose.process(preprocessor.enhance_roi(roi, scale)))))
+        except Exception:
+            output.put((request_id, ('error', traceback.format_exc())))
+
+class PosePool:
+    """Estimación de pose de todas las ROI de un frame en paralelo, en procesos que leen del bus.
+
+    Cada track se envía siempre al mismo trabajador, de modo que el seguimiento interno de MediaPipe
+    de cada proceso ve la secuencia completa de sus jugadores.
+    """
+
+    def __init__(self, bus, inboxes, output, processes):
+        self.bus = bus
+        self.inboxes = inboxes
+        self.output = output
+        self.processes = processes
+        self.stats = {'frames': 0, 'rois': 0}
+
+    def estimate(self, slot, requests):
+        """requests: [(track_id, (x1, y1, x2, y2), escala)] -> {track_id: landmarks o None}."""
+        self.stats['frames'] += 1
+        self.stats['rois'] += len(requests)
+        for request_id, (track_id, roi_box, scale) in enumerate(requests):
+            worker = zlib.crc32(str(track_id).encode()) % len(self.inboxes)
+            self.inboxes[worker].put((request_id, slot, roi_box, scale))
+        results = {}
+        while len(results) < len(requests):
+            request_id, points = _get(self.output, self.processes)
+            if isinstance(points, tuple) and points[0] == 'error':
+                raise RuntimeError(f"Error en el trabajador de pose:\n{points[1]}")
+            results[requests[request_id][0]] = points
+        return results
+
+def _get(output, processes):
+    """Siguiente resultado de la cola; falla si algún trabajador murió sin responder."""
+    while True:
+        try:
+            return output.get(timeout=POLL_SECONDS)
+        except queue.Empty:
+            dead = [p for p in processes if p.exitcode not in (None, 0)]
+            if dead:
+                raise RuntimeError(f"El proceso {dead[0].name} terminó con código {dead[0].exitcode}")
+
+class FramePipeline:
+    """Decodificación, detección y pose de segmentar_video_juego en procesos separados sobre un FrameBus.
+
+    Un proceso decodifica los frames del plan de muestreo de cada juego y los escribe en el bus;
+    detection_workers procesos les añaden las cajas de YOLO (0 si la detección va con el
+    DetectionScheduler, que necesita los tracks de la muestra anterior) y pose_workers procesos
+    estiman la pose de las ROI. messages() entrega en orden los mismos mensajes que
+    iter_game_frames, con el frame como vista del bus y las cajas ya calculadas.
+    """
+
+    def __init__(self, ruta_video, decoder_backend, games, sampling_plan, court, detector=None, pose_factory=None,
+                 slots=8, detection_workers=1, pose_workers=2):
+        ctx = multiprocessing.get_context(START_METHOD)
+        if detector is None:
+            detection_workers = 0
+        # Cada frame lo leen el proceso principal y, si lo hay, un trabajador de detección
+        self.bus = FrameBus(slots, ctx=ctx)
+        self.stop = ctx.Event()
+        self.output = ctx.Queue()
+        self.processes = []
+        self._queues = [self.output]
+
+        decoded = self.output
+        if detection_workers > 0:
+            decoded = ctx.Queue()
+            self._detection_inbox = decoded
+            self._queues.append(decoded)
+            for i in range(detection_workers):
+                self._start(ctx, f"padel-detection-{i}", _detection_worker, self.bus, detector, court, decoded, self.output)
+        self.detection_workers = detection_workers
+        self._start(ctx, "padel-decoder", _decoder_worker, self.bus, ruta_video, decoder_backend, games, sampling_plan,
+                    1 + (detection_workers > 0), decoded, self.stop)
+
+        self.pose_pool = None
+        if pose_factory is not None and pose_workers > 0:
+            inboxes = [ctx.Queue() for _ in range(pose_workers)]
+            pose_output = ctx.Queue()
+            self._queues += inboxes + [pose_output]
+            for i, inbox in enumerate(inboxes):
+                self._start(ctx, f"padel-pose-{i}", _pose_worker, self.bus, pose_factory, inbox, pose_output)
+            self.pose_pool = PosePool(self.bus, inboxes, pose_output, self.processes)
+        logger.info(f"Bus de frames: {slots} buffers, {detection_workers} procesos de detección, {pose_workers if self.pose_pool else 0} de pose")
+
+    def _start(self, ctx, name, target, *args):
+        process = ctx.Process(target=target, args=args, name=name, daemon=True)
+        process.start()
+        self.processes.append(process)
+
+    def messages(self):
+        """Mensajes de iter_game_frames en orden; el buffer de cada frame se libera al pedir el siguiente."""
+        pending = {}
+        next_seq = 0
+        while True:
+            while next_seq not in pending:
+                seq, message = _get(self.output, self.processes)
+                pending[seq] = message
+            message = pending.pop(next_seq)
+            next_seq += 1
+            kind = message[0]
+            if kind == 'done':
+                return
+            if kind == 'error':
+                raise RuntimeError(f"Error en el pipeline de frames:\n{message[1]}")
+            if kind != 'frame':
+                yield message
+                continue
+            _, frame_index, timestamp, slot, boxes = message
+            try:
+                yield ('frame', frame_index, timestamp, self.bus.view(slot), boxes, slot)
+            finally:
+                self.bus.release(slot)
+
+    def close(self):
+        """Detiene los procesos y libera la memoria compartida."""
+        self.stop.set()
+        for _ in range(self.detection_workers):
+            self._detection_inbox.put(None)
+        if self.pose_pool is not None:
+            for inbox in self.pose_pool.inboxes:
+                inbox.put(None)
+        for process in self.processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        for q in self._queues:
+            q.close()
+            q.cancel_join_thread()
+        self.bus.close()
+
+    def report(self):
+        if self.pose_pool is not None:
+            logger.info(f"Pose en paralelo: {self.pose_pool.stats}")
@@ -0,0 +1,76 @@
+import logging
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class FramePreprocessor:
+    """Redimensiona y convierte cada frame una sola vez en buffers reutilizados por el mismo trabajador.
+
+    Los buffers se sobrescriben en cada llamada: no es seguro compartir una instancia entre hilos
+    ni conservar los arrays devueltos más allá del frame actual.
+    """
+
+    def __init__(self, width=640, height=480, roi_quantum=8, max_roi_buffers=32):
+        self.width = width
+        self.height = height
+        self.roi_quantum = roi_quantum  # Redondeo del tamaño de las ROI para reutilizar sus buffers
+        self.max_roi_buffers = max_roi_buffers
+        self.bgr = np.empty((height, width, 3), dtype=np.uint8)
+        self.rgb = np.empty((height, width, 3), dtype=np.uint8)
+        self._roi_buffers = OrderedDict()
+        self.stats = {'frames': 0, 'rois': 0, 'buffer_allocations': 2}
+
+    def load(self, frame):
+        """Redimensiona el frame decodificado a la resolución de análisis y genera su versión RGB."""
+        self.stats['frames'] += 1
+        if frame.shape[0] == self.height and frame.shape[1] == self.width:
+            np.copyto(self.bgr, frame)
+        else:
+            cv2.resize(frame, (self.width, self.height), dst=self.bgr)
+        cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        return self.bgr, self.rgb
+
+    def roi(self, x1, y1, x2, y2):
+        """Vista (sin copia) de la ROI en el frame RGB, con coordenadas de la resolución de análisis."""
+        x1 = max(0, int(x1))
+        y1 = max(0, int(y1))
+        x2 = min(self.width, int(x2))
+        y2 = min(self.height, int(y2))
+        return self.rgb[y1:y2, x1:x2], (x1, y1, x2, y2)
+
+    def _buffers(self, width, height):
+        key = (height, width)
+        buffers = self._roi_buffers.get(key)
+        if buffers is None:
+            buffers = {
+                'resized': np.empty((height, width, 3), dtype=np.uint8),
+                'gray': np.empty((height, width), dtype=np.uint8),
+                'equalized': np.empty((height, width), dtype=np.uint8),
+                'enhanced': np.empty((height, width, 3), dtype=np.uint8)
+            }
+            self.stats['buffer_allocations'] += len(buffers)
+            self._roi_buffers[key] = buffers
+            if len(self._roi_buffers) > self.max_roi_buffers:
+                self._roi_buffers.popitem(last=False)
+        else:
+            self._roi_buffers.move_to_end(key)
+        return buffers
+
+    def enhance_roi(self, roi, scale):
+        """Escala la ROI y ecualiza su histograma (equivalente a enhance_image) en buffers reutilizados."""
+        self.stats['rois'] += 1
+        roi_height, roi_width = roi.shape[:2]
+        quantum = self.roi_quantum
+        new_width = max(quantum, int(round(roi_width * scale / quantum)) * quantum)
+        new_height = max(quantum, int(round(roi_height * scale / quantum)) * quantum)
+
+        buffers = self._buffers(new_width, new_height)
+        cv2.resize(roi, (new_width, new_height), dst=buffers['resized'])
+        cv2.cvtColor(buffers['resized'], cv2.COLOR_RGB2GRAY, dst=buffers['gray'])
+        cv2.equalizeHist(buffers['gray'], dst=buffers['equalized'])
+        cv2.cvtColor(buffers['equalized'], cv2.COLOR_GRAY2RGB, dst=buffers['enhanced'])
+        return buffers['enhanced']
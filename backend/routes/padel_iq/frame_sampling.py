@@ -0,0 +1,117 @@
+import logging
+import cv2
+import numpy as np
+from .video_decoder import create_decoder
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class SamplingPlan:
+    """Conjunto de índices de frame que los segmentadores deben procesar."""
+
+    def __init__(self, mask, tail_frame_skip, windows=None, stats=None):
+        self.mask = mask
+        self.tail_frame_skip = tail_frame_skip  # Paso fijo para frames más allá del total estimado
+        self.windows = windows or []
+        self.stats = stats or {}
+
+    @classmethod
+    def uniform(cls, total_frames, frame_skip):
+        """Plan equivalente al muestreo fijo de un frame cada frame_skip."""
+        mask = np.zeros(max(total_frames, 0), dtype=bool)
+        mask[frame_skip - 1::frame_skip] = True
+        return cls(mask, frame_skip, stats={'mode': 'uniform', 'frame_skip': frame_skip, 'sampled_frames': int(mask.sum())})
+
+    def includes(self, frame_index):
+        """Indica si el frame (índice desde 0) debe procesarse."""
+        if frame_index < len(self.mask):
+            return bool(self.mask[frame_index])
+        return (frame_index + 1) % self.tail_frame_skip == 0
+
+    def __len__(self):
+        return int(self.mask.sum())
+
+def measure_activity(video_path, coarse_frame_skip, thumb_size=(160, 120), decoder_backend=None):
+    """Pasada gruesa: diferencia media entre miniaturas en gris cada coarse_frame_skip frames."""
+    cap = create_decoder(video_path, decoder_backend, width=thumb_size[0], height=thumb_size[1])
+    if not cap.is_opened():
+        logger.error("No se pudo abrir el video para medir la actividad")
+        return [], 0
+
+    activity = []
+    prev_thumb = None
+    frame_index = 0
+    while True:
+        # Los frames que no se analizan se avanzan sin convertirlos
+        if frame_index % coarse_frame_skip != 0:
+            if not cap.skip():
+                break
+            frame_index += 1
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if prev_thumb is not None:
+            activity.append((frame_index, float(np.mean(cv2.absdiff(gray, prev_thumb)))))
+        prev_thumb = gray
+        frame_index += 1
+
+    cap.release()
+    return activity, frame_index
+
+def build_sampling_plan(video_path, total_frames, custom_params):
+    """Construye un plan adaptativo: muestreo denso en ventanas de alta actividad y escaso en el resto."""
+    frame_skip = custom_params.get('frame_skip', 12)
+    coarse_frame_skip = custom_params.get('coarse_frame_skip', 30)
+    dense_frame_skip = custom_params.get('dense_frame_skip', 2)
+    idle_frame_skip = custom_params.get('idle_frame_skip', frame_skip * 2)
+    min_activity = custom_params.get('min_activity', 2.0)
+    activity_percentile = custom_params.get('activity_percentile', 60)
+
+    activity, decoded_frames = measure_activity(video_path, coarse_frame_skip,
+                                                decoder_backend=custom_params.get('decoder_backend'))
+    # CAP_PROP_FRAME_COUNT no es fiable en videos de móvil; usar lo que realmente se decodificó
+    total_frames = decoded_frames or total_frames
+    if not activity:
+        logger.info("Sin datos de actividad, usando muestreo uniforme")
+        return SamplingPlan.uniform(total_frames, frame_skip)
+
+    scores = np.array([score for _, score in activity])
+    threshold = max(min_activity, float(np.percentile(scores, activity_percentile)))
+
+    # Cada medida compara dos muestras gruesas: la ventana cubre ambas y un paso de margen a cada lado
+    windows = []
+    for frame_index, score in activity:
+        if score < threshold:
+            continue
+        start = max(0, frame_index - 2 * coarse_frame_skip)
+        end = min(total_frames, frame_index + coarse_frame_skip)
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], end)
+        else:
+            windows.append((start, end))
+
+    mask = np.zeros(total_frames, dtype=bool)
+    mask[idle_frame_skip - 1::idle_frame_skip] = True
+    for start, end in windows:
+        mask[start:end:dense_frame_skip] = True
+
+    dense_frames = sum(end - start for start, end in windows)
+    stats = {
+        'mode': 'adaptive',
+        'activity_threshold': threshold,
+        'windows': len(windows),
+        'dense_ratio': dense_frames / total_frames if total_frames > 0 else 0.0,
+        'sampled_frames': int(mask.sum()),
+        'uniform_frames': total_frames // frame_skip
+    }
+    logger.info(f"Plan de muestreo adaptativo: {stats}")
+    return SamplingPlan(mask, idle_frame_skip, windows, stats)
+
+def create_sampling_plan(video_path, total_frames, custom_params):
+    """Devuelve el plan adaptativo si está activado en los parámetros, o el uniforme en caso contrario."""
+    if custom_params.get('adaptive_sampling', False):
+        return build_sampling_plan(video_path, total_frames, custom_params)
+    return SamplingPlan.uniform(total_frames, custom_params['frame_skip'])
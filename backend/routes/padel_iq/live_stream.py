@@ -0,0 +1,253 @@
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from .frame_sampling import SamplingPlan
+from .utils import calcular_metricas_padel_iq
+from .video_decoder import create_decoder
+from .video_processing import GameSegmenter, analizar_segmento_juego, create_detector, create_pose, create_tracker
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Reproducir archivos locales como fuente en vivo solo si se habilita explícitamente (pruebas)
+ALLOW_FILE_SOURCES = os.environ.get('PADEL_LIVE_ALLOW_FILES', '0') == '1'
+LIVE_SESSION_TTL = int(os.environ.get('PADEL_LIVE_SESSION_TTL', 600))  # Segundos que se conserva una sesión terminada
+STREAM_PREFIXES = ('rtsp://', 'rtsps://', 'rtmp://', 'http://', 'https://')
+
+def _json_default(value):
+    # Los golpes contienen escalares de NumPy
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+def is_valid_source(source_url):
+    """Acepta URLs RTSP/RTMP/HLS; los archivos locales solo con PADEL_LIVE_ALLOW_FILES=1."""
+    if source_url.startswith(STREAM_PREFIXES):
+        return True
+    return ALLOW_FILE_SOURCES and os.path.isfile(source_url)
+
+def stream_frames(source_url, decoder_backend=None, realtime=False):
+    """Genera (frame, timestamp) de una URL en vivo o de un archivo, opcionalmente a velocidad real."""
+    cap = create_decoder(source_url, decoder_backend, width=640, height=480)
+    if not cap.is_opened():
+        raise ValueError(f"No se pudo abrir la fuente en vivo: {source_url}")
+    started = time.monotonic()
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if realtime:
+                delay = started + cap.timestamp - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            yield frame, cap.timestamp, cap.fps
+    finally:
+        cap.release()
+
+def chunk_frames(chunks, decoder_backend=None):
+    """Genera (frame, timestamp) de fragmentos de video subidos en orden (cada uno decodificable por sí solo)."""
+    offset = 0.0
+    while True:
+        chunk_path = chunks.get()
+        if chunk_path is None:
+            break
+        cap = create_decoder(chunk_path, decoder_backend, width=640, height=480)
+        if not cap.is_opened():
+            logger.error(f"Fragmento no decodificable, se descarta: {chunk_path}")
+            os.remove(chunk_path)
+            continue
+        decoded = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            decoded += 1
+            yield frame, offset + cap.timestamp, cap.fps
+        offset += decoded / cap.fps
+        cap.release()
+        os.remove(chunk_path)
+
+class LiveAnalysisSession:
+    """Análisis incremental de una fuente en vivo que publica eventos de golpe por lotes, poco después de cerrarse.
+
+    Equivale a analizar_video_juego(game_splits=[], adaptive_sampling=False) con dos diferencias:
+    no se aplica segment_refinement (la segunda pasada necesita volver a leer el video) ni se
+    calibra la cancha con court_mask; solo se usan court_polygon o camera_id de los parámetros.
+    """
+
+    def __init__(self, user_id, player_position, custom_params, source_url=None, realtime=False, stroke_filter=None):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.player_position = player_position
+        self.custom_params = dict(custom_params)
+        self.source_url = source_url
+        self.realtime = realtime
+        self.stroke_filter = stroke_filter  # Mismo post-filtro que el análisis por lotes
+        self.status = 'pending'
+        self.finished_at = None
+        self.condition = threading.Condition()
+        self.events = []
+        self.golpes_clasificados = {}
+        self.stop_requested = False
+        self.chunks = None
+        self.chunk_dir = None
+        self.chunk_count = 0
+        if source_url is None:
+            self.chunks = queue.Queue()
+            self.chunk_dir = tempfile.mkdtemp(prefix=f"live_{self.id}_")
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.status = 'running'
+        self.thread.start()
+
+    def add_chunk(self, data):
+        """Guarda un fragmento subido y lo encola para su decodificación."""
+        if self.chunks is None:
+            raise ValueError("La sesión no acepta fragmentos")
+        chunk_path = os.path.join(self.chunk_dir, f"{self.chunk_count:06d}.chunk")
+        with open(chunk_path, 'wb') as f:
+            f.write(data)
+        self.chunk_count += 1
+        self.chunks.put(chunk_path)
+
+    def finish_upload(self):
+        if self.chunks is not None:
+            self.chunks.put(None)
+
+    def stop(self):
+        self.stop_requested = True
+        self.finish_upload()
+
+    def emit(self, event, data):
+        with self.condition:
+            self.events.append((len(self.events) + 1, event, json.dumps(data, default=_json_default)))
+            self.condition.notify_all()
+
+    def wait_events(self, last_event_id, timeout=15.0):
+        """Eventos posteriores a last_event_id; espera hasta timeout si no hay ninguno nuevo."""
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.events) > last_event_id or self.finished_at is not None, timeout)
+            return self.events[last_event_id:], self.finished_at is not None
+
+    def _frames(self):
+        if self.chunks is not None:
+            return chunk_frames(self.chunks, self.custom_params.get('decoder_backend'))
+        return stream_frames(self.source_url, self.custom_params.get('decoder_backend'), self.realtime)
+
+    def _emit_strokes(self, segmentos, segmenter, current_time):
+        for segmento in segmentos:
+            golpes = analizar_segmento_juego(segmento, self.source_url, segmenter.player_trajectories)
+            if self.stroke_filter is not None and golpes:
+                golpes = [golpe for tipo_golpes in self.stroke_filter({golpes[0]['tipo']: golpes}).values() for golpe in tipo_golpes]
+            for golpe in golpes:
+                self.golpes_clasificados.setdefault(golpe['tipo'], []).append(golpe)
+                self.emit('stroke', {
+                    'golpe': golpe,
+                    'metrics': calcular_metricas_padel_iq(self.golpes_clasificados, current_time, 'juego')
+                })
+
+    def _run(self):
+        frame_skip = self.custom_params['frame_skip']
+        # Sin conocer la duración no hay pasada gruesa: muestreo uniforme, como con adaptive_sampling=False
+        sampling_plan = SamplingPlan.uniform(0, frame_skip)
+        # Los golpes cerrados se clasifican por lotes, una vez cada flush_seconds de video
+        flush_seconds = self.custom_params.get('live_flush_seconds', 1.0)
+        segmenter = None
+        current_time = 0.0
+        last_flush = 0.0
+        frame_index = 0
+        try:
+            for frame, timestamp, fps in self._frames():
+                if self.stop_requested:
+                    break
+                if segmenter is None:
+                    # Modelos propios de la sesión: el tracker y MediaPipe guardan estado entre frames
+                    segmenter = GameSegmenter(self.player_position, self.custom_params, fps,
+                                              detector=create_detector(),
+                                              tracker=create_tracker(self.custom_params.get('tracker_backend')),
+                                              pose_estimator=create_pose())
+                current_time = timestamp
+                if sampling_plan.includes(frame_index):
+                    segmenter.process_frame(frame, timestamp, frame_index)
+                    if timestamp - last_flush >= flush_seconds:
+                        self._emit_strokes(segmenter.flush(), segmenter, current_time)
+                        last_flush = timestamp
+                frame_index += 1
+
+            if segmenter is not None:
+                video_duration = frame_index / segmenter.fps
+                closed = segmenter.end_game(video_duration, video_duration)
+                self._emit_strokes(closed, segmenter, video_duration)
+                segmenter.report()
+            else:
+                video_duration = 0.0
+            self.status = 'stopped' if self.stop_requested else 'finished'
+            self.emit('end', {
+                'status': self.status,
+                'video_duration': video_duration,
+                'golpes_clasificados': self.golpes_clasificados,
+                'metrics': calcular_metricas_padel_iq(self.golpes_clasificados, video_duration, 'juego')
+            })
+        except Exception as e:
+            logger.error(f"Error en la sesión en vivo {self.id}: {str(e)}")
+            self.status = 'error'
+            self.emit('error', {'error': str(e)})
+        finally:
+            if self.chunk_dir:
+                shutil.rmtree(self.chunk_dir, ignore_errors=True)
+            with self.condition:
+                self.finished_at = time.monotonic()
+                self.condition.notify_all()
+
+class LiveSessionRegistry:
+    """Sesiones en vivo activas en este proceso."""
+
+    def __init__(self, ttl=LIVE_SESSION_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.sessions = {}
+
+    def add(self, session):
+        self.prune()
+        with self.lock:
+            self.sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        with self.lock:
+            return self.sessions.get(session_id)
+
+    def remove(self, session_id):
+        with self.lock:
+            return self.sessions.pop(session_id, None)
+
+    def prune(self):
+        """Olvida las sesiones terminadas hace más de ttl segundos."""
+        now = time.monotonic()
+        with self.lock:
+            expired = [sid for sid, s in self.sessions.items() if s.finished_at is not None and now - s.finished_at > self.ttl]
+            for sid in expired:
+                del self.sessions[sid]
+
+def sse_events(session, last_event_id=0):
+    """Generador de Server-Sent Events para una sesión, reanudable con Last-Event-ID."""
+    while True:
+        events, finished = session.wait_events(last_event_id)
+        for event_id, event, data in events:
+            yield f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+            last_event_id = event_id
+        if finished and not events:
+            break
+        if not events:
+            yield ": keepalive\n\n"
@@ -1,21 +1,15 @@
 import logging
 import numpy as np
+from .court_region import CourtRegion
+from .trajectory_store import has_player_position, points_between
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def calculate_pair_metrics(player_trajectories, golpes_clasificados, team_a_positions=(1, 2), team_b_positions=(3, 4)):
-    """Calcula métricas para las parejas (Equipo A: Jugadores 1 y 2, Equipo B: Jugadores 3 y 4)."""
-    team_a_metrics = {
-        'court_coverage': 0.0,
-        'movement_synchronization': 0.0,
-        'participation_balance': 0.0,
-        'joint_response': 0.0,
-        'positioning_errors': 0,
-        'positioning_error_responsible': None
-    }
-    team_b_metrics = {
+def empty_team_metrics():
+    """Métricas de un equipo sin datos (todas a cero)."""
+    return {
         'court_coverage': 0.0,
         'movement_synchronization': 0.0,
         'participation_balance': 0.0,
@@ -24,6 +18,24 @@ def calculate_pair_metrics(player_trajectories, golpes_clasificados, team_a_posi
         'positioning_error_responsible': None
     }
 
+def empty_pair_metrics():
+    """Métricas de parejas vacías, con el mismo esquema que calculate_pair_metrics (videos de un jugador)."""
+    return {'team_a': empty_team_metrics(), 'team_b': empty_team_metrics()}
+
+def _court_zone(positions, avg_y, court):
+    """Zona ('red' o 'fondo') de un jugador según la zona de la cancha calibrada guardada en su trayectoria.
+
+    Las trayectorias sin zona guardada se separan por el centro de court.
+    """
+    zones = [p['zone'] for p in positions if 'zone' in p] or [court.zone(avg_y)]
+    return 'red' if 2 * zones.count('net') >= len(zones) else 'fondo'
+
+def calculate_pair_metrics(player_trajectories, golpes_clasificados, team_a_positions=(1, 2), team_b_positions=(3, 4), court=None):
+    """Calcula métricas para las parejas (Equipo A: Jugadores 1 y 2, Equipo B: Jugadores 3 y 4)."""
+    court = court or CourtRegion.full_frame()
+    team_a_metrics = empty_team_metrics()
+    team_b_metrics = empty_team_metrics()
+
     # Contar golpes por jugador para calcular el balance de participación
     team_a_strokes = {1: 0, 2: 0}
     team_b_strokes = {3: 0, 4: 0}
@@ -86,8 +98,8 @@ def calculate_pair_metrics(player_trajectories, golpes_clasificados, team_a_posi
             striker_positions = {}
             for pos in striker_team_positions:
                 for track_id, traj in player_trajectories.items():
-                    if any(t['player_position'] == pos for t in traj):
-                        positions = [p for p in traj if start_time <= p['time'] <= end_time]
+                    if has_player_position(traj, pos):
+                        positions = points_between(traj, start_time, end_time)
                         if positions:
                             striker_positions[pos] = positions
 
@@ -97,8 +109,8 @@ def calculate_pair_metrics(player_trajectories, golpes_clasificados, team_a_posi
                 # Cobertura
                 avg_y_1 = np.mean([p['position'][1] for p in pos_1]) if pos_1 else 0
                 avg_y_2 = np.mean([p['position'][1] for p in pos_2]) if pos_2 else 0
-                zone_1 = 'red' if avg_y_1 < 240 else 'fondo'
-                zone_2 = 'red' if avg_y_2 < 240 else 'fondo'
+                zone_1 = _court_zone(pos_1, avg_y_1, court)
+                zone_2 = _court_zone(pos_2, avg_y_2, court)
                 if zone_1 != zone_2:
                     if striker_team == 'team_a':
                         coverage_team_a += 1
@@ -119,8 +131,8 @@ def calculate_pair_metrics(player_trajectories, golpes_clasificados, team_a_posi
             defender_positions = {}
             for pos in defending_positions:
                 for track_id, traj in player_trajectories.items():
-                    if any(t['player_position'] == pos for t in traj):
-                        positions = [p for p in traj if start_time <= p['time'] <= end_time]
+                    if has_player_position(traj, pos):
+                        positions = points_between(traj, start_time, end_time)
                         if positions:
                             defender_positions[pos] = positions
 
@@ -134,8 +146,8 @@ def calculate_pair_metrics(player_trajectories, golpes_clasificados, team_a_posi
                     # Asumimos que la pelota está cerca del jugador que golpea
                     striker_pos_xy = None
                     for track_id, traj in player_trajectories.items():
-                        if any(t['player_position'] == striker_pos for t in traj):
-                            positions = [p for p in traj if start_time <= p['time'] <= end_time]
+                        if has_player_position(traj, striker_pos):
+                            positions = points_between(traj, start_time, end_time)
                             if positions:
                                 striker_pos_xy = positions[-1]['position']
                                 break
@@ -155,8 +167,8 @@ def calculate_pair_metrics(player_trajectories, golpes_clasificados, team_a_posi
                 # Errores de posicionamiento
                 avg_y_1 = np.mean([p['position'][1] for p in pos_1]) if pos_1 else 0
                 avg_y_2 = np.mean([p['position'][1] for p in pos_2]) if pos_2 else 0
-                zone_1 = 'red' if avg_y_1 < 240 else 'fondo'
-                zone_2 = 'red' if avg_y_2 < 240 else 'fondo'
+                zone_1 = _court_zone(pos_1, avg_y_1, court)
+                zone_2 = _court_zone(pos_2, avg_y_2, court)
                 dist_between = np.sqrt((avg_y_1 - avg_y_2)**2 + (pos_1[-1]['position'][0] - pos_2[-1]['position'][0])**2) if pos_1 and pos_2 else 0
 
                 if dist_between < 100 or dist_between > 400 or zone_1 == zone_2:
@@ -0,0 +1,123 @@
+import importlib.util
+import logging
+import os
+import shutil
+from ultralytics import YOLO
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = os.environ.get('PADEL_DETECTOR_BACKEND', 'pytorch')
+DEFAULT_MODEL = os.environ.get('PADEL_DETECTOR_MODEL', 'yolov8n.pt')
+DEFAULT_IMGSZ = int(os.environ.get('PADEL_DETECTOR_IMGSZ', 640))
+DEFAULT_INT8 = os.environ.get('PADEL_DETECTOR_INT8', '0') == '1'
+MODEL_DIR = os.environ.get('PADEL_MODEL_DIR', 'models')
+# Dataset de calibración para la cuantización INT8 de OpenVINO
+INT8_CALIBRATION_DATA = os.environ.get('PADEL_DETECTOR_INT8_DATA', 'coco128.yaml')
+PERSON_CLASS = 0
+
+BACKENDS = ('pytorch', 'onnx', 'openvino')
+
+def _runtime_available(backend):
+    """Comprueba si el runtime del backend exportado está instalado."""
+    module = {'onnx': 'onnxruntime', 'openvino': 'openvino'}.get(backend)
+    return module is None or importlib.util.find_spec(module) is not None
+
+def exported_model_path(model_path, backend, imgsz, int8, model_dir=MODEL_DIR):
+    """Ruta del modelo exportado; el nombre incluye tamaño de entrada y cuantización para no mezclar variantes."""
+    name = f"{os.path.splitext(os.path.basename(model_path))[0]}_{imgsz}{'_int8' if int8 else ''}"
+    # Ultralytics reconoce el formato por el sufijo del nombre
+    if backend == 'onnx':
+        return os.path.join(model_dir, f"{name}.onnx")
+    return os.path.join(model_dir, f"{name}_openvino_model")
+
+def _quantize_onnx(source_path, target_path):
+    """Cuantización dinámica INT8 de los pesos con ONNX Runtime."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(source_path, target_path, weight_type=QuantType.QUInt8)
+
+def export_model(model_path, backend, imgsz=DEFAULT_IMGSZ, int8=DEFAULT_INT8, model_dir=MODEL_DIR):
+    """Exporta el modelo PyTorch a ONNX u OpenVINO con entrada fija, reutilizando la exportación previa."""
+    target = exported_model_path(model_path, backend, imgsz, int8, model_dir)
+    if os.path.exists(target):
+        return target
+
+    os.makedirs(model_dir, exist_ok=True)
+    logger.info(f"Exportando {model_path} a {backend} (imgsz={imgsz}, int8={int8})")
+    model = YOLO(model_path)
+    # OpenVINO cuantiza durante la exportación (NNCF); ONNX se cuantiza después con ONNX Runtime
+    intermediate = f"{os.path.splitext(model_path)[0]}.onnx"
+    keep_intermediate = os.path.exists(intermediate)
+    export_args = {'format': backend, 'imgsz': imgsz, 'dynamic': False, 'half': False, 'simplify': backend == 'onnx'}
+    if int8 and backend == 'openvino':
+        export_args.update(int8=True, data=INT8_CALIBRATION_DATA)
+    exported = model.export(**export_args).rstrip(os.sep)
+    if backend == 'openvino' and not keep_intermediate and os.path.exists(intermediate):
+        # La exportación a OpenVINO deja el ONNX intermedio junto a los pesos
+        os.remove(intermediate)
+    if backend == 'onnx' and int8:
+        _quantize_onnx(exported, target)
+        os.remove(exported)
+    else:
+        shutil.move(exported, target)
+    return target
+
+class PersonDetector:
+    """Detector de personas YOLOv8 sobre PyTorch, ONNX Runtime u OpenVINO con la misma salida.
+
+    detect() devuelve solo personas como tuplas (x1, y1, x2, y2, conf) en coordenadas del frame.
+    """
+
+    def __init__(self, backend=DEFAULT_BACKEND, model_path=DEFAULT_MODEL, imgsz=DEFAULT_IMGSZ, int8=DEFAULT_INT8,
+                 model_dir=MODEL_DIR):
+        self.imgsz = imgsz
+        self.backend = 'pytorch'
+        self.model = None
+        if backend not in BACKENDS:
+            logger.warning(f"Backend de detección desconocido '{backend}', se usa pytorch")
+        elif backend != 'pytorch':
+            if not _runtime_available(backend):
+                logger.warning(f"El runtime de {backend} no está instalado (pip install -r requirements-detector.txt), se usa pytorch")
+            else:
+                try:
+                    self.model = YOLO(export_model(model_path, backend, imgsz, int8, model_dir), task='detect')
+                    self.backend = backend
+                    self.int8 = int8
+                except Exception as e:
+                    logger.warning(f"No se pudo cargar el modelo {backend} ({str(e)}), se usa pytorch")
+                    self.model = None
+        if self.model is None:
+            self.model = YOLO(model_path)
+            self.int8 = False
+        logger.info(f"Detector de personas: {self.name}")
+
+    @property
+    def name(self):
+        return f"{self.backend}{'-int8' if self.int8 else ''}"
+
+    def detect(self, frame, min_confidence=0.5, imgsz=None):
+        """Detecciones de personas con confianza mayor que min_confidence.
+
+        imgsz permite inferir a menor tamaño (p. ej. sobre un recorte); solo lo admite PyTorch.
+        """
+        # Los modelos exportados tienen la entrada fija, así que se les pasa siempre el mismo imgsz
+        if imgsz is None or self.backend != 'pytorch':
+            imgsz = self.imgsz
+        results = self.model(frame, imgsz=imgsz, classes=[PERSON_CLASS], conf=min_confidence, verbose=False)
+        detections = []
+        for r in results:
+            boxes = r.boxes
+            if len(boxes) == 0:
+                continue
+            xyxy = boxes.xyxy.cpu().numpy()
+            confs = boxes.conf.cpu().numpy()
+            classes = boxes.cls.cpu().numpy()
+            for (x1, y1, x2, y2), conf, cls in zip(xyxy, confs, classes):
+                if int(cls) == PERSON_CLASS and conf > min_confidence:
+                    detections.append((float(x1), float(y1), float(x2), float(y2), float(conf)))
+        return detections
+
+def create_person_detector(backend=None, **kwargs):
+    """Crea el detector con el backend indicado o el de PADEL_DETECTOR_BACKEND; cae a PyTorch si falla."""
+    return PersonDetector(backend or DEFAULT_BACKEND, **kwargs)
@@ -1,10 +1,15 @@
 import numpy as np
 import logging
+from .trajectory_store import points_between
 
 logger = logging.getLogger(__name__)
 
-def assign_player_positions(tracks, existing_positions=None):
-    """Asigna posiciones de jugador a cada pista (track) basándose en su ubicación en la cancha."""
+def assign_player_positions(tracks, existing_positions=None, court=None):
+    """Asigna posiciones de jugador a cada pista (track) basándose en su ubicación en la cancha.
+
+    Con court (CourtRegion) el lado y la zona se separan en el centro de la cancha calibrada;
+    sin ella, en el centro del frame de 640x480.
+    """
     if existing_positions is None:
         existing_positions = {}
 
@@ -22,8 +27,12 @@ def assign_player_positions(tracks, existing_positions=None):
         center_y = y1 + h / 2
 
         # Determinar el lado y la zona del jugador
-        side = 'left' if center_x < 320 else 'right'
-        zone = 'net' if center_y < 240 else 'back'
+        if court is not None:
+            side = court.side(center_x)
+            zone = court.zone(center_y)
+        else:
+            side = 'left' if center_x < 320 else 'right'
+            zone = 'net' if center_y < 240 else 'back'
 
         # Asignar posiciones basadas en el lado y la zona
         # Jugadores 1 y 2 (Equipo A), Jugadores 3 y 4 (Equipo B)
@@ -39,7 +48,6 @@ def assign_player_positions(tracks, existing_positions=None):
                 player_position = 4  # Jugador 4 (Equipo B, fondo, derecha)
 
         updated_positions[track_id] = player_position
-        logger.info(f"Asignado player_position {player_position} al track_id {track_id} (side: {side}, zone: {zone})")
 
     # Verificar que no se asignen valores inválidos
     for track_id, player_pos in updated_positions.items():
@@ -55,7 +63,6 @@ def assign_player_positions(tracks, existing_positions=None):
 def interpolate_elbow_angle(player_keypoints, track_id, current_time):
     """Interpolar el ángulo del codo cuando MediaPipe no detecta puntos clave."""
     if track_id not in player_keypoints or len(player_keypoints[track_id]) < 1:
-        logger.warning(f"No hay datos para interpolar el ángulo del codo para track_id {track_id} en t={current_time}")
         return 90  # Valor predeterminado si no hay datos
 
     keypoints = player_keypoints[track_id]
@@ -66,9 +73,7 @@ def interpolate_elbow_angle(player_keypoints, track_id, current_time):
         # Si no hay suficientes puntos válidos, buscar el punto más cercano con ángulo válido
         closest = min(keypoints, key=lambda kp: abs(kp['time'] - current_time), default=None)
         if closest and closest['elbow_angle'] != 90:
-            logger.info(f"Usando ángulo más cercano: {closest['elbow_angle']} para track_id {track_id} en t={current_time}")
             return closest['elbow_angle']
-        logger.warning(f"No hay puntos válidos para interpolar en t={current_time}, track_id={track_id}")
         return 90  # Valor predeterminado si no se puede interpolar
 
     # Encontrar el punto anterior y posterior más cercano con ángulos válidos
@@ -83,7 +88,6 @@ def interpolate_elbow_angle(player_keypoints, track_id, current_time):
     if before is None or after is None:
         # Si no hay puntos antes y después, usar el más cercano
         closest = min(valid_keypoints, key=lambda kp: abs(kp['time'] - current_time))
-        logger.info(f"Usando ángulo más cercano: {closest['elbow_angle']} para track_id {track_id} en t={current_time}")
         return closest['elbow_angle']
 
     # Interpolación lineal
@@ -93,8 +97,6 @@ def interpolate_elbow_angle(player_keypoints, track_id, current_time):
 
     weight = (current_time - before['time']) / time_span
     interpolated_angle = before['elbow_angle'] + weight * (after['elbow_angle'] - before['elbow_angle'])
-    
-    logger.info(f"Ángulo del codo interpolado: {interpolated_angle} para track_id {track_id} en t={current_time}")
     return interpolated_angle
 
 def calculate_metrics_for_non_striking_players(striking_player, start_time, end_time, player_trajectories, ball_position):
@@ -105,7 +107,7 @@ def calculate_metrics_for_non_striking_players(striking_player, start_time, end_
         if player_position == striking_player or player_position == 0:
             continue
 
-        relevant_points = [p for p in trajectory if start_time <= p['time'] <= end_time]
+        relevant_points = points_between(trajectory, start_time, end_time)
         if not relevant_points:
             continue
 
@@ -0,0 +1,88 @@
+import logging
+import cv2
+import numpy as np
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class PoseGate:
+    """Decide si un track necesita una nueva estimación de pose o puede reutilizar la anterior."""
+
+    def __init__(self, bbox_threshold=0.05, pixel_threshold=8.0, max_reuse=3, thumb_size=(16, 32)):
+        self.bbox_threshold = bbox_threshold  # Cambio máximo del bbox, relativo a su tamaño
+        self.pixel_threshold = pixel_threshold  # Diferencia media máxima (0-255) de la miniatura en gris
+        self.max_reuse = max_reuse  # Reutilizaciones consecutivas antes de forzar una pose nueva
+        self.thumb_size = thumb_size
+        self.state = {}
+        self.stats = {'evaluated': 0, 'reused': 0, 'forced_refresh': 0}
+
+    def thumbnail(self, roi):
+        """Miniatura en escala de grises de la ROI para la comparación barata de píxeles."""
+        gray = cv2.cvtColor(roi, cv2.COLOR_RGB2GRAY)
+        return cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA)
+
+    def check(self, track_id, bbox, roi):
+        """Devuelve (reutilizar, miniatura). Si reutilizar es True no hace falta ejecutar MediaPipe."""
+        self.stats['evaluated'] += 1
+        thumb = self.thumbnail(roi)
+        previous = self.state.get(track_id)
+        if previous is None:
+            return False, thumb
+
+        if previous['reuse_count'] >= self.max_reuse:
+            self.stats['forced_refresh'] += 1
+            return False, thumb
+
+        x1, y1, w, h = bbox
+        px1, py1, pw, ph = previous['bbox']
+        size = max(w, h, 1)
+        bbox_delta = max(abs(x1 - px1), abs(y1 - py1), abs(w - pw), abs(h - ph)) / size
+        if bbox_delta > self.bbox_threshold:
+            return False, thumb
+
+        pixel_delta = float(np.mean(cv2.absdiff(thumb, previous['thumb'])))
+        if pixel_delta > self.pixel_threshold:
+            return False, thumb
+
+        return True, thumb
+
+    def store(self, track_id, bbox, thumb, keypoints, elbow_angle):
+        """Guarda el resultado de una pose real como referencia para los siguientes frames."""
+        self.state[track_id] = {
+            'bbox': tuple(bbox),
+            'thumb': thumb,
+            'keypoints': keypoints,
+            'elbow_angle': elbow_angle,
+            'reuse_count': 0
+        }
+
+    def reuse(self, track_id, bbox):
+        """Extrapola los puntos clave anteriores desplazándolos con el centro del bbox."""
+        previous = self.state[track_id]
+        previous['reuse_count'] += 1
+        self.stats['reused'] += 1
+
+        x1, y1, w, h = bbox
+        px1, py1, pw, ph = previous['bbox']
+        dx = (x1 + w / 2) - (px1 + pw / 2)
+        dy = (y1 + h / 2) - (py1 + ph / 2)
+        keypoints = {name: [point[0] + dx, point[1] + dy] for name, point in previous['keypoints'].items()}
+        return keypoints, previous['elbow_angle']
+
+    def discard(self, track_id):
+        """Olvida el estado de un track (por ejemplo, cuando MediaPipe no detecta pose)."""
+        self.state.pop(track_id, None)
+
+    def report(self):
+        """Umbrales usados y proporción de poses reutilizadas, para validar la precisión."""
+        evaluated = self.stats['evaluated']
+        return {
+            'bbox_threshold': self.bbox_threshold,
+            'pixel_threshold': self.pixel_threshold,
+            'max_reuse': self.max_reuse,
+            'evaluated': evaluated,
+            'reused': self.stats['reused'],
+            'forced_refresh': self.stats['forced_refresh'],
+            'reuse_ratio': self.stats['reused'] / evaluated if evaluated > 0 else 0.0
+        }
@@ -1,9 +1,10 @@
 import logging
 import cv2
 import numpy as np
-import requests
-import os
 import mediapipe as mp
+from .downloader import download_video, remove_download, temp_download_path
+from .stroke_classifier import get_stroke_classifier
+from .segment_stream import CLOSE, START, SegmentStream, StrokeSample
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -34,13 +35,13 @@ def segmentar_video(ruta_video):
     prev_elbow_pos = None
     prev_shoulder_pos = None
     segmentos = []
-    inicio = None
     velocidad_umbral = 0.20  # Umbral para detectar los 11 golpes reales
     angle_change_umbral = 4  # Umbral de cambio de ángulo
     tiempo_minimo_entre_segmentos = 2.0  # Tiempo mínimo en segundos entre golpes
-    ultimo_segmento_fin = -tiempo_minimo_entre_segmentos
+    # El segmento termina cuando la velocidad cae por debajo de la mitad del umbral, sin duración máxima ni picos
+    stream = SegmentStream(min_gap=tiempo_minimo_entre_segmentos, min_duration=0, close_on_drop=False,
+                           close_below=velocidad_umbral / 2, extend=False)
     frame_count = 0
-    movimiento_detectado = False
     lanzamiento_detectado = False
     lanzamiento_time = None
 
@@ -94,19 +95,14 @@ def segmentar_video(ruta_video):
                     cos_angle = np.clip(cos_angle, -1.0, 1.0)
                     angle_change = np.degrees(np.arccos(cos_angle))
 
-                    if velocidad_right > velocidad_umbral and angle_change > angle_change_umbral and not movimiento_detectado and (current_time - ultimo_segmento_fin) > tiempo_minimo_entre_segmentos:
-                        # Inicio de un segmento (golpe detectado)
-                        inicio = frame_count / fps
-                        movimiento_detectado = True
-                        # Pasar información sobre el lanzamiento detectado al segmento
-                        segmentos.append({'inicio': inicio, 'fin': None, 'lanzamiento_detectado': lanzamiento_detectado, 'lanzamiento_time': lanzamiento_time})
-                    elif velocidad_right < velocidad_umbral / 2 and movimiento_detectado:
-                        # Fin de un segmento
-                        fin = frame_count / fps
-                        segmentos[-1]['fin'] = fin
-                        movimiento_detectado = False
-                        ultimo_segmento_fin = fin
-                        inicio = None
+                    # Inicio o fin de un segmento (golpe); el segmento lleva la información del lanzamiento detectado
+                    event, segmento = stream.push(StrokeSample(
+                        current_time, velocidad_right > velocidad_umbral and angle_change > angle_change_umbral, velocidad_right,
+                        fields={'lanzamiento_detectado': lanzamiento_detectado, 'lanzamiento_time': lanzamiento_time}
+                    ))
+                    if event == START:
+                        segmentos.append(segmento)
+                    elif event == CLOSE:
                         lanzamiento_detectado = False  # Reiniciar para el próximo segmento
                         lanzamiento_time = None
 
@@ -123,9 +119,7 @@ def segmentar_video(ruta_video):
         frame_count += 1
 
     # Si hay un segmento abierto al final del video, cerrarlo
-    if movimiento_detectado and inicio is not None:
-        fin = frame_count / fps
-        segmentos[-1]['fin'] = fin
+    stream.close(frame_count / fps)
 
     logger.info(f"Segmentos detectados: {len(segmentos)}")
     return segmentos, video_duration
@@ -152,7 +146,7 @@ def analizar_segmento(segmento, ruta_video):
     prev_shoulder_pos = None
     prev_hip_pos = None
     max_velocidad = 0
-    movimiento_direccion = None
+    stroke_features = None
     max_elbow_angle = 0
     wrist_height = 0
 
@@ -201,30 +195,10 @@ def analizar_segmento(segmento, ruta_video):
 
                 # Determinar dirección del movimiento usando solo dx
                 dx = current_wrist_pos[0] - prev_wrist_pos[0]
-                is_derecha = dx > 0
-
-                # Clasificar el tipo de golpe
-                # Prioridad 1: Saque (lanzamiento de la pelota detectado)
-                if segmento.get('lanzamiento_detectado', False) and (segmento['inicio'] - segmento.get('lanzamiento_time', float('inf')) < 1.0):
-                    movimiento_direccion = "saque"
-                # Prioridad 2: Smash (ángulo alto, velocidad alta)
-                elif max_elbow_angle > 150 and velocidad > 1.2:
-                    movimiento_direccion = "smash"
-                # Prioridad 3: Bandeja (ángulo alto, velocidad moderada)
-                elif max_elbow_angle > 120 and velocidad > 0.6:
-                    movimiento_direccion = "bandeja"
-                # Prioridad 4: Globo (ángulo abierto, velocidad baja)
-                elif max_elbow_angle > 120 and velocidad < 1.5:
-                    movimiento_direccion = "globo"
-                # Prioridad 5: Defensivo (ángulo bajo, velocidad baja)
-                elif max_elbow_angle < 90 and velocidad < 0.2:
-                    movimiento_direccion = "defensivo"
-                # Prioridad 6: Volea (ángulo cerrado, velocidad moderada)
-                elif max_elbow_angle < 90 and velocidad > 0.05:
-                    movimiento_direccion = "volea_" + ("derecha" if is_derecha else "reves")
-                # Prioridad 7: Derecha o Revés (ángulo 90-150, velocidad moderada-alta)
-                else:
-                    movimiento_direccion = "derecha" if is_derecha else "reves"
+
+                # Solo cuenta la clasificación del último frame: se guardan sus características
+                # y se clasifica una vez al terminar el segmento
+                stroke_features = (max_elbow_angle, velocidad, dx)
 
                 if velocidad > max_velocidad:
                     max_velocidad = velocidad
@@ -243,10 +217,13 @@ def analizar_segmento(segmento, ruta_video):
 
     cap.release()
 
-    if max_velocidad > 0.25 and movimiento_direccion:  # Ajustar umbral mínimo
+    if max_velocidad > 0.25 and stroke_features:  # Ajustar umbral mínimo
+        # El saque (lanzamiento de la pelota detectado) tiene prioridad sobre las reglas de entrenamiento
+        is_serve = segmento.get('lanzamiento_detectado', False) and (segmento['inicio'] - segmento.get('lanzamiento_time', float('inf')) < 1.0)
         calidad = min(100, max_velocidad * 10)  # Aumentar el factor de calidad
+        # El tipo se asigna en procesar_video_entrenamiento, con todos los golpes del video a la vez
         return [{
-            'tipo': movimiento_direccion,
+            'stroke_features': (*stroke_features, is_serve),
             'confianza': calidad / 100,
             'calidad': calidad,
             'max_elbow_angle': max_elbow_angle,
@@ -282,16 +259,12 @@ def clasificar_golpes(golpes):
 def procesar_video_entrenamiento(video_url, client=None):
     """Procesa un video de entrenamiento completo."""
     # Descargar el video desde la URL
-    local_path = "temp_video_entrenamiento.mp4"
+    local_path = temp_download_path('temp_video_entrenamiento')
     logger.info(f"Descargando video desde {video_url} a {local_path}")
-    response = requests.get(video_url, stream=True)
-    response.raise_for_status()
-    with open(local_path, 'wb') as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            if chunk:
-                f.write(chunk)
 
     try:
+        download_video(video_url, local_path)
+
         # Paso 1: Segmentación
         segmentos, video_duration = segmentar_video(local_path)
 
@@ -303,16 +276,15 @@ def procesar_video_entrenamiento(video_url, client=None):
             golpes_totales.extend(golpes_evaluados)
 
         # Paso 4: Clasificación
+        get_stroke_classifier('entrenamiento').classify_segments(golpes_totales, field='tipo')
         golpes_clasificados = clasificar_golpes(golpes_totales)
 
-        # Limpiar archivo temporal
-        os.remove(local_path)
-        logger.info(f"Archivo temporal {local_path} eliminado")
-
         return golpes_clasificados, video_duration
 
     except Exception as e:
         logger.error(f"Error al procesar video de entrenamiento: {str(e)}")
-        if os.path.exists(local_path):
-            os.remove(local_path)
-        raise e
\ No newline at end of file
+        raise e
+    finally:
+        # Limpiar archivo temporal
+        remove_download(local_path)
+        logger.info(f"Archivo temporal {local_path} eliminado")
\ No newline at end of file
@@ -0,0 +1,113 @@
+import logging
+import math
+import os
+from datetime import datetime, timezone
+from firebase_admin import firestore
+from .utils import combinar_padel_iq, nivel_jugador
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RATING_FIELD = 'padel_iq_rating'  # Estado del rating en el documento users/{user_id}
+RATING_DECAY = float(os.environ.get('PADEL_RATING_DECAY', 0.9))  # Peso que conserva el historial en cada sesión nueva
+FULL_WEIGHT_STROKES = int(os.environ.get('PADEL_RATING_FULL_WEIGHT_STROKES', 20))  # Golpes para que una sesión cuente entera
+PRIOR_STD = 15.0  # Incertidumbre (puntos de Padel IQ) de un jugador con una sola sesión
+RECENT_SESSIONS = 20  # Sesiones recordadas para no contar dos veces el mismo análisis
+
+# Las métricas de entrenamiento salen de un solo jugador sin rival y cuentan la mitad
+SESSION_TYPE_WEIGHTS = {'juego': 1.0, 'entrenamiento': 0.5}
+METRICS = ('tecnica', 'ritmo', 'fuerza', 'repeticion')
+DEFAULT_REPETICION = 2.0  # Valor de calcular_metricas_padel_iq cuando la sesión no trae repetición
+
+def session_weight(metricas, tipo_video):
+    """Peso de una sesión: proporcional a sus golpes hasta FULL_WEIGHT_STROKES, por el peso de su tipo."""
+    return min(1.0, metricas.get('total_golpes', 0) / FULL_WEIGHT_STROKES) * SESSION_TYPE_WEIGHTS.get(tipo_video, 1.0)
+
+def update_rating(state, metricas, tipo_video, session_id=None, decay=RATING_DECAY):
+    """Nuevo estado del rating tras una sesión, en O(1) sin releer el historial.
+
+    Guarda medias móviles ponderadas de técnica, ritmo, fuerza y repetición (las sesiones antiguas pierden
+    peso con decay) y la varianza ponderada del Padel IQ de cada sesión (algoritmo de West). El
+    Padel IQ del rating se calcula con las medias, y su incertidumbre es el error estándar de la
+    media con el tamaño efectivo de la muestra (peso total² / suma de pesos²). Devuelve el mismo
+    estado (None si no había) si la sesión no tiene golpes o ya se contó.
+    """
+    weight = session_weight(metricas, tipo_video)
+    if weight <= 0 or (state and session_id and session_id in state['recent_sessions']):
+        return state
+
+    state = dict(state) if state else {
+        'sessions': 0,
+        'weight': 0.0,
+        'weight_sq': 0.0,
+        'means': {metric: 0.0 for metric in METRICS},
+        'padel_iq_mean': 0.0,
+        'padel_iq_m2': 0.0,
+        'recent_sessions': []
+    }
+    total = state['weight'] * decay + weight
+    share = weight / total
+    session = dict(metricas, repeticion=metricas.get('repeticion', DEFAULT_REPETICION))
+    means = {}
+    for metric in METRICS:
+        value = float(session[metric])
+        # Estados guardados antes de seguir la repetición la empiezan con el valor de esta sesión
+        mean = state['means'].get(metric, value)
+        means[metric] = mean + share * (value - mean)
+    session_iq = float(metricas['padel_iq'])
+    iq_mean = state['padel_iq_mean'] + share * (session_iq - state['padel_iq_mean'])
+    iq_m2 = state['padel_iq_m2'] * decay + weight * (session_iq - state['padel_iq_mean']) * (session_iq - iq_mean)
+    weight_sq = state['weight_sq'] * decay ** 2 + weight ** 2
+
+    effective_sessions = total ** 2 / weight_sq
+    variance = max(iq_m2 / total, 0.0)
+    padel_iq = combinar_padel_iq(means['tecnica'], means['ritmo'], means['fuerza'], means['repeticion'])
+    state.update({
+        'sessions': state['sessions'] + 1,
+        'weight': total,
+        'weight_sq': weight_sq,
+        'means': means,
+        'padel_iq_mean': iq_mean,
+        'padel_iq_m2': iq_m2,
+        'padel_iq': padel_iq,
+        'player_level': nivel_jugador(padel_iq),
+        'uncertainty': math.sqrt((variance + PRIOR_STD ** 2) / effective_sessions),
+        'recent_sessions': (state['recent_sessions'] + [session_id])[-RECENT_SESSIONS:] if session_id else state['recent_sessions'],
+        'updated_at': datetime.now(timezone.utc).isoformat()
+    })
+    return state
+
+@firestore.transactional
+def _update_in_transaction(transaction, user_ref, metricas, tipo_video, session_id):
+    snapshot = user_ref.get(transaction=transaction)
+    current = (snapshot.to_dict() or {}).get(RATING_FIELD) if snapshot.exists else None
+    state = update_rating(current, metricas, tipo_video, session_id)
+    if state is not current:
+        # padel_iq y player_level de nivel superior son los que leen el perfil y el matchmaking
+        transaction.set(user_ref, {
+            RATING_FIELD: state,
+            'padel_iq': state['padel_iq'],
+            'player_level': state['player_level']
+        }, merge=True)
+    return state
+
+def update_user_rating(db, user_id, metricas, tipo_video, session_id=None):
+    """Actualiza en una transacción el rating del usuario con las métricas de un análisis; devuelve el estado."""
+    user_ref = db.collection('users').document(user_id)
+    state = _update_in_transaction(db.transaction(), user_ref, metricas, tipo_video, session_id)
+    if state:
+        logger.info(f"Rating de {user_id}: Padel IQ {state['padel_iq']:.1f} ± {state['uncertainty']:.1f} en {state['sessions']} sesiones")
+    return state
+
+def rating_summary(state):
+    """Campos del rating que se devuelven al cliente."""
+    if not state or not state.get('sessions'):
+        return None
+    return {
+        'padel_iq': state['padel_iq'],
+        'player_level': state['player_level'],
+        'uncertainty': state['uncertainty'],
+        'sessions': state['sessions'],
+        'means': state['means']
+    }
@@ -0,0 +1,259 @@
+import base64
+import gzip
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+import numpy as np
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = os.environ.get('PADEL_RESULTS_DIR', 'results')
+RESULTS_TTL = int(os.environ.get('PADEL_RESULTS_TTL', 7 * 24 * 3600))  # Segundos que se conserva un resultado para paginarlo
+COMPRESSION_MIN_SIZE = int(os.environ.get('PADEL_COMPRESSION_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.environ.get('PADEL_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('PADEL_BROTLI_QUALITY', 5))
+
+# summary: métricas y conteo de golpes; strokes: además una página de golpes sin non_striking_metrics;
+# full: la respuesta completa de siempre (o, con cursor/limit, páginas de golpes completos)
+RESPONSE_MODES = ('summary', 'strokes', 'full')
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def _json_default(value):
+    # Escalares y arrays de NumPy que no serializa el backend (p. ej. arrays no contiguos)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return DefaultJSONProvider.default(value)
+
+def dumps(obj, indent=None, sort_keys=False):
+    """JSON de obj con NumPy nativo: orjson si está instalado, si no json con conversión de NumPy."""
+    if orjson is not None:
+        # Fechas y dataclasses pasan por el default de Flask para mantener su formato (fechas HTTP)
+        option = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS |
+                  orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_json_default, option=option).decode('utf-8')
+    return json.dumps(obj, default=_json_default, indent=indent, sort_keys=sort_keys,
+                      separators=None if indent else (',', ':'))
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class PadelJSONProvider(DefaultJSONProvider):
+    """Proveedor JSON de Flask que serializa los escalares y arrays de NumPy de los análisis sin conversión previa.
+
+    Las claves no se ordenan: en las respuestas de varios MB ordenar cuesta más que serializar.
+    """
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        indent = kwargs.pop('indent', None)
+        kwargs.pop('separators', None)
+        sort_keys = kwargs.pop('sort_keys', self.sort_keys)
+        if kwargs:
+            # Opciones de json.dumps que orjson no admite
+            kwargs.setdefault('default', _json_default)
+            return json.dumps(obj, indent=indent, sort_keys=sort_keys, **kwargs)
+        return dumps(obj, indent=indent, sort_keys=sort_keys)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return loads(s)
+
+def flatten_strokes(golpes_clasificados):
+    """Golpes de todos los tipos en orden cronológico, cada uno con su 'tipo'."""
+    strokes = [dict(golpe, tipo=golpe.get('tipo', tipo)) for tipo, golpes in golpes_clasificados.items() for golpe in golpes]
+    strokes.sort(key=lambda golpe: golpe.get('inicio') or 0)
+    return strokes
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(json.dumps({'offset': offset}).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Posición de un cursor de encode_cursor; ValueError si no es válido."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        offset = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))['offset']
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Cursor no válido: {cursor}") from e
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError(f"Cursor no válido: {cursor}")
+    return offset
+
+def parse_page_args(mode, cursor=None, limit=None):
+    """Valida modo, cursor y tamaño de página; devuelve (modo, posición, límite o None)."""
+    mode = mode or 'full'
+    if mode not in RESPONSE_MODES:
+        raise ValueError(f"Modo de respuesta no soportado: {mode} (usa {', '.join(RESPONSE_MODES)})")
+    offset = decode_cursor(cursor) if cursor else 0
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Tamaño de página no válido: {limit}") from e
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    elif mode == 'strokes' or offset:
+        limit = DEFAULT_PAGE_SIZE
+    return mode, offset, limit
+
+def shape_response(result, mode='full', offset=0, limit=None):
+    """Respuesta de calculate_padel_iq en el modo pedido a partir del resultado completo guardado.
+
+    full sin paginación devuelve el resultado tal cual. En el resto, detected_strokes lleva el
+    conteo de golpes por tipo en lugar de los golpes, y strokes/full añaden la página de golpes en
+    orden cronológico con next_cursor (None en la última página).
+    """
+    if mode == 'full' and limit is None and not offset:
+        return result
+
+    shaped = dict(result)
+    golpes_clasificados = {}
+    detected_strokes = []
+    for entry in result.get('detected_strokes', []):
+        entry = dict(entry)
+        golpes = entry.pop('golpes_clasificados', None) or {}
+        golpes_clasificados.update(golpes)
+        entry['stroke_counts'] = {tipo: len(lista) for tipo, lista in golpes.items()}
+        entry['total_golpes'] = sum(entry['stroke_counts'].values())
+        detected_strokes.append(entry)
+    shaped['detected_strokes'] = detected_strokes
+    if mode == 'summary':
+        return shaped
+
+    strokes = flatten_strokes(golpes_clasificados)
+    page = strokes[offset:offset + limit]
+    if mode == 'strokes':
+        page = [{k: v for k, v in golpe.items() if k != 'non_striking_metrics'} for golpe in page]
+    shaped['strokes'] = page
+    shaped['next_cursor'] = encode_cursor(offset + limit) if offset + limit < len(strokes) else None
+    return shaped
+
+class ResultStore:
+    """Resultados completos de calculate_padel_iq en disco, para servir después resúmenes y páginas de golpes."""
+
+    def __init__(self, results_dir=RESULTS_DIR, ttl=RESULTS_TTL, cache_size=8):
+        self.results_dir = results_dir
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def _path(self, analysis_id):
+        if not re.fullmatch(r'[0-9a-f]{32}', analysis_id or ''):
+            raise ValueError(f"Identificador de análisis no válido: {analysis_id}")
+        return os.path.join(self.results_dir, f"{analysis_id}.json")
+
+    def save(self, result):
+        """Guarda el resultado y devuelve su analysis_id."""
+        os.makedirs(self.results_dir, exist_ok=True)
+        self.prune()
+        analysis_id = uuid.uuid4().hex
+        path = self._path(analysis_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(dumps(result))
+        os.replace(tmp_path, path)
+        return analysis_id
+
+    def load(self, analysis_id):
+        """Resultado guardado (los últimos leídos se sirven de memoria), o None si no existe."""
+        path = self._path(analysis_id)
+        if analysis_id in self._cache:
+            self._cache.move_to_end(analysis_id)
+            return self._cache[analysis_id]
+        try:
+            with open(path, 'rb') as f:
+                result = loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Resultado ilegible en {path}: {str(e)}")
+            return None
+        self._cache[analysis_id] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def prune(self):
+        """Borra los resultados más antiguos que ttl."""
+        limit = time.time() - self.ttl
+        for name in os.listdir(self.results_dir):
+            path = os.path.join(self.results_dir, name)
+            try:
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+                    self._cache.pop(os.path.splitext(name)[0], None)
+            except OSError:
+                pass
+
+def negotiate_encoding(accept_encoding):
+    """'br', 'gzip' o None según Accept-Encoding (con pesos q) y los compresores disponibles."""
+    weights = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+
+    best, best_weight = None, 0.0
+    # Brotli primero: con el mismo peso comprime más que gzip
+    for encoding in (('br', 'gzip') if brotli is not None else ('gzip',)):
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+def compress_response(response):
+    """Comprime las respuestas JSON con brotli o gzip según Accept-Encoding (after_request del blueprint)."""
+    if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+    if response.mimetype != 'application/json':
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESSION_MIN_SIZE:
+        return response
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+    if encoding == 'br':
+        body = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        body = gzip.compress(data, compresslevel=GZIP_LEVEL)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
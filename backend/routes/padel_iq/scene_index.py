@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import os
+import cv2
+import numpy as np
+from .video_decoder import create_decoder
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCENE_INDEX_VERSION = 1
+SCENE_INDEX_SUFFIX = '.scenes.json'
+
+def index_path(video_path):
+    """Ruta del índice de cortes, guardado junto al video."""
+    return f"{video_path}{SCENE_INDEX_SUFFIX}"
+
+def file_fingerprint(video_path, sample_bytes=64 * 1024):
+    """Huella del archivo para las cachés guardadas junto al video: tamaño y SHA-256 del inicio y el final.
+
+    No usa la fecha de modificación: la caché de proxies la toca al reutilizarlos y el contenido no cambia.
+    """
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha256()
+    with open(video_path, 'rb') as f:
+        digest.update(f.read(sample_bytes))
+        if size > sample_bytes:
+            f.seek(max(sample_bytes, size - sample_bytes))
+            digest.update(f.read(sample_bytes))
+    return {'size': size, 'sample_sha256': digest.hexdigest()}
+
+def court_histogram(frame):
+    """Histograma HS normalizado de la mitad inferior del frame (la cancha)."""
+    roi = frame[frame.shape[0] // 2:, :]
+    hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [50, 60], [0, 180, 0, 256])
+    cv2.normalize(hist, hist, 0, 1, cv2.NORM_MINMAX)
+    return hist
+
+def build_scene_index(video_path, sample_fps=2.0, thumb_size=(160, 120), decoder_backend=None):
+    """Muestrea el video a sample_fps y guarda la correlación de cada muestra con la anterior."""
+    cap = create_decoder(video_path, decoder_backend, width=thumb_size[0], height=thumb_size[1])
+    if not cap.is_opened():
+        logger.error("No se pudo abrir el video para indexar cortes de escena")
+        return None
+
+    step = max(1, int(round(cap.fps / sample_fps)))
+    times = []
+    correlations = []
+    prev_hist = None
+    frame_index = 0
+    while True:
+        # Solo se convierte un frame de cada step; el resto se avanza sin convertir
+        if frame_index % step != 0:
+            if not cap.skip():
+                break
+            frame_index += 1
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        hist = court_histogram(frame)
+        if prev_hist is not None:
+            times.append(round(cap.timestamp, 3))
+            correlations.append(round(float(cv2.compareHist(prev_hist, hist, cv2.HISTCMP_CORREL)), 4))
+        prev_hist = hist
+        frame_index += 1
+
+    duration = frame_index / cap.fps
+    cap.release()
+
+    index = {
+        'version': SCENE_INDEX_VERSION,
+        'sample_fps': sample_fps,
+        'fps': cap.fps,
+        'duration': duration,
+        'times': times,
+        'correlations': correlations
+    }
+    index.update(file_fingerprint(video_path))
+    return index
+
+def load_scene_index(video_path, sample_fps):
+    """Devuelve el índice guardado si corresponde al mismo archivo y frecuencia de muestreo."""
+    path = index_path(video_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            index = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Índice de cortes ilegible en {path}: {str(e)}")
+        return None
+
+    if index.get('version') != SCENE_INDEX_VERSION or index.get('sample_fps') != sample_fps:
+        return None
+    if any(index.get(key) != value for key, value in file_fingerprint(video_path).items()):
+        return None
+    return index
+
+def save_scene_index(video_path, index):
+    path = index_path(video_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # El índice es una caché: si no se puede escribir se recalcula en la siguiente ejecución
+        logger.warning(f"No se pudo guardar el índice de cortes en {path}: {str(e)}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def get_scene_index(video_path, sample_fps=2.0, decoder_backend=None):
+    """Carga el índice de cortes del video o lo construye y lo guarda si no existe o está desactualizado."""
+    index = load_scene_index(video_path, sample_fps)
+    if index is not None:
+        logger.info(f"Usando índice de cortes en caché: {index_path(video_path)}")
+        return index
+    index = build_scene_index(video_path, sample_fps, decoder_backend=decoder_backend)
+    if index is not None:
+        save_scene_index(video_path, index)
+    return index
+
+def merge_cuts(cut_times, duration, merge_window=10.0, min_game_duration=30.0):
+    """Agrupa cortes cercanos en un único límite estable y descarta juegos demasiado cortos.
+
+    Cada ráfaga de cortes separados por menos de merge_window segundos (un golpe de cámara,
+    gente cruzando delante) se reduce a su último corte, cuando la escena ya se ha estabilizado.
+    """
+    bursts = []
+    for t in sorted(cut_times):
+        if bursts and t - bursts[-1][-1] < merge_window:
+            bursts[-1].append(t)
+        else:
+            bursts.append([t])
+
+    boundaries = []
+    previous = 0.0
+    for burst in bursts:
+        boundary = burst[-1]
+        if boundary - previous < min_game_duration or duration - boundary < min_game_duration:
+            continue
+        boundaries.append(boundary)
+        previous = boundary
+    return boundaries
+
+def detect_game_boundaries(video_path, custom_params=None):
+    """Límites entre juegos a partir del índice de cortes (reutilizado entre ejecuciones y parámetros)."""
+    custom_params = custom_params or {}
+    sample_fps = custom_params.get('scene_sample_fps', 2.0)
+    index = get_scene_index(video_path, sample_fps, custom_params.get('decoder_backend'))
+    if index is None:
+        return []
+
+    threshold = custom_params.get('scene_cut_threshold', 0.5)
+    correlations = np.asarray(index['correlations'], dtype=np.float32)
+    times = np.asarray(index['times'], dtype=np.float64)
+    cut_times = times[correlations < threshold].tolist()
+    boundaries = merge_cuts(
+        cut_times,
+        index['duration'],
+        merge_window=custom_params.get('scene_merge_window', 10.0),
+        min_game_duration=custom_params.get('scene_min_game_duration', 30.0)
+    )
+    logger.info(f"Cortes de escena: {len(cut_times)} crudos, {len(boundaries)} límites de juego")
+    return boundaries
@@ -0,0 +1,153 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import mediapipe as mp
+from .utils import calculate_angle
+from .stroke_classifier import get_stroke_classifier
+from .frame_preprocessing import FramePreprocessor
+from .video_decoder import create_decoder
+from .trajectory_store import points_between
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+mp_pose = mp.solutions.pose
+
+# MediaPipe Pose y los buffers de preprocesado no son seguros entre hilos: cada hilo del pool tiene los suyos
+_thread_state = threading.local()
+
+def _get_pose():
+    if not hasattr(_thread_state, 'pose'):
+        _thread_state.pose = mp_pose.Pose(min_detection_confidence=0.01, min_tracking_confidence=0.01)
+    return _thread_state.pose
+
+def _get_preprocessor():
+    if not hasattr(_thread_state, 'preprocessor'):
+        _thread_state.preprocessor = FramePreprocessor()
+    return _thread_state.preprocessor
+
+def find_striker_boxes(segmento, player_trajectories, margin):
+    """Devuelve los puntos (time, bbox) del jugador que golpea dentro de la ventana del segmento."""
+    player_pos = segmento.get('player_position')
+    start_time = segmento['inicio'] - margin
+    end_time = (segmento.get('fin') or segmento['inicio'] + 0.5) + margin
+
+    best = []
+    for track_id, trajectory in player_trajectories.items():
+        points = [(p['time'], p['bbox']) for p in points_between(trajectory, start_time, end_time)
+                  if p.get('bbox') and p['player_position'] == player_pos]
+        if len(points) > len(best):
+            best = points
+    return best
+
+def _nearest_box(boxes, current_time):
+    return min(boxes, key=lambda point: abs(point[0] - current_time))[1]
+
+def _padded_roi(bbox, padding, width=640, height=480):
+    x, y, w, h = bbox
+    pad_x = w * padding
+    pad_y = h * padding
+    x1 = int(max(0, x - pad_x))
+    y1 = int(max(0, y - pad_y))
+    x2 = int(min(width, x + w + pad_x))
+    y2 = int(min(height, y + h + pad_y))
+    return x1, y1, x2, y2
+
+def refine_segment(segmento, ruta_video, player_trajectories, frame_skip, margin=0.2, padding=0.2, decoder_backend=None):
+    """Recalcula a frame completo la velocidad máxima, el ángulo del codo y el tipo de golpe de un segmento."""
+    boxes = find_striker_boxes(segmento, player_trajectories, margin)
+    if not boxes:
+        return segmento
+
+    cap = create_decoder(ruta_video, decoder_backend, width=640, height=480)
+    if not cap.is_opened():
+        logger.error("No se pudo abrir el video para refinar el segmento")
+        return segmento
+
+    fps = cap.fps
+
+    start_frame = max(0, int((segmento['inicio'] - margin) * fps))
+    end_frame = int(((segmento.get('fin') or segmento['inicio'] + 0.5) + margin) * fps)
+    cap.seek(start_frame)
+
+    pose = _get_pose()
+    preprocessor = _get_preprocessor()
+    wrists = []  # (frame_index, wrist, elbow_angle)
+    frame_index = start_frame
+    while frame_index <= end_frame:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        current_time = cap.timestamp
+        preprocessor.load(frame)
+        roi, (x1, y1, x2, y2) = preprocessor.roi(*_padded_roi(_nearest_box(boxes, current_time), padding))
+        if roi.size > 0:
+            # MediaPipe necesita un array contiguo; es la única copia por frame
+            results = pose.process(np.ascontiguousarray(roi))
+            if results.pose_landmarks:
+                landmarks = results.pose_landmarks.landmark
+                roi_height, roi_width = roi.shape[:2]
+                shoulder, elbow, wrist = [
+                    [landmarks[joint.value].x * roi_width + x1, landmarks[joint.value].y * roi_height + y1]
+                    for joint in (mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_ELBOW, mp_pose.PoseLandmark.LEFT_WRIST)
+                ]
+                wrists.append((frame_index, wrist, calculate_angle(shoulder, elbow, wrist)))
+        frame_index += 1
+
+    cap.release()
+
+    # La velocidad se mide sobre una ventana de frame_skip frames para conservar la escala de los umbrales
+    # del muestreo grueso, pero se evalúa en cada frame para localizar el pico con precisión completa
+    peak = None
+    j = 0
+    for i in range(len(wrists)):
+        while wrists[i][0] - wrists[j][0] > frame_skip:
+            j += 1
+        frame_i, wrist_i, angle_i = wrists[i]
+        frame_j, wrist_j, _ = wrists[j]
+        if frame_i == frame_j:
+            continue
+        distance = np.sqrt((wrist_i[0] - wrist_j[0])**2 + (wrist_i[1] - wrist_j[1])**2)
+        wrist_speed = min(distance * fps * frame_skip * frame_skip / (frame_i - frame_j), 50)
+        if peak is None or wrist_speed > peak['wrist_speed']:
+            peak = {'wrist_speed': wrist_speed, 'elbow_angle': angle_i, 'dx': wrist_i[0] - wrist_j[0], 'time': frame_i / fps}
+
+    if peak is None:
+        return segmento
+
+    refined = dict(segmento)
+    refined['max_velocidad'] = peak['wrist_speed']
+    refined['max_elbow_angle'] = peak['elbow_angle']
+    refined['peak_time'] = peak['time']
+    if segmento.get('movimiento_direccion') != "saque":
+        # refine_segments reclasifica todos los segmentos refinados en una sola llamada
+        refined['stroke_features'] = (peak['elbow_angle'], peak['wrist_speed'], peak['dx'], False)
+    refined['refinado'] = True
+    return refined
+
+def refine_segments(segmentos, ruta_video, player_trajectories, custom_params):
+    """Refina todos los segmentos en paralelo; cada tarea decodifica solo la ventana de su segmento."""
+    if not segmentos:
+        return segmentos
+
+    frame_skip = custom_params.get('frame_skip', 12)
+    max_workers = custom_params.get('refinement_workers') or min(4, os.cpu_count() or 1)
+
+    def _refine(segmento):
+        try:
+            return refine_segment(segmento, ruta_video, player_trajectories, frame_skip,
+                                  decoder_backend=custom_params.get('decoder_backend'))
+        except Exception as e:
+            logger.error(f"Error al refinar el segmento en t={segmento.get('inicio')}: {str(e)}")
+            return segmento
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        refinados = list(executor.map(_refine, segmentos))
+    get_stroke_classifier('juego').classify_segments(refinados)
+
+    logger.info(f"Segmentos refinados a frame completo: {sum(1 for s in refinados if s.get('refinado'))}/{len(segmentos)}")
+    return refinados
@@ -0,0 +1,126 @@
+import logging
+from collections import namedtuple
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+START = 'start'
+EXTEND = 'extend'
+CLOSE = 'close'
+
+# Características de un frame muestreado para la segmentación:
+#   time: segundos; active: el frame supera los umbrales de golpe; speed: magnitud cuyo pico sigue el segmento;
+#   fields: campos del segmento en el inicio y en cada nuevo pico; start_fields: solo al iniciarlo;
+#   key: estado independiente por clave (None = un golpe abierto a la vez para todos los jugadores)
+StrokeSample = namedtuple('StrokeSample', ['time', 'active', 'speed', 'fields', 'start_fields', 'key'],
+                          defaults=(None, None))
+
+class _SegmentState:
+    """Estado O(1) de una clave: segmento abierto, su pico y el fin del último segmento."""
+    __slots__ = ('segment', 'peak', 'last_end')
+
+    def __init__(self, last_end):
+        self.segment = None
+        self.peak = 0
+        self.last_end = last_end
+
+class SegmentStream:
+    """Máquina de estados de segmentación de golpes alimentada muestra a muestra.
+
+    Un segmento empieza en una muestra activa si no hay otro abierto y pasó min_gap desde el último
+    cierre; con close_on_drop se cierra en una muestra activa cuya velocidad cae por debajo del pico
+    (o si supera max_segment_duration) y, si no, se extiende cuando la velocidad marca un pico nuevo.
+    close_below cierra además en cualquier muestra con velocidad por debajo de ese valor absoluto.
+    Solo guarda el segmento abierto de cada clave: los cerrados se devuelven al llamador.
+    """
+
+    def __init__(self, max_segment_duration=None, min_gap=0.5, min_duration=0.1, close_on_drop=True,
+                 close_below=None, extend=True):
+        self.max_segment_duration = max_segment_duration
+        self.min_gap = min_gap  # None: sin tiempo mínimo entre segmentos
+        self.min_duration = min_duration
+        self.close_on_drop = close_on_drop
+        self.close_below = close_below
+        self.extend = extend
+        self.reset()
+
+    def reset(self):
+        self._states = {}
+
+    def _state(self, key):
+        if key not in self._states:
+            self._states[key] = _SegmentState(-self.min_gap if self.min_gap is not None else None)
+        return self._states[key]
+
+    def current(self, key=None):
+        """Segmento abierto de la clave, o None."""
+        state = self._states.get(key)
+        return state.segment if state is not None else None
+
+    def last_end(self, key=None):
+        """Fin del último segmento cerrado de la clave (negativo si aún no se cerró ninguno)."""
+        return self._state(key).last_end
+
+    def _close(self, state, fin):
+        segment = state.segment
+        segment['fin'] = fin
+        state.segment = None
+        state.peak = 0
+        state.last_end = fin
+        return segment
+
+    def push(self, sample):
+        """Avanza la máquina de estados con una muestra; devuelve (evento, segmento) o (None, None)."""
+        state = self._state(sample.key)
+        segment = state.segment
+        if segment is None:
+            gap_ok = self.min_gap is None or (sample.time - state.last_end) > self.min_gap
+            if sample.active and gap_ok:
+                state.segment = {'inicio': sample.time, 'fin': None, **(sample.start_fields or {}), **sample.fields}
+                state.peak = sample.speed
+                return START, state.segment
+            return None, None
+
+        if self.close_below is not None and sample.speed < self.close_below:
+            return CLOSE, self._close(state, max(sample.time, segment['inicio'] + self.min_duration))
+        if not sample.active:
+            return None, None
+        if self.close_on_drop and (sample.speed < state.peak or
+                                   (self.max_segment_duration is not None and
+                                    sample.time - segment['inicio'] > self.max_segment_duration)):
+            return CLOSE, self._close(state, max(sample.time, segment['inicio'] + self.min_duration))
+        if self.extend and sample.speed > state.peak:
+            state.peak = sample.speed
+            segment.update(sample.fields)
+            return EXTEND, segment
+        return None, None
+
+    def close(self, last_time, end_time=None):
+        """Cierra los segmentos abiertos al terminar la secuencia (sin pasar de end_time); los devuelve."""
+        closed = []
+        for state in self._states.values():
+            if state.segment is not None:
+                fin = max(last_time, state.segment['inicio'] + self.min_duration)
+                closed.append(self._close(state, min(fin, end_time) if end_time is not None else fin))
+        return closed
+
+    def open_segments(self):
+        return [state.segment for state in self._states.values() if state.segment is not None]
+
+def stream_segments(samples, stream, close_open=True):
+    """Genera los segmentos a medida que se cierran a partir de un iterable de StrokeSample.
+
+    Al agotarse las muestras, los segmentos abiertos se cierran en la última muestra (close_open) o
+    se entregan sin cerrar, con fin None.
+    """
+    last_time = None
+    for sample in samples:
+        last_time = sample.time
+        event, segment = stream.push(sample)
+        if event == CLOSE:
+            yield segment
+    if close_open and last_time is not None:
+        yield from stream.close(last_time)
+    else:
+        yield from stream.open_segments()
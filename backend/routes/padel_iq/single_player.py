@@ -0,0 +1,73 @@
+import logging
+import numpy as np
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class SinglePlayerTracker:
+    """Sigue al único jugador de un video de entrenamiento sin ejecutar YOLO en cada muestra.
+
+    El jugador se detecta una vez con detect_fn; en los frames siguientes la ROI se propaga a partir
+    de los landmarks de la pose anterior. Solo se vuelve a detectar cuando se pierde la pose.
+    """
+
+    def __init__(self, detect_fn, width=640, height=480, padding=0.25, min_visibility=0.5, min_landmarks=6, min_size=24):
+        self.detect_fn = detect_fn  # frame -> [(x1, y1, x2, y2, conf), ...]
+        self.width = width
+        self.height = height
+        self.padding = padding  # Margen añadido alrededor de los landmarks, relativo al tamaño del cuerpo
+        self.min_visibility = min_visibility
+        self.min_landmarks = min_landmarks
+        self.min_size = min_size
+        self.bbox = None
+        self.stats = {'detections': 0, 'propagated': 0, 'lost': 0}
+
+    def _clip(self, x1, y1, x2, y2):
+        return (max(0, int(x1)), max(0, int(y1)), min(self.width, int(x2)), min(self.height, int(y2)))
+
+    def locate(self, frame):
+        """Caja (x1, y1, x2, y2) donde buscar al jugador en este frame, o None si no se encuentra."""
+        if self.bbox is not None:
+            return self.bbox
+
+        self.stats['detections'] += 1
+        detections = self.detect_fn(frame)
+        if not detections:
+            return None
+        # Con un solo jugador en pantalla se toma la detección más grande y segura
+        x1, y1, x2, y2, _ = max(detections, key=lambda d: (d[2] - d[0]) * (d[3] - d[1]) * d[4])
+        self.bbox = self._clip(x1, y1, x2, y2)
+        return self.bbox
+
+    def update(self, landmarks, roi_box):
+        """Propaga la ROI del siguiente frame a partir de los landmarks (normalizados a roi_box)."""
+        x1, y1, x2, y2 = roi_box
+        points = np.array([(lm.x, lm.y) for lm in landmarks if lm.visibility >= self.min_visibility], dtype=np.float32)
+        if len(points) < self.min_landmarks:
+            self.lost()
+            return
+
+        xs = points[:, 0] * (x2 - x1) + x1
+        ys = points[:, 1] * (y2 - y1) + y1
+        body_width = xs.max() - xs.min()
+        body_height = ys.max() - ys.min()
+        if body_width < 1 or body_height < 1:
+            self.lost()
+            return
+
+        pad_x = body_width * self.padding
+        pad_y = body_height * self.padding
+        bbox = self._clip(xs.min() - pad_x, ys.min() - pad_y, xs.max() + pad_x, ys.max() + pad_y)
+        if bbox[2] - bbox[0] < self.min_size or bbox[3] - bbox[1] < self.min_size:
+            self.lost()
+            return
+
+        self.stats['propagated'] += 1
+        self.bbox = bbox
+
+    def lost(self):
+        """Marca el seguimiento como perdido: la siguiente muestra vuelve a detectar con YOLO."""
+        if self.bbox is not None:
+            self.stats['lost'] += 1
+        self.bbox = None
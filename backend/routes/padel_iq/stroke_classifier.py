@@ -0,0 +1,153 @@
+import json
+import logging
+import operator
+import os
+import numpy as np
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Archivo JSON opcional con tablas que reemplazan a las de STROKE_RULES por modo
+RULES_PATH = os.environ.get('PADEL_STROKE_RULES')
+
+FEATURES = ('elbow_angle', 'wrist_speed')
+OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+
+# Reglas por modo, evaluadas en orden: gana la primera cuyas condiciones (característica, operador,
+# umbral) se cumplen todas. Sin regla aplicable el golpe es derecha o revés según dx; 'volea' recibe
+# el mismo sufijo. El saque tiene prioridad sobre todas las reglas.
+STROKE_RULES = {
+    # Juego (segmentar_video_juego, refinamiento) y entrenamiento por ROI (segmentar_video_entrenamiento)
+    'juego': [
+        ('smash', [('elbow_angle', '>', 120), ('wrist_speed', '>', 5)]),
+        ('bandeja', [('elbow_angle', '>', 100), ('elbow_angle', '<=', 120), ('wrist_speed', '>', 3)]),
+        ('globo', [('elbow_angle', '>', 90), ('elbow_angle', '<=', 120), ('wrist_speed', '<=', 3)]),
+        ('defensivo', [('elbow_angle', '<=', 60), ('wrist_speed', '<', 2)]),
+        ('volea', [('elbow_angle', '>', 60), ('elbow_angle', '<=', 90), ('wrist_speed', '>', 1)]),
+    ],
+    # Entrenamiento con MediaPipe sobre el frame completo (analizar_segmento): coordenadas normalizadas
+    'entrenamiento': [
+        ('smash', [('elbow_angle', '>', 150), ('wrist_speed', '>', 1.2)]),
+        ('bandeja', [('elbow_angle', '>', 120), ('wrist_speed', '>', 0.6)]),
+        ('globo', [('elbow_angle', '>', 120), ('wrist_speed', '<', 1.5)]),
+        ('defensivo', [('elbow_angle', '<', 90), ('wrist_speed', '<', 0.2)]),
+        ('volea', [('elbow_angle', '<', 90), ('wrist_speed', '>', 0.05)]),
+    ],
+    # Captura en vivo: la velocidad se mide por segundo real, con umbrales más bajos
+    'captura': [
+        ('smash', [('elbow_angle', '>', 120), ('wrist_speed', '>', 1.5)]),
+        ('bandeja', [('elbow_angle', '>', 100), ('elbow_angle', '<=', 120), ('wrist_speed', '>', 1)]),
+        ('globo', [('elbow_angle', '>', 90), ('elbow_angle', '<=', 120), ('wrist_speed', '<=', 1)]),
+        ('defensivo', [('elbow_angle', '<=', 60), ('wrist_speed', '<', 0.5)]),
+        ('volea', [('elbow_angle', '>', 60), ('elbow_angle', '<=', 90), ('wrist_speed', '>', 0.3)]),
+    ],
+}
+
+def load_stroke_rules(path=None):
+    """Tablas de reglas por modo: las de STROKE_RULES con los modos que defina el JSON de path."""
+    rules = dict(STROKE_RULES)
+    path = path or RULES_PATH
+    if not path:
+        return rules
+    try:
+        with open(path) as f:
+            overrides = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"No se pudieron leer las reglas de golpes de {path}: {str(e)}")
+        return rules
+    for mode, table in overrides.items():
+        rules[mode] = [(label, [tuple(condition) for condition in conditions]) for label, conditions in table]
+    return rules
+
+def _validate(rules):
+    for label, conditions in rules:
+        for feature, op, _ in conditions:
+            if feature not in FEATURES or op not in OPERATORS:
+                raise ValueError(f"Condición inválida en la regla '{label}': {feature} {op}")
+
+class StrokeClassifier:
+    """Clasifica golpes con la tabla de reglas de un modo, de uno en uno o en arrays completos.
+
+    classify() evalúa las reglas en Python para un único golpe, y classify_many() las evalúa con
+    NumPy sobre arrays de características en una sola llamada; ambas usan la misma tabla y dan el
+    mismo resultado. Los segmentadores guardan las características del pico en cada segmento y
+    clasifican los cerrados por lotes con classify_segments().
+    """
+
+    def __init__(self, mode='juego', rules=None):
+        if rules is None:
+            tables = load_stroke_rules()
+            if mode not in tables:
+                logger.warning(f"Modo de clasificación desconocido '{mode}', se usa 'juego'")
+                mode = 'juego'
+            rules = tables[mode]
+        _validate(rules)
+        self.mode = mode
+        self.rules = [(label, [(feature, OPERATORS[op], threshold) for feature, op, threshold in conditions])
+                      for label, conditions in rules]
+
+    @staticmethod
+    def _label(label, is_derecha):
+        side = "derecha" if is_derecha else "reves"
+        if label is None:
+            return side
+        return "volea_" + side if label == 'volea' else label
+
+    def classify(self, elbow_angle, wrist_speed, dx, serve=False):
+        """Tipo de golpe para un único conjunto de características."""
+        if serve:
+            return "saque"
+        features = {'elbow_angle': elbow_angle, 'wrist_speed': wrist_speed}
+        for label, conditions in self.rules:
+            if all(compare(features[feature], threshold) for feature, compare, threshold in conditions):
+                return self._label(label, dx > 0)
+        return self._label(None, dx > 0)
+
+    def classify_many(self, elbow_angle, wrist_speed, dx, serve=None):
+        """Tipos de golpe (array de str) para arrays de características de la misma longitud."""
+        features = {
+            'elbow_angle': np.asarray(elbow_angle, dtype=np.float64),
+            'wrist_speed': np.asarray(wrist_speed, dtype=np.float64),
+        }
+        is_derecha = np.asarray(dx, dtype=np.float64) > 0
+        shape = np.broadcast(features['elbow_angle'], features['wrist_speed'], is_derecha).shape
+
+        conditions, choices = [], []
+        if serve is not None:
+            conditions.append(np.broadcast_to(np.asarray(serve, dtype=bool), shape))
+            choices.append("saque")
+        for label, rule in self.rules:
+            mask = np.ones(shape, dtype=bool)
+            for feature, compare, threshold in rule:
+                mask &= compare(features[feature], threshold)
+            if label == 'volea':
+                conditions += [mask & is_derecha, mask & ~is_derecha]
+                choices += ["volea_derecha", "volea_reves"]
+            else:
+                conditions.append(mask)
+                choices.append(label)
+        default = np.where(is_derecha, "derecha", "reves")
+        return np.select(conditions, choices, default=np.broadcast_to(default, shape)).astype(object)
+
+    def classify_segments(self, segmentos, field='movimiento_direccion'):
+        """Clasifica en una sola llamada los segmentos con 'stroke_features' y les asigna el tipo en field.
+
+        stroke_features es (ángulo del codo, velocidad de la muñeca, dx, saque) del pico del segmento;
+        se retira del segmento al clasificarlo. Devuelve la misma lista.
+        """
+        pending = [segmento for segmento in segmentos if 'stroke_features' in segmento]
+        if not pending:
+            return segmentos
+        elbow_angles, wrist_speeds, dxs, serves = zip(*(segmento.pop('stroke_features') for segmento in pending))
+        for segmento, tipo in zip(pending, self.classify_many(elbow_angles, wrist_speeds, dxs, serves)):
+            segmento[field] = tipo
+        return segmentos
+
+_classifiers = {}
+
+def get_stroke_classifier(mode='juego'):
+    """Clasificador compartido del modo indicado (las tablas se cargan una vez por proceso)."""
+    if mode not in _classifiers:
+        _classifiers[mode] = StrokeClassifier(mode)
+    return _classifiers[mode]
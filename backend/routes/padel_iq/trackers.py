@@ -0,0 +1,175 @@
+import logging
+import os
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from deep_sort_realtime.deepsort_tracker import DeepSort
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = os.environ.get('PADEL_TRACKER_BACKEND', 'deepsort')
+TRACKER_BACKENDS = ('deepsort', 'motion')
+
+# Todos los backends cumplen el contrato de DeepSORT que usan los segmentadores:
+#   tracks = tracker.update_tracks([([left, top, w, h], conf, clase), ...], frame=frame)
+#   track.track_id, track.to_tlwh(), track.is_confirmed(), track.is_tentative(), track.is_deleted()
+
+TENTATIVE = 1
+CONFIRMED = 2
+DELETED = 3
+
+def create_deepsort_tracker():
+    """Tracker DeepSORT con parámetros ajustados (embeddings de apariencia con su CNN)."""
+    return DeepSort(
+        max_age=50,
+        n_init=2,
+        nms_max_overlap=1.0,
+        max_iou_distance=0.9,
+        nn_budget=100
+    )
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU entre dos conjuntos de cajas (x1, y1, x2, y2) como matriz len(a) x len(b)."""
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(1, -1, 4)
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+class MotionTrack:
+    """Track del tracker de movimiento: caja actual, velocidad y estado (tentativo/confirmado/borrado)."""
+
+    def __init__(self, track_id, box, conf, n_init, max_age):
+        self.track_id = track_id
+        self.box = np.asarray(box, dtype=np.float64)  # x1, y1, x2, y2
+        self.measured = self.box  # Última caja detectada
+        self.velocity = np.zeros(4)
+        self.det_conf = conf
+        self.hits = 1
+        self.age = 1
+        self.time_since_update = 0
+        self.state = TENTATIVE if n_init > 1 else CONFIRMED
+        self._n_init = n_init
+        self._max_age = max_age
+
+    def predict(self):
+        """Avanza la caja con la velocidad estimada (modelo de velocidad constante)."""
+        self.box = self.box + self.velocity
+        # Sin medidas la caja no puede invertirse: mínimo de un píxel de ancho y alto
+        self.box[2] = max(self.box[2], self.box[0] + 1)
+        self.box[3] = max(self.box[3], self.box[1] + 1)
+        self.age += 1
+        self.time_since_update += 1
+        self.det_conf = None
+
+    def update(self, box, conf, smoothing=0.5):
+        box = np.asarray(box, dtype=np.float64)
+        # Velocidad por muestra suavizada (filtro alfa-beta), repartida entre las muestras sin detección
+        observed = (box - self.measured) / max(self.time_since_update, 1)
+        self.velocity = smoothing * self.velocity + (1 - smoothing) * observed
+        self.box = box
+        self.measured = box
+        self.det_conf = conf
+        self.hits += 1
+        self.time_since_update = 0
+        if self.state == TENTATIVE and self.hits >= self._n_init:
+            self.state = CONFIRMED
+
+    def mark_missed(self):
+        if self.state == TENTATIVE or self.time_since_update > self._max_age:
+            self.state = DELETED
+
+    def to_tlwh(self):
+        x1, y1, x2, y2 = self.box
+        return np.array([x1, y1, x2 - x1, y2 - y1])
+
+    to_ltwh = to_tlwh
+
+    def get_det_conf(self):
+        return self.det_conf
+
+    def is_tentative(self):
+        return self.state == TENTATIVE
+
+    def is_confirmed(self):
+        return self.state == CONFIRMED
+
+    def is_deleted(self):
+        return self.state == DELETED
+
+class MotionTracker:
+    """Tracker solo de movimiento (IoU, estilo ByteTrack), sin embeddings de apariencia.
+
+    Con cámara fija y cuatro jugadores basta la geometría: cada update predice las cajas con su
+    velocidad y asocia por IoU con el algoritmo húngaro, primero las detecciones de confianza alta y
+    después las de confianza baja contra los tracks que quedaron libres.
+    """
+
+    def __init__(self, max_age=50, n_init=2, min_iou=0.1, high_threshold=0.5):
+        self.max_age = max_age
+        self.n_init = n_init
+        self.min_iou = min_iou  # Igual que max_iou_distance=0.9 de DeepSORT
+        self.high_threshold = high_threshold
+        self.tracks = []
+        self._next_id = 1
+
+    def _associate(self, tracks, boxes):
+        """Parejas (track, detección) con IoU suficiente y los índices de detección sin pareja."""
+        if not tracks or not boxes:
+            return [], list(range(len(boxes)))
+        ious = iou_matrix([t.box for t in tracks], boxes)
+        rows, cols = linear_sum_assignment(-ious)
+        matches = [(r, c) for r, c in zip(rows, cols) if ious[r, c] >= self.min_iou]
+        matched_cols = {c for _, c in matches}
+        return matches, [c for c in range(len(boxes)) if c not in matched_cols]
+
+    def update_tracks(self, raw_detections, embeds=None, frame=None, others=None):
+        """Mismo contrato que DeepSort.update_tracks; frame y embeds se ignoran."""
+        detections = [(np.array([l, t, l + w, t + h], dtype=np.float64), float(np.squeeze(conf)))
+                      for (l, t, w, h), conf, _ in raw_detections if w > 0 and h > 0]
+        for track in self.tracks:
+            track.predict()
+
+        high = [d for d in detections if d[1] >= self.high_threshold]
+        low = [d for d in detections if d[1] < self.high_threshold]
+
+        # 1) Detecciones de confianza alta contra todos los tracks
+        matches, unmatched_high = self._associate(self.tracks, [d[0] for d in high])
+        matched_tracks = set()
+        for r, c in matches:
+            self.tracks[r].update(*high[c])
+            matched_tracks.add(r)
+
+        # 2) Detecciones de confianza baja contra los tracks confirmados que quedaron libres
+        remaining = [i for i, t in enumerate(self.tracks) if i not in matched_tracks and t.is_confirmed()]
+        low_matches, _ = self._associate([self.tracks[i] for i in remaining], [d[0] for d in low])
+        for r, c in low_matches:
+            self.tracks[remaining[r]].update(*low[c])
+            matched_tracks.add(remaining[r])
+
+        for i, track in enumerate(self.tracks):
+            if i not in matched_tracks:
+                track.mark_missed()
+
+        # Solo las detecciones de confianza alta sin pareja inician tracks nuevos
+        for c in unmatched_high:
+            box, conf = high[c]
+            self.tracks.append(MotionTrack(str(self._next_id), box, conf, self.n_init, self.max_age))
+            self._next_id += 1
+
+        self.tracks = [t for t in self.tracks if not t.is_deleted()]
+        return self.tracks
+
+def create_tracker(backend=None):
+    """Crea el tracker del backend indicado o el de PADEL_TRACKER_BACKEND ('deepsort' o 'motion')."""
+    backend = backend or DEFAULT_BACKEND
+    if backend == 'motion':
+        return MotionTracker()
+    if backend != 'deepsort':
+        logger.warning(f"Backend de tracking desconocido '{backend}', se usa deepsort")
+    return create_deepsort_tracker()
@@ -0,0 +1,279 @@
+import logging
+import os
+import tempfile
+import threading
+import uuid
+import weakref
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+import numpy as np
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TRAJECTORY_DIR = os.environ.get('PADEL_TRAJECTORY_DIR') or tempfile.gettempdir()
+
+# Un punto de trayectoria por registro; side y zone se guardan como índice en la tabla de etiquetas
+RECORD_DTYPE = np.dtype([
+    ('track', '<i4'),
+    ('time', '<f8'),
+    ('position', '<f8', (2,)),
+    ('bbox', '<i4', (4,)),
+    ('side', '<i2'),
+    ('zone', '<i2'),
+    ('player_position', '<i2'),
+])
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class TrackTrajectory:
+    """Trayectoria de un track guardada en el TrajectoryStore.
+
+    Se comporta como la lista de puntos de antes (len, iteración, índices) pero en memoria solo
+    guarda los últimos puntos, los bloques del archivo donde tiene registros y las posiciones de
+    jugador que tuvo; el resto se lee del disco al recorrerla.
+    """
+
+    def __init__(self, store, index, hot_points):
+        self._store = store
+        self.index = index
+        self.tail = deque(maxlen=hot_points)
+        self.count = 0
+        self.chunks = []  # Bloques del archivo con registros de este track
+        self.player_positions = set()
+
+    def append(self, point):
+        self._store._append(self, point)
+        self.tail.append(point)
+        self.count += 1
+        self.player_positions.add(point['player_position'])
+
+    def __len__(self):
+        return self.count
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __iter__(self):
+        return iter(self._store._points(self))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._store._points(self)[i]
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("índice de trayectoria fuera de rango")
+        # Los últimos puntos se sirven de memoria, que es lo que consulta el segmentador en cada frame
+        offset = i - (self.count - len(self.tail))
+        if offset >= 0:
+            return self.tail[offset]
+        return self._store._points(self)[i]
+
+    def between(self, start_time, end_time):
+        """Puntos con start_time <= time <= end_time, leyendo solo los bloques que los contienen."""
+        return self._store._points(self, start_time, end_time)
+
+    def evict(self):
+        """Libera los puntos recientes de un track muerto; se conserva el último para trajectory[-1]."""
+        if len(self.tail) > 1:
+            last = self.tail[-1]
+            self.tail.clear()
+            self.tail.append(last)
+
+class TrajectoryStore(MutableMapping):
+    """Trayectorias de todos los tracks en un archivo binario de solo anexado, con la interfaz de un dict.
+
+    store[track_id] = [] crea una trayectoria vacía y store[track_id].append(punto) la extiende, como
+    con el dict de listas; los puntos se acumulan en un buffer y se escriben en bloques de
+    flush_size registros. El estado se puede guardar con pickle (checkpoints): al restaurarlo, el
+    archivo se recorta al tamaño que tenía, descartando lo escrito después del checkpoint.
+    """
+
+    def __init__(self, path=None, hot_points=4, flush_size=1024, cache_chunks=16):
+        self.owned = path is None  # Archivo temporal: se borra con el store
+        self.path = path or os.path.join(TRAJECTORY_DIR, f"trajectories_{uuid.uuid4().hex}.bin")
+        self.hot_points = hot_points
+        self.flush_size = flush_size
+        self.cache_chunks = cache_chunks
+        self._tracks = {}
+        self._labels = []
+        self._label_codes = {}
+        self._chunks = []  # (primer registro, registros, tiempo mínimo, tiempo máximo)
+        self._records = 0
+        self._init_buffers()
+        if self.owned:
+            weakref.finalize(self, _remove_file, self.path)
+
+    def _init_buffers(self):
+        self._pending = []
+        self._pending_tracks = set()
+        self._cache = OrderedDict()
+        # Los workers de refine_segments leen trayectorias en paralelo: la caché LRU no es segura entre hilos
+        self._cache_lock = threading.Lock()
+
+    # Interfaz de dict
+    def __getitem__(self, track_id):
+        return self._tracks[track_id]
+
+    def __setitem__(self, track_id, points):
+        trajectory = TrackTrajectory(self, len(self._tracks), self.hot_points)
+        self._tracks[track_id] = trajectory
+        for point in points:
+            trajectory.append(point)
+
+    def __delitem__(self, track_id):
+        # Los registros quedan en el archivo, pero ya no son accesibles
+        del self._tracks[track_id]
+
+    def __iter__(self):
+        return iter(self._tracks)
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def evict(self, track_id):
+        if track_id in self._tracks:
+            self._tracks[track_id].evict()
+
+    # Escritura
+    def _code(self, label):
+        if label not in self._label_codes:
+            self._label_codes[label] = len(self._labels)
+            self._labels.append(label)
+        return self._label_codes[label]
+
+    def _append(self, trajectory, point):
+        self._pending.append((trajectory.index, point['time'], point['position'], point.get('bbox') or (0, 0, 0, 0),
+                              self._code(point.get('side')), self._code(point.get('zone')), point['player_position']))
+        self._pending_tracks.add(trajectory)
+        if len(self._pending) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        """Escribe el buffer como un bloque nuevo al final del archivo."""
+        if not self._pending:
+            return
+        block = np.array(self._pending, dtype=RECORD_DTYPE)
+        # El primer bloque crea el archivo (o descarta uno antiguo con el mismo nombre)
+        with open(self.path, 'ab' if self._records else 'wb') as f:
+            block.tofile(f)
+        chunk_id = len(self._chunks)
+        self._chunks.append((self._records, len(block), float(block['time'].min()), float(block['time'].max())))
+        self._records += len(block)
+        for trajectory in self._pending_tracks:
+            trajectory.chunks.append(chunk_id)
+        self._pending = []
+        self._pending_tracks = set()
+
+    # Lectura
+    def _read_chunk(self, chunk_id):
+        with self._cache_lock:
+            block = self._cache.get(chunk_id)
+            if block is not None:
+                self._cache.move_to_end(chunk_id)
+                return block
+        # La lectura del archivo queda fuera del lock; si dos hilos leen el mismo bloque, gana el último
+        start, count, _, _ = self._chunks[chunk_id]
+        block = np.fromfile(self.path, dtype=RECORD_DTYPE, count=count, offset=start * RECORD_DTYPE.itemsize)
+        with self._cache_lock:
+            self._cache[chunk_id] = block
+            self._cache.move_to_end(chunk_id)
+            while len(self._cache) > self.cache_chunks:
+                self._cache.popitem(last=False)
+        return block
+
+    def _to_point(self, record):
+        return {
+            'time': float(record['time']),
+            'position': tuple(record['position'].tolist()),
+            'bbox': tuple(record['bbox'].tolist()),
+            'side': self._labels[record['side']],
+            'zone': self._labels[record['zone']],
+            'player_position': int(record['player_position'])
+        }
+
+    def _points(self, trajectory, start_time=None, end_time=None):
+        lo = -np.inf if start_time is None else start_time
+        hi = np.inf if end_time is None else end_time
+        points = []
+        for chunk_id in trajectory.chunks:
+            _, _, t_min, t_max = self._chunks[chunk_id]
+            if t_max < lo or t_min > hi:
+                continue
+            block = self._read_chunk(chunk_id)
+            mask = (block['track'] == trajectory.index) & (block['time'] >= lo) & (block['time'] <= hi)
+            points.extend(self._to_point(record) for record in block[mask])
+        if trajectory in self._pending_tracks:
+            points.extend(self._to_point(record) for record in np.array(
+                [p for p in self._pending if p[0] == trajectory.index and lo <= p[1] <= hi], dtype=RECORD_DTYPE))
+        return points
+
+    def size_bytes(self):
+        return self._records * RECORD_DTYPE.itemsize
+
+    # Checkpoints
+    def __getstate__(self):
+        self.flush()
+        return {
+            'path': self.path,
+            'hot_points': self.hot_points,
+            'flush_size': self.flush_size,
+            'cache_chunks': self.cache_chunks,
+            'labels': self._labels,
+            'chunks': self._chunks,
+            'records': self._records,
+            'tracks': [(track_id, t.index, list(t.tail), t.count, t.chunks, t.player_positions)
+                       for track_id, t in self._tracks.items()]
+        }
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self.owned = False  # Pertenece al checkpoint, que lo borra al terminar el análisis
+        self.hot_points = state['hot_points']
+        self.flush_size = state['flush_size']
+        self.cache_chunks = state['cache_chunks']
+        self._labels = state['labels']
+        self._label_codes = {label: code for code, label in enumerate(self._labels)}
+        self._chunks = state['chunks']
+        self._records = state['records']
+        self._init_buffers()
+        size = self._records * RECORD_DTYPE.itemsize
+        if size and (not os.path.exists(self.path) or os.path.getsize(self.path) < size):
+            raise ValueError(f"Archivo de trayectorias incompleto: {self.path}")
+        if size and os.path.getsize(self.path) > size:
+            os.truncate(self.path, size)
+        self._tracks = {}
+        for track_id, index, tail, count, chunks, player_positions in state['tracks']:
+            trajectory = TrackTrajectory(self, index, self.hot_points)
+            trajectory.tail.extend(tail)
+            trajectory.count = count
+            trajectory.chunks = chunks
+            trajectory.player_positions = player_positions
+            self._tracks[track_id] = trajectory
+
+def create_trajectory_store(custom_params, hot_points=4):
+    """Store de trayectorias en disco; junto al checkpoint si lo hay, para poder reanudar."""
+    checkpoint_path = custom_params.get('checkpoint_path')
+    path = None
+    if checkpoint_path:
+        os.makedirs(checkpoint_path, exist_ok=True)
+        path = os.path.join(checkpoint_path, 'trajectories.bin')
+    return TrajectoryStore(path, hot_points=hot_points)
+
+def points_between(trajectory, start_time, end_time):
+    """Puntos de una trayectoria (lista o TrackTrajectory) con start_time <= time <= end_time."""
+    if isinstance(trajectory, TrackTrajectory):
+        return trajectory.between(start_time, end_time)
+    return [p for p in trajectory if start_time <= p['time'] <= end_time]
+
+def has_player_position(trajectory, player_position):
+    """Si la trayectoria tuvo alguna vez la posición de jugador indicada."""
+    if isinstance(trajectory, TrackTrajectory):
+        return player_position in trajectory.player_positions
+    return any(p['player_position'] == player_position for p in trajectory)
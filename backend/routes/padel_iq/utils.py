@@ -12,4 +12,57 @@ def calculate_angle(a, b, c):
     if angle > 180.0:
         angle = 360 - angle
 
-    return angle
\ No newline at end of file
+    return angle
+
+def combinar_padel_iq(tecnica, ritmo, fuerza, repeticion):
+    """Padel IQ (0-100) a partir de técnica, ritmo, fuerza y repetición."""
+    padel_iq = (tecnica * 0.4 + ritmo * 0.3 + fuerza * 0.2 + repeticion * 0.1) + 15
+    return min(padel_iq, 100)
+
+def nivel_jugador(padel_iq):
+    """Nivel del jugador según su Padel IQ: menos de 30, principiante; menos de 60, intermedio."""
+    return "Principiante" if padel_iq < 30 else "Intermedio" if padel_iq < 60 else "Avanzado"
+
+def calcular_metricas_padel_iq(golpes_clasificados, video_duration, tipo_video):
+    """Calcula técnica, ritmo, fuerza y Padel IQ a partir de los golpes clasificados."""
+    total_golpes = 0
+    tecnica_total = 0
+    fuerza = 0
+    golpes_en_red = 0
+    golpes_exitosos_en_red = 0
+
+    for tipo, golpes in golpes_clasificados.items():
+        total_golpes += len(golpes)
+        for golpe in golpes:
+            tecnica_total += golpe.get('calidad', 0)
+            fuerza += golpe.get('max_wrist_speed', 0)
+            if tipo_video == 'juego':
+                if golpe.get('posicion_cancha') == 'red':
+                    golpes_en_red += 1
+                    if tipo in ['smash', 'volea_derecha', 'volea_reves', 'derecha', 'reves', 'bandeja']:
+                        golpes_exitosos_en_red += 1
+
+    tecnica = (tecnica_total / total_golpes) if total_golpes > 0 else 0
+    tecnica = min(tecnica, 100)
+    ritmo = (total_golpes / video_duration) * 120 if video_duration > 0 else 0  # Volver al factor 120
+    ritmo = min(ritmo, 100)
+    fuerza = (fuerza / total_golpes) if total_golpes > 0 else 0
+    fuerza = min(fuerza, 100)
+    repeticion = 2.0
+
+    padel_iq = combinar_padel_iq(tecnica, ritmo, fuerza, repeticion)
+    player_level = nivel_jugador(padel_iq)
+
+    efectividad_red = (golpes_exitosos_en_red / golpes_en_red * 100) if golpes_en_red > 0 else 0
+
+    return {
+        'total_golpes': total_golpes,
+        'tecnica': tecnica,
+        'ritmo': ritmo,
+        'fuerza': fuerza,
+        'repeticion': repeticion,
+        'padel_iq': padel_iq,
+        'player_level': player_level,
+        'force_category': "quinta_fuerza",
+        'efectividad_red': efectividad_red
+    }
@@ -0,0 +1,173 @@
+import logging
+import os
+import cv2
+
+try:
+    import av
+except ImportError:
+    av = None
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = os.environ.get('PADEL_VIDEO_DECODER', 'opencv')
+
+class OpenCVDecoder:
+    """Decodificador basado en cv2.VideoCapture (comportamiento original)."""
+    name = 'opencv'
+
+    def __init__(self, path, width=None, height=None):
+        self.width = width
+        self.height = height
+        self.cap = cv2.VideoCapture(path)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap.isOpened() else 0
+        self.fps = fps if fps > 0 else 30
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) if self.cap.isOpened() else 0
+        self.duration = self.frame_count / self.fps
+        self.frame_index = -1
+        self.timestamp = 0.0
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    def _advance(self):
+        self.frame_index += 1
+        self.timestamp = self.frame_index / self.fps
+
+    def read(self):
+        """Devuelve (ret, frame) con el frame ya escalado al tamaño objetivo, si se indicó."""
+        ret, frame = self.cap.read()
+        if not ret:
+            return False, None
+        self._advance()
+        if self.width and self.height and (frame.shape[1] != self.width or frame.shape[0] != self.height):
+            frame = cv2.resize(frame, (self.width, self.height))
+        return True, frame
+
+    def skip(self):
+        """Avanza un frame sin convertirlo."""
+        if not self.cap.grab():
+            return False
+        self._advance()
+        return True
+
+    def seek(self, frame_index):
+        """Posiciona el decodificador para que el siguiente read() devuelva frame_index."""
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        self.frame_index = frame_index - 1
+
+    def release(self):
+        self.cap.release()
+
+class PyAVDecoder:
+    """Decodificador FFmpeg (PyAV) con hilos, escalado directo al tamaño objetivo y marcas de tiempo reales."""
+    name = 'pyav'
+
+    def __init__(self, path, width=None, height=None, thread_count=0):
+        self.width = width
+        self.height = height
+        self.container = None
+        self.stream = None
+        self.frame_index = -1
+        self.timestamp = 0.0
+        self._frames = None
+        self._pending = None
+        try:
+            self.container = av.open(path)
+            self.stream = self.container.streams.video[0]
+        except Exception as e:
+            logger.error(f"PyAV no pudo abrir el video {path}: {str(e)}")
+            self.container = None
+            self.fps = 30
+            self.frame_count = 0
+            self.duration = 0.0
+            return
+
+        # Decodificación multihilo por frames y por slices
+        self.stream.thread_type = 'AUTO'
+        self.stream.thread_count = thread_count
+
+        rate = self.stream.average_rate or self.stream.guessed_rate
+        self.fps = float(rate) if rate else 30
+        if self.stream.duration is not None and self.stream.time_base is not None:
+            self.duration = float(self.stream.duration * self.stream.time_base)
+        elif self.container.duration is not None:
+            self.duration = self.container.duration / av.time_base
+        else:
+            self.duration = 0.0
+        self.frame_count = self.stream.frames or int(round(self.duration * self.fps))
+        self._frames = self.container.decode(self.stream)
+
+    def is_opened(self):
+        return self.container is not None
+
+    def _next(self):
+        if self._pending is not None:
+            frame, self._pending = self._pending, None
+        else:
+            try:
+                frame = next(self._frames)
+            except (StopIteration, av.error.EOFError):
+                return None
+        if frame.time is not None:
+            self.timestamp = float(frame.time)
+            self.frame_index = int(round(self.timestamp * self.fps))
+        else:
+            self.frame_index += 1
+            self.timestamp = self.frame_index / self.fps
+        return frame
+
+    def read(self):
+        """Devuelve (ret, frame) en BGR, escalado por FFmpeg (swscale) al tamaño objetivo."""
+        if self._frames is None:
+            return False, None
+        frame = self._next()
+        if frame is None:
+            return False, None
+        if self.width and self.height:
+            return True, frame.to_ndarray(format='bgr24', width=self.width, height=self.height)
+        return True, frame.to_ndarray(format='bgr24')
+
+    def skip(self):
+        """Avanza un frame decodificándolo pero sin convertirlo a BGR."""
+        if self._frames is None:
+            return False
+        return self._next() is not None
+
+    def seek(self, frame_index):
+        """Salta al keyframe anterior y descarta frames hasta llegar a frame_index."""
+        if self._frames is None:
+            return
+        target_time = frame_index / self.fps
+        offset = int(target_time / self.stream.time_base) if self.stream.time_base else 0
+        self.container.seek(offset, stream=self.stream, backward=True, any_frame=False)
+        self._frames = self.container.decode(self.stream)
+        self._pending = None
+        half_frame = 0.5 / self.fps
+        for frame in self._frames:
+            if frame.time is None or frame.time >= target_time - half_frame:
+                self._pending = frame
+                break
+        self.frame_index = frame_index - 1
+
+    def release(self):
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+            self._frames = None
+
+DECODERS = {
+    'opencv': OpenCVDecoder,
+    'pyav': PyAVDecoder
+}
+
+def create_decoder(path, backend=None, width=None, height=None):
+    """Crea el decodificador configurado; si PyAV no está instalado se usa OpenCV."""
+    backend = backend or DEFAULT_BACKEND
+    if backend not in DECODERS:
+        raise ValueError(f"Backend de decodificación no soportado: {backend}")
+    if backend == 'pyav' and av is None:
+        logger.warning("PyAV no está instalado, usando el decodificador de OpenCV")
+        backend = 'opencv'
+    return DECODERS[backend](path, width=width, height=height)
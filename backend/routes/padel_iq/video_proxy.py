@@ -0,0 +1,163 @@
+import hashlib
+import logging
+import os
+import time
+from fractions import Fraction
+import cv2
+from .court_region import COURT_SUFFIX, court_cache_path
+from .scene_index import SCENE_INDEX_SUFFIX, index_path
+from .video_decoder import av, create_decoder
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROXY_CACHE_DIR = os.environ.get('PADEL_PROXY_CACHE_DIR', 'proxy_cache')
+PROXY_CACHE_MAX_BYTES = int(os.environ.get('PADEL_PROXY_CACHE_MAX_BYTES', 20 * 1024 ** 3))
+# Cachés guardadas junto a cada proxy (sufijo, ruta): se eliminan con él
+SIDECARS = ((SCENE_INDEX_SUFFIX, index_path), (COURT_SUFFIX, court_cache_path))
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 del contenido del archivo, leído por bloques."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _transcode_pyav(source_path, target_path, width, height, fps, gop):
+    with av.open(source_path) as source:
+        in_stream = source.streams.video[0]
+        in_stream.thread_type = 'AUTO'
+        source_rate = in_stream.average_rate or in_stream.guessed_rate or 30
+        rate = Fraction(fps).limit_denominator(1001) if fps else Fraction(source_rate).limit_denominator(1001)
+        if rate > source_rate:
+            rate = Fraction(source_rate).limit_denominator(1001)
+
+        with av.open(target_path, 'w', format='mp4') as target:
+            out_stream = target.add_stream('libx264', rate=rate)
+            out_stream.width = width
+            out_stream.height = height
+            out_stream.pix_fmt = 'yuv420p'
+            # GOP corto y sin B-frames para que los seeks por juego y por segmento sean baratos
+            out_stream.codec_context.gop_size = gop
+            out_stream.codec_context.options = {'preset': 'veryfast', 'crf': '23', 'bf': '0'}
+
+            frame_period = 1 / rate
+            half_source_period = 1 / (2 * Fraction(source_rate))
+            next_time = 0
+            index = 0
+            for frame in source.decode(in_stream):
+                frame_time = Fraction(frame.time).limit_denominator(100000) if frame.time is not None else index * frame_period
+                # Al reducir fps se conserva el primer frame de cada intervalo de salida
+                if frame_time + half_source_period < next_time:
+                    continue
+                out_frame = frame.reformat(width=width, height=height, format='yuv420p')
+                out_frame.pts = index
+                out_frame.time_base = frame_period
+                for packet in out_stream.encode(out_frame):
+                    target.mux(packet)
+                index += 1
+                next_time = index * frame_period
+            for packet in out_stream.encode():
+                target.mux(packet)
+    return index
+
+def _transcode_opencv(source_path, target_path, width, height, fps):
+    decoder = create_decoder(source_path, 'opencv', width=width, height=height)
+    if not decoder.is_opened():
+        raise ValueError("No se pudo abrir el video para generar el proxy")
+    out_fps = min(fps, decoder.fps) if fps else decoder.fps
+    writer = cv2.VideoWriter(target_path, cv2.VideoWriter_fourcc(*'mp4v'), out_fps, (width, height))
+    index = 0
+    while True:
+        ret, frame = decoder.read()
+        if not ret:
+            break
+        if decoder.timestamp + 0.5 / decoder.fps < index / out_fps:
+            continue
+        writer.write(frame)
+        index += 1
+    writer.release()
+    decoder.release()
+    return index
+
+def prune_cache(cache_dir=PROXY_CACHE_DIR, max_bytes=PROXY_CACHE_MAX_BYTES):
+    """Elimina los proxies usados hace más tiempo, con sus cachés (cortes, cancha), hasta quedar por debajo del tamaño máximo."""
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        suffix = next((suffix for suffix, _ in SIDECARS if name.endswith(suffix)), None)
+        if suffix is not None and not os.path.exists(path[:-len(suffix)]):
+            # Caché de un proxy ya eliminado
+            _remove(path)
+        elif name.endswith('.mp4') and os.path.isfile(path):
+            stat = os.stat(path)
+            sidecar_size = sum(os.path.getsize(sidecar(path)) for _, sidecar in SIDECARS if os.path.exists(sidecar(path)))
+            entries.append((stat.st_atime, stat.st_size + sidecar_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove(path)
+        for _, sidecar in SIDECARS:
+            _remove(sidecar(path))
+        total -= size
+        logger.info(f"Proxy eliminado de la caché: {path}")
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def remove_sidecars(video_path):
+    """Elimina las cachés guardadas junto a un video (índice de cortes, calibración de cancha)."""
+    for _, sidecar in SIDECARS:
+        _remove(sidecar(video_path))
+
+def ensure_proxy(source_path, width=640, height=480, fps=None, gop=15, cache_dir=PROXY_CACHE_DIR):
+    """Devuelve la ruta del proxy de análisis del video, transcodificándolo solo si no está en caché."""
+    digest = file_digest(source_path)
+    fps_tag = f"{fps:g}" if fps else 'src'
+    proxy_path = os.path.join(cache_dir, f"{digest}_{width}x{height}_{fps_tag}_g{gop}.mp4")
+    if os.path.exists(proxy_path):
+        # Solo el acceso (orden de la poda); la fecha de modificación se conserva
+        os.utime(proxy_path, ns=(time.time_ns(), os.stat(proxy_path).st_mtime_ns))
+        logger.info(f"Usando proxy en caché: {proxy_path}")
+        return proxy_path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{proxy_path}.{os.getpid()}.tmp.mp4"
+    try:
+        if av is not None:
+            frames = _transcode_pyav(source_path, tmp_path, width, height, fps, gop)
+        else:
+            frames = _transcode_opencv(source_path, tmp_path, width, height, fps)
+        os.replace(tmp_path, proxy_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    logger.info(f"Proxy de análisis generado: {proxy_path} ({frames} frames)")
+    prune_cache(cache_dir)
+    return proxy_path
+
+def get_analysis_video(source_path, custom_params=None):
+    """Ruta del video que deben leer las pasadas de análisis: el proxy si está activado, si no el original."""
+    custom_params = custom_params or {}
+    if not custom_params.get('proxy_enabled', True):
+        return source_path
+    try:
+        return ensure_proxy(
+            source_path,
+            width=custom_params.get('proxy_width', 640),
+            height=custom_params.get('proxy_height', 480),
+            fps=custom_params.get('proxy_fps'),
+            gop=custom_params.get('proxy_gop', 15)
+        )
+    except Exception as e:
+        logger.error(f"Error al generar el proxy de análisis, usando el video original: {str(e)}")
+        return source_path
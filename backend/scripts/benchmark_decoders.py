@@ -0,0 +1,69 @@
+import argparse
+import importlib.util
+import os
+import time
+
+# Cargar el módulo directamente para no inicializar Firebase al importar routes.padel_iq
+_module_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'routes', 'padel_iq', 'video_decoder.py')
+_spec = importlib.util.spec_from_file_location('padel_video_decoder', _module_path)
+video_decoder = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(video_decoder)
+
+def benchmark(path, backend, width, height, frame_skip):
+    """Decodifica el video completo y devuelve métricas de velocidad y de metadatos."""
+    decoder = video_decoder.create_decoder(path, backend, width=width, height=height)
+    if not decoder.is_opened():
+        return None
+
+    start = time.perf_counter()
+    decoded = 0
+    converted = 0
+    last_timestamp = 0.0
+    while True:
+        # Mismo patrón que los segmentadores: solo se convierte un frame de cada frame_skip
+        if (decoded + 1) % frame_skip == 0:
+            ret, _ = decoder.read()
+            converted += ret
+        else:
+            ret = decoder.skip()
+        if not ret:
+            break
+        decoded += 1
+        last_timestamp = decoder.timestamp
+    elapsed = time.perf_counter() - start
+    decoder.release()
+
+    return {
+        'backend': decoder.name,
+        'reported_frames': decoder.frame_count,
+        'reported_fps': decoder.fps,
+        'decoded_frames': decoded,
+        'converted_frames': converted,
+        'last_timestamp': last_timestamp,
+        'seconds': elapsed,
+        'decode_fps': decoded / elapsed if elapsed > 0 else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara los backends de decodificación de video sobre los mismos archivos.")
+    parser.add_argument('videos', nargs='+', help="Archivos de video a decodificar")
+    parser.add_argument('--backends', default='opencv,pyav')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--frame-skip', type=int, default=12)
+    args = parser.parse_args()
+
+    for path in args.videos:
+        print(path)
+        for backend in args.backends.split(','):
+            result = benchmark(path, backend, args.width, args.height, args.frame_skip)
+            if result is None:
+                print(f"  {backend}: no se pudo abrir")
+                continue
+            print(f"  {result['backend']:>6}: {result['decode_fps']:8.1f} frames/s en {result['seconds']:.2f}s | "
+                  f"frames reportados {result['reported_frames']} a {result['reported_fps']:.2f} fps, "
+                  f"decodificados {result['decoded_frames']} (convertidos {result['converted_frames']}), "
+                  f"último timestamp {result['last_timestamp']:.2f}s")
+
+if __name__ == "__main__":
+    main()
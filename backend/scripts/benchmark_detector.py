@@ -0,0 +1,112 @@
+import argparse
+import importlib.util
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+# Cargar el módulo directamente para no inicializar Firebase al importar routes.padel_iq
+_module_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'routes', 'padel_iq', 'person_detector.py')
+_spec = importlib.util.spec_from_file_location('padel_person_detector', _module_path)
+person_detector = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(person_detector)
+
+def load_frames(path, frame_skip, max_frames):
+    """Frames muestreados como en los segmentadores: 640x480, uno de cada frame_skip."""
+    cap = cv2.VideoCapture(path)
+    frames = []
+    index = 0
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if index % frame_skip == 0:
+            frames.append(cv2.resize(frame, (640, 480)))
+        index += 1
+    cap.release()
+    return frames
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def match(reference, candidate, threshold=0.5):
+    """Emparejamiento voraz por IoU; devuelve los IoU y diferencias de confianza de las parejas."""
+    pairs = sorted(((iou(r, c), i, j) for i, r in enumerate(reference) for j, c in enumerate(candidate)), reverse=True)
+    used_ref, used_cand, ious, conf_diffs = set(), set(), [], []
+    for value, i, j in pairs:
+        if value < threshold or i in used_ref or j in used_cand:
+            continue
+        used_ref.add(i)
+        used_cand.add(j)
+        ious.append(value)
+        conf_diffs.append(abs(reference[i][4] - candidate[j][4]))
+    return ious, conf_diffs
+
+def run_variant(variant, frames, imgsz, min_confidence, warmup):
+    backend, _, suffix = variant.partition('-')
+    detector = person_detector.PersonDetector(backend, imgsz=imgsz, int8=suffix == 'int8')
+    if detector.name != variant:
+        return detector.name, None, None
+    for frame in frames[:warmup]:
+        detector.detect(frame, min_confidence)
+    start = time.perf_counter()
+    outputs = [detector.detect(frame, min_confidence) for frame in frames]
+    elapsed = time.perf_counter() - start
+    return detector.name, outputs, len(frames) / elapsed if elapsed > 0 else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara velocidad y paridad de los backends del detector de personas.")
+    parser.add_argument('videos', nargs='+', help="Videos de los que se toman los frames")
+    parser.add_argument('--variants', default='pytorch,onnx,onnx-int8,openvino,openvino-int8')
+    parser.add_argument('--imgsz', type=int, default=person_detector.DEFAULT_IMGSZ)
+    parser.add_argument('--frame-skip', type=int, default=12)
+    parser.add_argument('--max-frames', type=int, default=300)
+    parser.add_argument('--min-confidence', type=float, default=0.5)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--min-recall', type=float, default=0.95, help="Fracción mínima de detecciones de PyTorch recuperadas")
+    parser.add_argument('--min-iou', type=float, default=0.9, help="IoU medio mínimo con las cajas de PyTorch")
+    args = parser.parse_args()
+
+    frames = [frame for path in args.videos for frame in load_frames(path, args.frame_skip, args.max_frames)]
+    if not frames:
+        print("No se pudo leer ningún frame")
+        sys.exit(1)
+    print(f"{len(frames)} frames de {len(args.videos)} video(s), imgsz={args.imgsz}")
+
+    # PyTorch es la referencia de paridad
+    _, reference, reference_fps = run_variant('pytorch', frames, args.imgsz, args.min_confidence, args.warmup)
+    total_reference = sum(len(dets) for dets in reference)
+    print(f"  {'pytorch':>14}: {reference_fps:7.1f} frames/s | {total_reference} detecciones (referencia)")
+
+    failed = False
+    for variant in args.variants.split(','):
+        if variant == 'pytorch':
+            continue
+        name, outputs, fps = run_variant(variant, frames, args.imgsz, args.min_confidence, args.warmup)
+        if outputs is None:
+            print(f"  {variant:>14}: no disponible (se cargó {name})")
+            continue
+        ious, conf_diffs = [], []
+        for ref_dets, dets in zip(reference, outputs):
+            frame_ious, frame_diffs = match(ref_dets, dets)
+            ious.extend(frame_ious)
+            conf_diffs.extend(frame_diffs)
+        total = sum(len(dets) for dets in outputs)
+        recall = len(ious) / total_reference if total_reference else 1.0
+        precision = len(ious) / total if total else 1.0
+        mean_iou = float(np.mean(ious)) if ious else 0.0
+        ok = recall >= args.min_recall and (mean_iou >= args.min_iou or not ious)
+        failed |= not ok
+        print(f"  {variant:>14}: {fps:7.1f} frames/s (x{fps / reference_fps:.2f}) | {total} detecciones, "
+              f"recall {recall:.3f}, precisión {precision:.3f}, IoU medio {mean_iou:.3f}, "
+              f"Δconf medio {float(np.mean(conf_diffs)) if conf_diffs else 0.0:.3f} | {'OK' if ok else 'FALLA'}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import argparse
+import importlib
+import importlib.machinery
+import importlib.util
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import types
+import cv2
+import numpy as np
+
+_package_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'routes', 'padel_iq')
+
+def _load_package():
+    # Registrar routes/padel_iq como paquete sin ejecutar su __init__, que inicializa Firebase
+    spec = importlib.machinery.ModuleSpec('padel_iq', None, is_package=True)
+    package = importlib.util.module_from_spec(spec)
+    package.__path__ = [_package_dir]
+    sys.modules['padel_iq'] = package
+    return importlib.import_module('padel_iq.video_processing'), importlib.import_module('padel_iq.trackers')
+
+def memory_mb():
+    """(RSS actual, pico de RSS) del proceso en MB."""
+    current = peak = None
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    current = int(line.split()[1]) / 1024
+                elif line.startswith('VmHWM:'):
+                    peak = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if peak is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return current if current is not None else peak, peak
+
+class SyntheticScene:
+    """Video sintético de un partido: cuatro jugadores que se mueven y detecciones espurias breves.
+
+    Los jugadores a veces "saltan" (cambio de ID en el tracker) y cada minuto aparecen spurious_per_minute
+    detecciones de espectadores o reflejos que duran pocas muestras: el origen de los miles de tracks
+    de vida corta de un video de varias horas.
+    """
+
+    def __init__(self, seed=0, spurious_per_minute=20, switches_per_minute=2, samples_per_second=2.5):
+        self.rng = np.random.default_rng(seed)
+        self.background = np.full((480, 640, 3), (60, 140, 60), dtype=np.uint8)
+        cv2.rectangle(self.background, (40, 120), (600, 460), (255, 255, 255), 2)
+        cv2.line(self.background, (320, 120), (320, 460), (255, 255, 255), 2)
+        self.players = np.array([[160.0, 200.0], [160.0, 380.0], [480.0, 200.0], [480.0, 380.0]])
+        self.spurious_rate = spurious_per_minute / 60 / samples_per_second
+        self.switch_rate = switches_per_minute / 60 / samples_per_second
+        self.spurious = []  # [x, y, muestras restantes]
+
+    def step(self, t):
+        self.players += self.rng.normal(0, 4, self.players.shape)
+        self.players[:, 0] = np.clip(self.players[:, 0], 60, 580)
+        self.players[:, 1] = np.clip(self.players[:, 1], 160, 430)
+        if self.rng.random() < self.switch_rate:
+            # Salto brusco: el tracker pierde el track y crea uno nuevo
+            self.players[self.rng.integers(4)] += self.rng.choice([-120, 120], 2)
+        if self.rng.random() < self.spurious_rate:
+            self.spurious.append([self.rng.uniform(20, 620), self.rng.uniform(60, 200), int(self.rng.integers(2, 6))])
+        self.spurious = [[x, y, n - 1] for x, y, n in self.spurious if n > 1]
+
+        frame = self.background.copy()
+        boxes = []
+        for x, y in self.players:
+            boxes.append((x - 25, y - 70, x + 25, y + 70, 0.9))
+        for x, y, _ in self.spurious:
+            boxes.append((x - 15, y - 40, x + 15, y + 40, 0.6))
+        for x1, y1, x2, y2, _ in boxes:
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (40, 40, 200), -1)
+        # Movimiento del brazo para que haya golpes y cambien los ángulos
+        self.arm_phase = t * 3.0
+        return frame, boxes
+
+class SyntheticDetector:
+    """Detector con la interfaz de PersonDetector que devuelve las cajas de la escena."""
+    name = 'synthetic'
+    imgsz = 640
+
+    def __init__(self):
+        self.boxes = []
+
+    def detect(self, frame, min_confidence=0.5, imgsz=None):
+        return [box for box in self.boxes if box[4] >= min_confidence]
+
+class SyntheticPose:
+    """Estimador con la interfaz de MediaPipe Pose: 33 landmarks con el brazo oscilando."""
+
+    def __init__(self, scene):
+        self.scene = scene
+
+    def process(self, image):
+        phase = getattr(self.scene, 'arm_phase', 0.0)
+        landmarks = [types.SimpleNamespace(x=0.5, y=0.5) for _ in range(33)]
+        landmarks[11] = types.SimpleNamespace(x=0.4, y=0.3)  # hombro izquierdo
+        landmarks[13] = types.SimpleNamespace(x=0.35, y=0.45)  # codo izquierdo
+        landmarks[15] = types.SimpleNamespace(x=0.35 + 0.15 * np.cos(phase), y=0.45 + 0.15 * np.sin(phase))  # muñeca
+        return types.SimpleNamespace(pose_landmarks=types.SimpleNamespace(landmark=landmarks))
+
+def state_size(segmenter):
+    """Puntos de trayectoria y keypoints que el segmentador tiene en memoria."""
+    trajectories = segmenter.player_trajectories
+    if hasattr(trajectories, 'size_bytes'):
+        in_memory = sum(len(t.tail) for t in trajectories.values())
+        disk_mb = trajectories.size_bytes() / 1e6
+    else:
+        in_memory = sum(len(t) for t in trajectories.values())
+        disk_mb = 0.0
+    return {
+        'tracks': len(trajectories),
+        'trajectory_points_in_memory': in_memory,
+        'keypoints_in_memory': sum(len(k) for k in segmenter.player_keypoints.values()),
+        'tracks_with_keypoints': len(segmenter.player_keypoints),
+        'disk_mb': round(disk_mb, 1)
+    }
+
+def run(args):
+    """Simula el video en este proceso y escribe una línea JSON por intervalo de informe."""
+    video_processing, trackers = _load_package()
+    scene = SyntheticScene(args.seed, args.spurious_per_minute, args.switches_per_minute, args.fps / args.frame_skip)
+    detector = SyntheticDetector()
+    params = {
+        'velocidad_umbral': 0.00005,
+        'max_segment_duration': 1.5,
+        'frame_skip': args.frame_skip,
+        'scale_factor': 0.8,
+        'bounded_memory': args.mode == 'bounded'
+    }
+    segmenter = video_processing.GameSegmenter({'side': 'left'}, params, args.fps, detector=detector,
+                                               tracker=trackers.create_tracker(args.tracker),
+                                               pose_estimator=SyntheticPose(scene))
+    total_samples = int(args.hours * 3600 * args.fps / args.frame_skip)
+    report_every = int(args.report_minutes * 60 * args.fps / args.frame_skip)
+    started = time.perf_counter()
+    for sample in range(1, total_samples + 1):
+        t = sample * args.frame_skip / args.fps
+        frame, detector.boxes = scene.step(t)
+        segmenter.process_frame(frame, t, sample * args.frame_skip)
+        if sample % report_every == 0 or sample == total_samples:
+            rss, peak = memory_mb()
+            print(json.dumps(dict(mode=args.mode, video_minutes=round(t / 60), rss_mb=round(rss, 1), peak_mb=round(peak, 1),
+                                  samples_per_second=round(sample / (time.perf_counter() - started), 1),
+                                  **state_size(segmenter))), flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria del segmentador de juego en un video sintético largo, con y sin bounded_memory.")
+    parser.add_argument('--hours', type=float, default=3.0)
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--frame-skip', type=int, default=12)
+    parser.add_argument('--report-minutes', type=float, default=15.0)
+    parser.add_argument('--spurious-per-minute', type=float, default=20.0)
+    parser.add_argument('--switches-per-minute', type=float, default=2.0)
+    parser.add_argument('--tracker', default='motion', help="Backend de tracking (motion evita cargar el embedder de DeepSORT)")
+    parser.add_argument('--modes', default='unbounded,bounded')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run(args)
+        return
+
+    # Cada modo en su propio proceso: el pico de RSS es por proceso
+    forwarded = [arg for arg in sys.argv[1:] if not arg.startswith('--modes')]
+    results = {}
+    for mode in args.modes.split(','):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), *forwarded, '--mode', mode],
+                                stdout=subprocess.PIPE, text=True, check=True).stdout
+        results[mode] = [json.loads(line) for line in output.splitlines() if line.startswith('{')]
+
+    print(f"{'modo':>10} {'minuto':>7} {'RSS MB':>8} {'pico MB':>8} {'tracks':>7} {'puntos en RAM':>14} {'keypoints':>10} {'disco MB':>9} {'muestras/s':>11}")
+    for mode, rows in results.items():
+        for row in rows:
+            print(f"{mode:>10} {row['video_minutes']:>7} {row['rss_mb']:>8} {row['peak_mb']:>8} {row['tracks']:>7} "
+                  f"{row['trajectory_points_in_memory']:>14} {row['keypoints_in_memory']:>10} {row['disk_mb']:>9} "
+                  f"{row['samples_per_second']:>11}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import importlib.util
+import os
+import time
+import tracemalloc
+import cv2
+import numpy as np
+
+# Cargar el módulo directamente para no inicializar Firebase al importar routes.padel_iq
+_module_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'routes', 'padel_iq', 'frame_preprocessing.py')
+_spec = importlib.util.spec_from_file_location('padel_frame_preprocessing', _module_path)
+frame_preprocessing = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(frame_preprocessing)
+
+def legacy_preprocess(frame, boxes, scale):
+    """Reproduce el preprocesado anterior de segmentar_video_juego (una copia por paso)."""
+    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    frame = cv2.resize(frame, (640, 480))
+    outputs = []
+    for x1, y1, x2, y2 in boxes:
+        roi = frame_rgb[y1:y2, x1:x2]
+        roi_height, roi_width = roi.shape[:2]
+        resized = cv2.resize(roi, (max(1, int(roi_width * scale)), max(1, int(roi_height * scale))))
+        gray = cv2.cvtColor(resized, cv2.COLOR_RGB2GRAY)
+        enhanced = cv2.equalizeHist(gray)
+        outputs.append(cv2.cvtColor(enhanced, cv2.COLOR_GRAY2RGB))
+    return frame, outputs
+
+def engine_preprocess(preprocessor, frame, boxes, scale):
+    """Preprocesado con FramePreprocessor y buffers reutilizados."""
+    frame, _ = preprocessor.load(frame)
+    outputs = []
+    for box in boxes:
+        roi, _ = preprocessor.roi(*box)
+        outputs.append(preprocessor.enhance_roi(roi, scale))
+    return frame, outputs
+
+def measure(name, fn, frames, boxes, scale):
+    # Calentamiento para que los buffers del motor ya existan
+    fn(frames[0], boxes, scale)
+
+    start = time.perf_counter()
+    for frame in frames:
+        fn(frame, boxes, scale)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    transient = []
+    for frame in frames:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        fn(frame, boxes, scale)
+        _, peak = tracemalloc.get_traced_memory()
+        transient.append(peak - before)
+    tracemalloc.stop()
+
+    print(f"{name:>8}: {len(frames) / elapsed:8.1f} frames/s, "
+          f"memoria temporal por frame {np.mean(transient) / 1024:9.1f} KiB (máx {max(transient) / 1024:.1f} KiB)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara el preprocesado de frames anterior con FramePreprocessor.")
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--players', type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8) for _ in range(8)]
+    frames = [frames[i % len(frames)] for i in range(args.frames)]
+    boxes = [(60 + 140 * i, 100 + 40 * (i % 2), 140 + 140 * i, 300 + 40 * (i % 2)) for i in range(args.players)]
+    scale = 0.8 * 1.5
+
+    print(f"Frames {args.width}x{args.height}, {args.players} ROIs por frame")
+    print(f"  anterior: {2 + 4 * args.players} arrays nuevos por frame (RGB completo, resize y 4 por ROI)")
+    measure('anterior', legacy_preprocess, frames, boxes, scale)
+
+    preprocessor = frame_preprocessing.FramePreprocessor()
+    measure('motor', lambda frame, b, s: engine_preprocess(preprocessor, frame, b, s), frames, boxes, scale)
+    print(f"  motor: {preprocessor.stats['buffer_allocations']} buffers en total para {preprocessor.stats['frames']} frames")
+
+if __name__ == "__main__":
+    main()
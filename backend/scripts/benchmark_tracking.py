@@ -0,0 +1,135 @@
+import argparse
+import importlib.util
+import os
+import time
+import cv2
+import numpy as np
+
+_package_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'routes', 'padel_iq')
+
+def _load(name):
+    # Cargar el módulo directamente para no inicializar Firebase al importar routes.padel_iq
+    spec = importlib.util.spec_from_file_location(f"padel_{name}", os.path.join(_package_dir, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+person_detector = _load('person_detector')
+detection_scheduler = _load('detection_scheduler')
+trackers = _load('trackers')
+
+def load_frames(path, frame_skip, max_frames):
+    """Frames muestreados como en segmentar_video_juego: 640x480, uno de cada frame_skip."""
+    cap = cv2.VideoCapture(path)
+    frames = []
+    index = 0
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if index % frame_skip == 0:
+            frames.append(cv2.resize(frame, (640, 480)))
+        index += 1
+    cap.release()
+    return frames
+
+def run_setting(frames, detector, scheduler, tracker):
+    """Tracks confirmados por frame [(track_id, (x1, y1, x2, y2)), ...], segundos y llamadas al detector."""
+    calls = 0
+    last_tracks = None
+    per_frame = []
+
+    def detect(frame):
+        nonlocal calls
+        calls += 1
+        return detector.detect(frame, 0.5)
+
+    start = time.perf_counter()
+    for frame in frames:
+        boxes, _ = scheduler.step(frame, detect, last_tracks)
+        detections = [([x1, y1, x2 - x1, y2 - y1], conf, 0) for x1, y1, x2, y2, conf in boxes]
+        last_tracks = tracker.update_tracks(detections, frame=frame)
+        confirmed = []
+        for track in last_tracks:
+            if track.is_confirmed():
+                x, y, w, h = track.to_tlwh()
+                confirmed.append((track.track_id, (x, y, x + w, y + h)))
+        per_frame.append(confirmed)
+    return per_frame, time.perf_counter() - start, calls
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def compare(reference, candidate, threshold=0.5):
+    """Recall y IoU medio de las cajas frente a la referencia, y cambios de ID de cada track de referencia."""
+    matched, total, ious, id_switches = 0, 0, [], 0
+    assigned = {}
+    for ref_tracks, cand_tracks in zip(reference, candidate):
+        total += len(ref_tracks)
+        used = set()
+        for ref_id, ref_box in ref_tracks:
+            best, best_iou = None, threshold
+            for j, (cand_id, cand_box) in enumerate(cand_tracks):
+                value = iou(ref_box, cand_box)
+                if j not in used and value >= best_iou:
+                    best, best_iou = j, value
+            if best is None:
+                continue
+            used.add(best)
+            matched += 1
+            ious.append(best_iou)
+            cand_id = cand_tracks[best][0]
+            if ref_id in assigned and assigned[ref_id] != cand_id:
+                id_switches += 1
+            assigned[ref_id] = cand_id
+    return {
+        'recall': matched / total if total else 1.0,
+        'mean_iou': float(np.mean(ious)) if ious else 0.0,
+        'id_switches': id_switches,
+        # Con cuatro jugadores, cada ID de más es un track fragmentado o un espectador
+        'unique_ids': len({track_id for frame_tracks in candidate for track_id, _ in frame_tracks})
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara calidad de seguimiento y velocidad por tracker y por N de detección.")
+    parser.add_argument('videos', nargs='+', help="Clips de referencia")
+    parser.add_argument('--settings', default='1,2,3,4,6,adaptive-flow,adaptive-kalman',
+                        help="N fijos (propagación por flujo) y/o adaptive-flow, adaptive-kalman, N-kalman")
+    parser.add_argument('--trackers', default='deepsort,motion', help="Backends de tracking a comparar")
+    parser.add_argument('--frame-skip', type=int, default=12)
+    parser.add_argument('--max-frames', type=int, default=600)
+    parser.add_argument('--max-interval', type=int, default=6)
+    args = parser.parse_args()
+
+    detector = person_detector.create_person_detector()
+    for path in args.videos:
+        frames = load_frames(path, args.frame_skip, args.max_frames)
+        print(f"{path}: {len(frames)} muestras")
+        # Referencia: DeepSORT con YOLO en cada muestra, como el análisis actual
+        reference, ref_seconds, _ = run_setting(frames, detector, detection_scheduler.DetectionScheduler(interval=1, adaptive=False),
+                                                trackers.create_tracker('deepsort'))
+        print(f"  {'deepsort/1 (referencia)':>24}: {len(frames) / ref_seconds:7.1f} muestras/s | "
+              f"{compare(reference, reference)['unique_ids']} IDs")
+
+        for backend in args.trackers.split(','):
+            for setting in args.settings.split(','):
+                if backend == 'deepsort' and setting == '1':
+                    continue
+                interval, _, mode = setting.partition('-')
+                adaptive = interval == 'adaptive'
+                scheduler = detection_scheduler.DetectionScheduler(
+                    interval=1 if adaptive else int(interval), mode=mode or 'flow', adaptive=adaptive,
+                    max_interval=args.max_interval)
+                tracks, seconds, calls = run_setting(frames, detector, scheduler, trackers.create_tracker(backend))
+                quality = compare(reference, tracks)
+                print(f"  {backend + '/' + setting:>24}: {len(frames) / seconds:7.1f} muestras/s (x{ref_seconds / seconds:.2f}) | "
+                      f"detector en {calls}/{len(frames)} muestras ({scheduler.stats['forced']} forzadas) | "
+                      f"recall {quality['recall']:.3f}, IoU medio {quality['mean_iou']:.3f}, "
+                      f"cambios de ID {quality['id_switches']}, {quality['unique_ids']} IDs")
+
+if __name__ == "__main__":
+    main()
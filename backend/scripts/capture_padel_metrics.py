@@ -1,10 +1,13 @@
+import argparse
+import importlib.util
 import logging
+import threading
+import time
+from collections import deque
 import cv2
 import numpy as np
 import json
 from datetime import datetime
-from ultralytics import YOLO
-from deep_sort_realtime.deepsort_tracker import DeepSort
 import mediapipe as mp
 import os
 
@@ -12,24 +15,31 @@ import os
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Inicializar YOLOv8 para detección de jugadores
+def _load(name):
+    # Cargar el módulo directamente para no inicializar Firebase al importar routes.padel_iq
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'routes', 'padel_iq', f"{name}.py")
+    spec = importlib.util.spec_from_file_location(f"padel_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+person_detector_module = _load('person_detector')
+trackers_module = _load('trackers')
+stroke_classifier_module = _load('stroke_classifier')
+segment_stream_module = _load('segment_stream')
+
+# Inicializar YOLOv8 para detección de jugadores (backend según PADEL_DETECTOR_BACKEND)
 try:
-    yolo_model = YOLO("yolov8n.pt")
+    person_detector = person_detector_module.create_person_detector()
 except Exception as e:
     logger.error(f"Error al inicializar YOLO: {str(e)}")
     exit(1)
 
-# Inicializar DeepSORT para seguimiento
+# Inicializar el tracker (DeepSORT o solo movimiento, según PADEL_TRACKER_BACKEND)
 try:
-    deepsort = DeepSort(
-        max_age=50,
-        n_init=2,
-        nms_max_overlap=1.0,
-        max_iou_distance=0.9,
-        nn_budget=100
-    )
+    player_tracker = trackers_module.create_tracker()
 except Exception as e:
-    logger.error(f"Error al inicializar DeepSORT: {str(e)}")
+    logger.error(f"Error al inicializar el tracker: {str(e)}")
     exit(1)
 
 # Inicializar MediaPipe Pose con umbrales bajos
@@ -48,13 +58,8 @@ def mouse_callback(event, x, y, flags, param):
     """Función para manejar clics del mouse y seleccionar un jugador."""
     global selected_track_id
     if event == cv2.EVENT_LBUTTONDOWN:  # Clic izquierdo
-        tracks = param  # Los tracks son pasados como parámetro
-        for track in tracks:
-            if not track.is_confirmed():
-                continue
-            track_id = track.track_id
-            x1, y1, w, h = track.to_tlwh()
-            x2, y2 = x1 + w, y1 + h
+        tracks = param()  # Último resultado de inferencia: [(track_id, (x1, y1, x2, y2)), ...]
+        for track_id, (x1, y1, x2, y2) in tracks:
             if x1 <= x <= x2 and y1 <= y <= y2:
                 selected_track_id = track_id
                 logger.info(f"Jugador seleccionado: track_id {selected_track_id}")
@@ -158,7 +163,7 @@ def draw_metrics(frame, track_id, elbow_angle, wrist_speed, wrist_direction_chan
     except Exception as e:
         logger.warning(f"Error al dibujar métricas: {str(e)}")
 
-def save_results(segmentos, current_time):
+def save_results(segmentos, current_time, engine_stats=None, output_file=None):
     """Guarda los resultados en un archivo JSON."""
     output_dir = "scripts/livemonitor"
     os.makedirs(output_dir, exist_ok=True)
@@ -183,9 +188,12 @@ def save_results(segmentos, current_time):
         'video_duration': video_duration,
         'ritmo': ritmo
     }
+    if engine_stats is not None:
+        results['engine_stats'] = engine_stats
 
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    output_file = os.path.join(output_dir, f"padel_metrics_lety_entrenamiento_{timestamp}.json")
+    if output_file is None:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_file = os.path.join(output_dir, f"padel_metrics_lety_entrenamiento_{timestamp}.json")
     try:
         with open(output_file, 'w') as f:
             json.dump(results, f, indent=4)
@@ -193,285 +201,518 @@ def save_results(segmentos, current_time):
         logger.info(f"Total golpes detectados: {total_golpes}, Ritmo: {ritmo}")
     except Exception as e:
         logger.error(f"Error al guardar resultados: {str(e)}")
-
-def capture_padel_metrics():
-    """Captura métricas de juego desde la webcam en tiempo real y las muestra en pantalla."""
-    global selected_track_id
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        logger.error("No se pudo abrir la webcam. Verifica permisos o conexión.")
-        return
-
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    if fps <= 0:
-        logger.warning("FPS no detectado, usando valor predeterminado: 30")
-        fps = 30
-
-    custom_params = {
-        'velocidad_umbral': 0.00001,  # Reducido para mayor sensibilidad
-        'max_segment_duration': 1.5,
-        'frame_skip': 1,
-        'scale_factor': 0.8
-    }
-
-    velocidad_umbral = custom_params['velocidad_umbral']
-    max_segment_duration = custom_params['max_segment_duration']
-    frame_skip = custom_params['frame_skip']
-    scale_factor = custom_params['scale_factor']
-
-    segmentos = []
-    inicio = None
-    ultimo_segmento_fin = float('-inf')
-    movimiento_detectado = False
-    max_velocidad_segmento = 0
-    movimiento_direccion_segmento = "N/A"
-    posicion_cancha_segmento = "N/A"
-    max_elbow_angle_segmento = 0
-    session_active = False
-
-    frame_counter = 0
-    player_keypoints = {}
-    start_time = datetime.now().timestamp()
-    current_time = 0
-    track_id = "N/A"
-    elbow_angle = 0
-    wrist_speed = 0
-    wrist_direction_change = 0
-    elbow_angle_speed = 0
-
-    # Configurar el callback del mouse para la ventana de video
-    cv2.namedWindow('Padel Metrics Capture')
-
-    try:
-        while True:
-            ret, frame = cap.read()
+    return output_file
+
+class LatestFrameGrabber(threading.Thread):
+    """Hilo de captura: lee la cámara sin pausa y conserva solo el último frame.
+
+    Así el buffer de la cámara nunca se llena cuando la inferencia va lenta; los frames que nadie
+    llegó a procesar se cuentan como descartados.
+    """
+
+    def __init__(self, source, realtime=False):
+        super().__init__(daemon=True)
+        self.cap = cv2.VideoCapture(source)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap.isOpened() else 0
+        self.fps = fps if fps > 0 else 30
+        self.realtime = realtime  # Reproducir archivos a velocidad real, como si fueran una cámara
+        self.condition = threading.Condition()
+        self.frame = None
+        self.seq = 0
+        self.captured_at = 0.0
+        self.running = True
+        self.finished = False
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    def run(self):
+        started = time.monotonic()
+        while self.running:
+            ret, frame = self.cap.read()
             if not ret:
                 logger.warning("No se pudo leer el fotograma. Verifica la webcam.")
                 break
+            if self.realtime:
+                delay = started + self.seq / self.fps - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            with self.condition:
+                self.frame = frame
+                self.seq += 1
+                self.captured_at = time.monotonic()
+                self.condition.notify_all()
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+        self.cap.release()
+
+    def latest(self):
+        with self.condition:
+            return self.seq, self.frame, self.captured_at
+
+    def wait_newer(self, seq, timeout=0.5):
+        """Espera un frame posterior a seq; devuelve (seq, frame, captured_at) o None al terminar."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq > seq or self.finished or not self.running, timeout)
+            if self.seq > seq:
+                return self.seq, self.frame, self.captured_at
+            return None
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+
+class SessionState:
+    """Estado de la sesión compartido entre el hilo de render y el de inferencia."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = False
+        self.start_time = time.monotonic()
+        self.generation = 0  # Cambia al iniciar una sesión nueva para que el analizador se reinicie
+
+    def start(self):
+        with self.lock:
+            self.active = True
+            self.start_time = time.monotonic()
+            self.generation += 1
+
+    def pause(self):
+        with self.lock:
+            self.active = False
+
+    def snapshot(self):
+        with self.lock:
+            return self.active, self.start_time, self.generation
+
+class LiveAnalyzer:
+    """Detección, seguimiento, pose y segmentación de golpes de un frame (antes el bucle síncrono)."""
+
+    def __init__(self, custom_params):
+        self.velocidad_umbral = custom_params['velocidad_umbral']
+        # Umbrales reducidos: la velocidad de la muñeca se mide por segundo real
+        self.stroke_classifier = stroke_classifier_module.get_stroke_classifier('captura')
+        self.max_segment_duration = custom_params['max_segment_duration']
+        self.scale_factor = custom_params['scale_factor']
+        self.flush_seconds = custom_params.get('flush_seconds', 1.0)
+        # En vivo no hay tiempo mínimo entre golpes: un segmento empieza en cuanto se cierra el anterior
+        self.segment_stream = segment_stream_module.SegmentStream(max_segment_duration=self.max_segment_duration, min_gap=None)
+        # Protege los golpes y el segmento abierto: el hilo de render los copia mientras el de inferencia los modifica
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self._reset()
+
+    def _reset(self):
+        self.segmentos = []
+        self.pending = []  # Golpes cerrados a la espera de clasificarse juntos en flush()
+        self.last_flush = 0.0
+        self.last_closed = None
+        self.last_classified = None
+        self.player_keypoints = {}
+        self.segment_stream.reset()
+        self.metrics = {
+            'track_id': "N/A",
+            'elbow_angle': 0,
+            'wrist_speed': 0,
+            'wrist_direction_change': 0
+        }
+
+    def process(self, frame, current_time, session_active, selected_id):
+        """Analiza un frame y devuelve una instantánea para el render (tracks y métricas)."""
+        # Las cajas de YOLO están en 640x480, así que el ROI se recorta del frame ya escalado
+        frame = cv2.resize(frame, (640, 480))
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        height, width = frame.shape[:2]
 
-            frame_counter += 1
-            if frame_counter % frame_skip != 0:
-                continue
-
-            current_time = (datetime.now().timestamp() - start_time)
-
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame = cv2.resize(frame, (640, 480))
-            height, width = frame.shape[:2]
-
-            # Detección de jugadores con YOLO
-            results = yolo_model(frame)
-            detections = []
-            for r in results:
-                boxes = r.boxes
-                for box in boxes:
-                    if int(box.cls) == 0:
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        conf = box.conf.cpu().numpy()
-                        if conf > 0.1:
-                            center_x = (x1 + x2) / 2
-                            if center_x < width / 2:
-                                conf *= 1.2
-                            detections.append(([x1, y1, x2 - x1, y2 - y1], conf, 0))
-
-            tracks = deepsort.update_tracks(detections, frame=frame)
-
-            # Configurar el callback del mouse con los tracks actuales
-            cv2.setMouseCallback('Padel Metrics Capture', mouse_callback, tracks)
+        # Detección de jugadores con YOLO
+        detections = []
+        for x1, y1, x2, y2, conf in person_detector.detect(frame, 0.1):
+            center_x = (x1 + x2) / 2
+            if center_x < width / 2:
+                conf *= 1.2
+            detections.append(([x1, y1, x2 - x1, y2 - y1], conf, 0))
 
-            net_line_y = height // 2
-            court_left_x = width // 4
-            court_right_x = 3 * width // 4
+        tracks = player_tracker.update_tracks(detections, frame=frame)
+        track_boxes = []
+        for track in tracks:
+            if track.is_confirmed():
+                x1, y1, w, h = track.to_tlwh()
+                track_boxes.append((track.track_id, (x1, y1, x1 + w, y1 + h)))
 
-            draw_camera_guidelines(frame, net_line_y, court_left_x, court_right_x)
+        net_line_y = height // 2
 
-            # Filtrar tracks para procesar solo el jugador seleccionado (si hay uno)
-            filtered_tracks = tracks if selected_track_id is None else [track for track in tracks if track.track_id == selected_track_id]
+        # Filtrar tracks para procesar solo el jugador seleccionado (si hay uno)
+        filtered_tracks = tracks if selected_id is None else [track for track in tracks if track.track_id == selected_id]
 
+        with self.lock:
             if session_active:
                 for track in filtered_tracks:
                     if not track.is_confirmed():
                         continue
-                    track_id = track.track_id
-                    x1, y1, w, h = track.to_tlwh()
-                    x2, y2 = x1 + w, y1 + h
-                    center_x = (x1 + x2) / 2
-                    center_y = (y1 + y2) / 2
+                    self._process_track(track, frame_rgb, current_time, width, net_line_y)
+
+            if current_time - self.last_flush >= self.flush_seconds:
+                self._flush()
+                self.last_flush = current_time
+
+            # El tipo del golpe abierto aún no está clasificado: se muestra el del último golpe clasificado
+            segmento = self.segment_stream.current() or self.last_closed or {}
+            return {
+                'tracks': track_boxes,
+                'detections': bool(detections),
+                'metrics': dict(self.metrics),
+                'movimiento_direccion': (self.last_classified or {}).get('movimiento_direccion', "N/A"),
+                'posicion_cancha': segmento.get('posicion_cancha', "N/A"),
+                'total_golpes': len(self.segmentos)
+            }
+
+    def flush(self):
+        """Clasifica en una sola llamada los golpes cerrados desde el último flush."""
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        pending, self.pending = self.pending, []
+        if pending:
+            self.stroke_classifier.classify_segments(pending)
+            self.last_classified = pending[-1]
+
+    def snapshot_segments(self):
+        """Copia de los golpes para guardar; los que aún no se clasificaron se clasifican en la copia."""
+        with self.lock:
+            segmentos = [dict(segmento) for segmento in self.segmentos]
+            return self.stroke_classifier.classify_segments(segmentos)
+
+    def _process_track(self, track, frame_rgb, current_time, width, net_line_y):
+        scale_factor = self.scale_factor
+        track_id = track.track_id
+        x1, y1, w, h = track.to_tlwh()
+        x2, y2 = x1 + w, y1 + h
+        center_x = (x1 + x2) / 2
+        center_y = (y1 + y2) / 2
+        self.metrics['track_id'] = track_id
+
+        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+        x1 = max(0, x1)
+        y1 = max(0, y1)
+        x2 = min(frame_rgb.shape[1], x2)
+        y2 = min(frame_rgb.shape[0], y2)
+        player_roi = frame_rgb[y1:y2, x1:x2]
+
+        if player_roi.size == 0:
+            logger.warning(f"ROI vacío para track_id {track_id} en t={current_time}")
+            return
+
+        roi_height, roi_width = player_roi.shape[:2]
+        new_width = max(1, int(roi_width * scale_factor))
+        new_height = max(1, int(roi_height * scale_factor))
+        player_roi_resized = cv2.resize(player_roi, (new_width, new_height))
+        player_roi_enhanced = enhance_image(player_roi_resized)
+        pose_results = pose.process(player_roi_enhanced)
+
+        wrist_speed = 0
+        elbow_angle = 90
+        wrist = [center_x, center_y]
+        wrist_direction_change = 0
+        elbow_angle_speed = 0
+
+        if pose_results and pose_results.pose_landmarks:
+            landmarks = pose_results.pose_landmarks.landmark
+            try:
+                shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x * roi_width * scale_factor + x1,
+                           landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y * roi_height * scale_factor + y1]
+                elbow = [landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].x * roi_width * scale_factor + x1,
+                         landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].y * roi_height * scale_factor + y1]
+                wrist = [landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].x * roi_width * scale_factor + x1,
+                         landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].y * roi_height * scale_factor + y1]
+
+                elbow_angle = calculate_angle(shoulder, elbow, wrist)
+            except IndexError as e:
+                logger.warning(f"Error al acceder a landmarks para track_id {track_id}: {str(e)}")
+                return
+        else:
+            logger.warning(f"No se detectaron landmarks para track_id {track_id} en t={current_time}")
+
+        keypoints = self.player_keypoints.setdefault(track_id, deque(maxlen=3))  # Solo se miran los tres últimos
+        keypoints.append({
+            'time': current_time,
+            'wrist': wrist,
+            'elbow_angle': elbow_angle
+        })
+
+        dx = 0
+        if len(keypoints) > 1:
+            prev_keypoint = keypoints[-2]
+            curr_keypoint = keypoints[-1]
+            time_diff = curr_keypoint['time'] - prev_keypoint['time']
+            # Con frames descartados el intervalo entre muestras varía: usar el tiempo real de captura
+            wrist_distance = np.sqrt((curr_keypoint['wrist'][0] - prev_keypoint['wrist'][0])**2 +
+                                     (curr_keypoint['wrist'][1] - prev_keypoint['wrist'][1])**2)
+            wrist_speed = wrist_distance / time_diff if time_diff > 0 else 0
+            wrist_speed = min(wrist_speed, 50)
+
+            elbow_angle_change = abs(curr_keypoint['elbow_angle'] - prev_keypoint['elbow_angle'])
+            elbow_angle_speed = elbow_angle_change / time_diff if time_diff > 0 else 0
+
+            if len(keypoints) > 2:
+                prev_prev_keypoint = keypoints[-3]
+                dx1 = prev_keypoint['wrist'][0] - prev_prev_keypoint['wrist'][0]
+                dx2 = curr_keypoint['wrist'][0] - prev_keypoint['wrist'][0]
+                if dx1 * dx2 < 0 and time_diff > 0:
+                    wrist_direction_change = min(abs(dx2 - dx1) / time_diff, 50)
+
+            dx = curr_keypoint['wrist'][0] - prev_keypoint['wrist'][0]
+
+        net_threshold = net_line_y + (center_x / width) * 50
+        posicion_cancha = "red" if center_y < net_threshold else "fondo"
+
+        self.metrics.update({
+            'elbow_angle': elbow_angle,
+            'wrist_speed': wrist_speed,
+            'wrist_direction_change': wrist_direction_change
+        })
+
+        active = (wrist_speed > self.velocidad_umbral and wrist_speed > 0.005) or (elbow_angle_speed > 5) or (wrist_direction_change > 0.5)  # Reducidos umbrales
+        if active:
+            logger.info(f"Golpe detectado: wrist_speed={wrist_speed}, elbow_angle_speed={elbow_angle_speed}, wrist_direction_change={wrist_direction_change}")
+        event, segmento = self.segment_stream.push(segment_stream_module.StrokeSample(
+            current_time, active, wrist_speed,
+            fields={
+                'max_velocidad': wrist_speed,
+                'movimiento_direccion': None,
+                'max_elbow_angle': elbow_angle,
+                'posicion_cancha': posicion_cancha,
+                # Pico del golpe; flush() lo clasifica cuando el golpe se cierra
+                'stroke_features': (elbow_angle, wrist_speed, dx, False)
+            }
+        ))
+        if event == segment_stream_module.START:
+            logger.info(f"Registrando golpe en t={current_time}")
+            # El jugador es el que inicia el golpe: los picos posteriores no lo cambian
+            segmento['player_position'] = track_id
+            self.segmentos.append(segmento)
+        elif event == segment_stream_module.CLOSE:
+            self.last_closed = segmento
+            self.pending.append(segmento)
+
+class InferenceWorker(threading.Thread):
+    """Hilo de inferencia: procesa siempre el frame más reciente y publica el último resultado."""
+
+    def __init__(self, grabber, session, analyzer):
+        super().__init__(daemon=True)
+        self.grabber = grabber
+        self.session = session
+        self.analyzer = analyzer
+        self.lock = threading.Lock()
+        self.result = None
+        self.running = True
+        self.latencies = deque(maxlen=1000)
+        self.stats = {'inferred_frames': 0, 'dropped_frames': 0, 'inference_seconds': 0.0}
+        self.current_time = 0.0
+
+    def run(self):
+        last_seq = 0
+        generation = 0
+        while self.running:
+            item = self.grabber.wait_newer(last_seq)
+            if item is None:
+                if self.grabber.finished:
+                    break
+                continue
+            seq, frame, captured_at = item
+            self.stats['dropped_frames'] += seq - last_seq - 1
+            last_seq = seq
+
+            session_active, start_time, session_generation = self.session.snapshot()
+            if session_generation != generation:
+                generation = session_generation
+                self.analyzer.reset()
+            # El tiempo del golpe es el de captura, no el de fin de la inferencia
+            current_time = captured_at - start_time
+
+            started = time.monotonic()
+            try:
+                result = self.analyzer.process(frame, current_time, session_active, selected_track_id)
+            except Exception as e:
+                logger.error(f"Error en la inferencia: {str(e)}")
+                continue
+            finished = time.monotonic()
+
+            result['seq'] = seq
+            result['captured_at'] = captured_at
+            self.latencies.append(finished - captured_at)
+            self.stats['inferred_frames'] += 1
+            self.stats['inference_seconds'] += finished - started
+            with self.lock:
+                self.result = result
+                if session_active:
+                    self.current_time = current_time
+
+    def latest(self):
+        with self.lock:
+            return self.result
+
+    def tracks(self):
+        result = self.latest()
+        return result['tracks'] if result else []
+
+    def report(self, render_latencies=None):
+        """Latencia extremo a extremo (captura -> resultado y captura -> pantalla) y frames descartados."""
+        captured = self.grabber.seq
+        inferred = self.stats['inferred_frames']
+        report = {
+            'captured_frames': captured,
+            'inferred_frames': inferred,
+            'dropped_frames': self.stats['dropped_frames'],
+            'dropped_ratio': self.stats['dropped_frames'] / captured if captured else 0.0,
+            'inference_fps': inferred / self.stats['inference_seconds'] if self.stats['inference_seconds'] > 0 else 0.0
+        }
+        for name, values in (('inference_latency', self.latencies), ('render_latency', render_latencies)):
+            if values:
+                values = np.array(values) * 1000
+                report[f'{name}_ms'] = {
+                    'mean': float(values.mean()),
+                    'p50': float(np.percentile(values, 50)),
+                    'p95': float(np.percentile(values, 95)),
+                    'max': float(values.max())
+                }
+        return report
+
+    def stop(self):
+        self.running = False
+
+def run_window(grabber, worker, session):
+    """Bucle de render: muestra siempre el último frame capturado con el último resultado disponible."""
+    global selected_track_id
+    window = 'Padel Metrics Capture'
+    cv2.namedWindow(window)
+    # El callback consulta los tracks del último resultado en el momento del clic
+    cv2.setMouseCallback(window, mouse_callback, worker.tracks)
+    render_latencies = deque(maxlen=1000)
+    last_seq = 0
+
+    while not grabber.finished:
+        seq, frame, captured_at = grabber.latest()
+        if frame is None or seq == last_seq:
+            if cv2.waitKey(5) & 0xFF == ord('q'):
+                break
+            continue
+        last_seq = seq
+
+        frame = cv2.resize(frame, (640, 480))
+        height, width = frame.shape[:2]
+        draw_camera_guidelines(frame, height // 2, width // 4, 3 * width // 4)
 
+        session_active, _, _ = session.snapshot()
+        result = worker.latest()
+        if result:
+            if session_active:
+                for track_id, (x1, y1, x2, y2) in result['tracks']:
                     # Dibujar cuadro delimitador (azul si está seleccionado, verde si no)
                     color = (255, 0, 0) if track_id == selected_track_id else (0, 255, 0)
                     cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
                     cv2.putText(frame, f"ID: {track_id}", (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+            metrics = result['metrics']
+            video_duration = worker.current_time
+            ritmo = min((result['total_golpes'] / video_duration) * 120 if video_duration > 0 else 0, 100)
+            draw_metrics(frame, metrics['track_id'], metrics['elbow_angle'], metrics['wrist_speed'], metrics['wrist_direction_change'],
+                         result['movimiento_direccion'], result['posicion_cancha'], result['total_golpes'], ritmo,
+                         result['detections'], session_active, selected_track_id)
+
+        cv2.imshow(window, frame)
+        render_latencies.append(time.monotonic() - captured_at)
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('q'):
+            logger.info("Usuario presionó 'q'. Cerrando ventana.")
+            break
+        elif key == ord('s'):
+            if not session_active:
+                logger.info("Iniciando sesión de captura.")
+                session.start()
+        elif key == ord('p'):
+            if session_active:
+                logger.info("Pausando sesión de captura.")
+                session.pause()
+                save_results(worker.analyzer.snapshot_segments(), worker.current_time, worker.report(render_latencies))
+        elif key == ord('r'):
+            logger.info("Reiniciando selección de jugador.")
+            selected_track_id = None
+
+    cv2.destroyAllWindows()
+    return render_latencies
+
+def run_headless(grabber, worker, duration=None, save_interval=10.0):
+    """Modo sin ventana: la sesión arranca al inicio y las métricas se escriben periódicamente."""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_file = os.path.join("scripts/livemonitor", f"padel_metrics_lety_entrenamiento_{timestamp}.json")
+    started = time.monotonic()
+    next_save = started + save_interval
+    while not grabber.finished:
+        time.sleep(0.1)
+        now = time.monotonic()
+        if duration is not None and now - started >= duration:
+            break
+        if now >= next_save:
+            save_results(worker.analyzer.snapshot_segments(), worker.current_time, worker.report(), output_file)
+            next_save = now + save_interval
+    return output_file
+
+def capture_padel_metrics(source=0, headless=False, duration=None, realtime=False, save_interval=10.0):
+    """Captura métricas de juego desde la webcam en tiempo real y las muestra en pantalla."""
+    grabber = LatestFrameGrabber(source, realtime=realtime)
+    if not grabber.is_opened():
+        logger.error("No se pudo abrir la webcam. Verifica permisos o conexión.")
+        return
 
-                    x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-                    x1 = max(0, x1)
-                    y1 = max(0, y1)
-                    x2 = min(frame.shape[1], x2)
-                    y2 = min(frame.shape[0], y2)
-                    player_roi = frame_rgb[y1:y2, x1:x2]
-
-                    if player_roi.size == 0:
-                        logger.warning(f"ROI vacío para track_id {track_id} en t={current_time}")
-                        continue
-
-                    roi_height, roi_width = player_roi.shape[:2]
-                    if roi_height <= 0 or roi_width <= 0:
-                        logger.warning(f"Dimensiones inválidas del ROI para track_id {track_id}: {roi_height}x{roi_width}")
-                        continue
+    custom_params = {
+        'velocidad_umbral': 0.00001,  # Reducido para mayor sensibilidad
+        'max_segment_duration': 1.5,
+        'scale_factor': 0.8
+    }
 
-                    new_width = int(roi_width * scale_factor)
-                    new_height = int(roi_height * scale_factor)
-                    new_width = max(1, new_width)
-                    new_height = max(1, new_height)
-                    player_roi_resized = cv2.resize(player_roi, (new_width, new_height))
-                    player_roi_enhanced = enhance_image(player_roi_resized)
-                    pose_results = pose.process(player_roi_enhanced)
-
-                    wrist_speed = 0
-                    elbow_angle = 90
-                    wrist = [center_x, center_y]
-                    wrist_direction_change = 0
-                    elbow_angle_speed = 0
-
-                    if pose_results and pose_results.pose_landmarks:
-                        landmarks = pose_results.pose_landmarks.landmark
-                        try:
-                            shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x * roi_width * scale_factor + x1,
-                                       landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y * roi_height * scale_factor + y1]
-                            elbow = [landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].x * roi_width * scale_factor + x1,
-                                     landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].y * roi_height * scale_factor + y1]
-                            wrist = [landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].x * roi_width * scale_factor + x1,
-                                     landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].y * roi_height * scale_factor + y1]
-
-                            elbow_angle = calculate_angle(shoulder, elbow, wrist)
-                        except IndexError as e:
-                            logger.warning(f"Error al acceder a landmarks para track_id {track_id}: {str(e)}")
-                            continue
-                    else:
-                        logger.warning(f"No se detectaron landmarks para track_id {track_id} en t={current_time}")
-
-                    if track_id not in player_keypoints:
-                        player_keypoints[track_id] = []
-                    player_keypoints[track_id].append({
-                        'time': current_time,
-                        'wrist': wrist,
-                        'elbow_angle': elbow_angle
-                    })
-
-                    if len(player_keypoints[track_id]) > 1:
-                        prev_keypoint = player_keypoints[track_id][-2]
-                        curr_keypoint = player_keypoints[track_id][-1]
-                        wrist_distance = np.sqrt((curr_keypoint['wrist'][0] - prev_keypoint['wrist'][0])**2 + 
-                                                 (curr_keypoint['wrist'][1] - prev_keypoint['wrist'][1])**2)
-                        wrist_speed = wrist_distance * fps * frame_skip
-                        wrist_speed = min(wrist_speed, 50)
-
-                        elbow_angle_change = abs(curr_keypoint['elbow_angle'] - prev_keypoint['elbow_angle'])
-                        time_diff = curr_keypoint['time'] - prev_keypoint['time']
-                        elbow_angle_speed = elbow_angle_change / time_diff if time_diff > 0 else 0
-
-                        wrist_direction_change = 0
-                        if len(player_keypoints[track_id]) > 2:
-                            prev_prev_keypoint = player_keypoints[track_id][-3]
-                            dx1 = prev_keypoint['wrist'][0] - prev_prev_keypoint['wrist'][0]
-                            dx2 = curr_keypoint['wrist'][0] - prev_keypoint['wrist'][0]
-                            if dx1 * dx2 < 0:
-                                wrist_direction_change = abs(dx2 - dx1) * fps * frame_skip
-                                wrist_direction_change = min(wrist_direction_change, 50)
-
-                    dx = curr_keypoint['wrist'][0] - prev_keypoint['wrist'][0] if len(player_keypoints[track_id]) > 1 else 0
-                    is_derecha = dx > 0
-
-                    if elbow_angle > 120 and wrist_speed > 1.5:  # Reducido umbral de wrist_speed
-                        movimiento_direccion = "smash"
-                    elif 100 < elbow_angle <= 120 and wrist_speed > 1:  # Reducido umbral de wrist_speed
-                        movimiento_direccion = "bandeja"
-                    elif 90 < elbow_angle <= 120 and wrist_speed <= 1:
-                        movimiento_direccion = "globo"
-                    elif elbow_angle <= 60 and wrist_speed < 0.5:  # Reducido umbral de wrist_speed
-                        movimiento_direccion = "defensivo"
-                    elif 60 < elbow_angle <= 90 and wrist_speed > 0.3:  # Reducido umbral de wrist_speed
-                        movimiento_direccion = "volea_" + ("derecha" if is_derecha else "reves")
-                    else:
-                        movimiento_direccion = "derecha" if is_derecha else "reves"
-
-                    net_threshold = net_line_y + (center_x / width) * 50
-                    posicion_cancha = "red" if center_y < net_threshold else "fondo"
-
-                    if (wrist_speed > velocidad_umbral and wrist_speed > 0.005) or (elbow_angle_speed > 5) or (wrist_direction_change > 0.5):  # Reducidos umbrales
-                        logger.info(f"Golpe detectado: wrist_speed={wrist_speed}, elbow_angle_speed={elbow_angle_speed}, wrist_direction_change={wrist_direction_change}")
-                        if not movimiento_detectado:
-                            logger.info(f"Registrando golpe: {movimiento_direccion} en t={current_time}")
-                            inicio = current_time
-                            movimiento_detectado = True
-                            max_velocidad_segmento = wrist_speed
-                            movimiento_direccion_segmento = movimiento_direccion
-                            max_elbow_angle_segmento = elbow_angle
-                            posicion_cancha_segmento = posicion_cancha
-                            segmentos.append({
-                                'inicio': inicio,
-                                'fin': None,
-                                'max_velocidad': max_velocidad_segmento,
-                                'movimiento_direccion': movimiento_direccion_segmento,
-                                'max_elbow_angle': max_elbow_angle_segmento,
-                                'posicion_cancha': posicion_cancha_segmento,
-                                'player_position': track_id
-                            })
-                        elif movimiento_detectado and (wrist_speed < (max_velocidad_segmento * 1.0) or (current_time - inicio > max_segment_duration)):
-                            fin = max(current_time, inicio + 0.1)
-                            segmentos[-1]['fin'] = fin
-                            movimiento_detectado = False
-                            ultimo_segmento_fin = fin
-                            inicio = None
-                            max_velocidad_segmento = 0
-                            movimiento_direccion_segmento = "N/A"
-                            max_elbow_angle_segmento = 0
-                            posicion_cancha_segmento = "N/A"
-                        elif movimiento_detectado and wrist_speed > max_velocidad_segmento:
-                            max_velocidad_segmento = wrist_speed
-                            segmentos[-1]['max_velocidad'] = max_velocidad_segmento
-                            segmentos[-1]['movimiento_direccion'] = movimiento_direccion
-                            segmentos[-1]['max_elbow_angle'] = elbow_angle
-                            segmentos[-1]['posicion_cancha'] = posicion_cancha
-
-            video_duration = current_time
-            total_golpes = len(segmentos)
-            ritmo = (total_golpes / video_duration) * 120 if video_duration > 0 else 0
-            ritmo = min(ritmo, 100)
-
-            draw_metrics(frame, track_id, elbow_angle, wrist_speed, wrist_direction_change, movimiento_direccion_segmento, posicion_cancha_segmento, total_golpes, ritmo, detections, session_active, selected_track_id)
-
-            cv2.imshow('Padel Metrics Capture', frame)
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
-                logger.info("Usuario presionó 'q'. Cerrando ventana.")
-                break
-            elif key == ord('s'):
-                if not session_active:
-                    logger.info("Iniciando sesión de captura.")
-                    session_active = True
-                    start_time = datetime.now().timestamp()
-                    current_time = 0
-                    segmentos = []
-                    player_keypoints = {}
-            elif key == ord('p'):
-                if session_active:
-                    logger.info("Pausando sesión de captura.")
-                    session_active = False
-                    save_results(segmentos, current_time)
-            elif key == ord('r'):
-                logger.info("Reiniciando selección de jugador.")
-                selected_track_id = None
+    session = SessionState()
+    worker = InferenceWorker(grabber, session, LiveAnalyzer(custom_params))
+    if headless:
+        session.start()
 
+    grabber.start()
+    worker.start()
+    render_latencies = None
+    output_file = None
+    try:
+        if headless:
+            output_file = run_headless(grabber, worker, duration, save_interval)
+        else:
+            render_latencies = run_window(grabber, worker, session)
     except KeyboardInterrupt:
         logger.info("Captura interrumpida por el usuario (Ctrl+C). Guardando resultados.")
-        save_results(segmentos, current_time)
     except Exception as e:
         logger.error(f"Error en el bucle principal: {str(e)}")
     finally:
-        cap.release()
-        cv2.destroyAllWindows()
-        save_results(segmentos, current_time)
+        grabber.stop()
+        worker.stop()
+        worker.join(timeout=5)
+        grabber.join(timeout=5)
+        report = worker.report(render_latencies)
+        logger.info(f"Estadísticas del motor: {report}")
+        save_results(worker.analyzer.snapshot_segments(), worker.current_time, report, output_file)
+
+def main():
+    parser = argparse.ArgumentParser(description="Captura métricas de pádel en vivo desde una webcam, un stream o un archivo.")
+    parser.add_argument('--source', default='0', help="Índice de la webcam, URL RTSP/HLS o archivo de video")
+    parser.add_argument('--headless', action='store_true', help="Sin ventana: solo escribe métricas y estadísticas")
+    parser.add_argument('--duration', type=float, help="Segundos de captura en modo headless")
+    parser.add_argument('--realtime', action='store_true', help="Reproducir un archivo a velocidad real")
+    parser.add_argument('--save-interval', type=float, default=10.0, help="Segundos entre escrituras en modo headless")
+    args = parser.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    capture_padel_metrics(source, args.headless, args.duration, args.realtime, args.save_interval)
 
 if __name__ == "__main__":
-    capture_padel_metrics()
\ No newline at end of file
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import csv
+import importlib.util
+import os
+import sys
+from collections import Counter
+
+# Cargar el módulo de diagnóstico directamente para no inicializar Firebase al importar routes.padel_iq
+_module_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'routes', 'padel_iq', 'diagnostics.py')
+_spec = importlib.util.spec_from_file_location('padel_diagnostics', _module_path)
+diagnostics = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(diagnostics)
+
+FIELDS = ['time', 'frame', 'track_id', 'player_position', 'stroke', 'flags', 'elbow_angle',
+          'wrist_speed', 'elbow_angle_speed', 'wrist_direction_change', 'velocidad']
+
+def print_summary(records):
+    """Imprime un resumen de los registros por track, golpe y flag."""
+    print(f"Registros: {len(records)}")
+    if not records:
+        return
+    print(f"Intervalo: {records[0]['time']:.2f}s - {records[-1]['time']:.2f}s")
+    print(f"Tracks: {len(set(r['track_id'] for r in records))}")
+    flags = Counter(flag for r in records for flag in r['flags'])
+    for flag, count in flags.most_common():
+        print(f"  {flag}: {count}")
+    strokes = Counter(r['stroke'] for r in records if 'segment_start' in r['flags'])
+    for stroke, count in strokes.most_common():
+        print(f"  inicio {stroke}: {count}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Lee un archivo de diagnóstico binario (.pdiag) de un análisis.")
+    parser.add_argument('path', help="Archivo .pdiag generado por segmentar_video_juego")
+    parser.add_argument('--track', help="Filtrar por track_id")
+    parser.add_argument('--flag', help="Filtrar registros que tengan este flag (p. ej. segment_start)")
+    parser.add_argument('--csv', action='store_true', help="Volcar los registros en CSV por stdout")
+    args = parser.parse_args()
+
+    records = diagnostics.read_records(args.path)
+    if args.track is not None:
+        records = [r for r in records if r['track_id'] == int(args.track)]
+    if args.flag:
+        records = [r for r in records if args.flag in r['flags']]
+
+    if args.csv:
+        writer = csv.DictWriter(sys.stdout, fieldnames=FIELDS)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(dict(record, flags='|'.join(record['flags'])))
+    else:
+        print_summary(records)
+
+if __name__ == "__main__":
+    main()
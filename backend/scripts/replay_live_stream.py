@@ -0,0 +1,51 @@
+import argparse
+import json
+import os
+import requests
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce un video como fuente en vivo y muestra los eventos SSE de golpes.")
+    parser.add_argument('source', help="URL RTSP/HLS o archivo local (el servidor necesita PADEL_LIVE_ALLOW_FILES=1)")
+    parser.add_argument('--server', default='http://localhost:8080')
+    parser.add_argument('--user-id', default='replay')
+    parser.add_argument('--side', default='left')
+    parser.add_argument('--chunks', action='store_true', help="Subir el archivo como un único fragmento en lugar de pasar la ruta")
+    parser.add_argument('--no-realtime', action='store_true', help="Procesar tan rápido como sea posible")
+    args = parser.parse_args()
+
+    payload = {
+        'user_id': args.user_id,
+        'player_position': {'side': args.side, 'zone': 'back'},
+        'realtime': not args.no_realtime
+    }
+    if not args.chunks:
+        payload['source_url'] = os.path.abspath(args.source) if os.path.exists(args.source) else args.source
+
+    response = requests.post(f"{args.server}/api/live/sessions", json=payload, timeout=10)
+    response.raise_for_status()
+    session = response.json()
+    print(f"Sesión {session['session_id']}")
+
+    if args.chunks:
+        with open(args.source, 'rb') as f:
+            requests.post(f"{args.server}{session['chunks_url']}?final=1", data=f.read(), timeout=60).raise_for_status()
+
+    with requests.get(f"{args.server}{session['events_url']}", stream=True, timeout=None) as events:
+        event = None
+        for line in events.iter_lines(decode_unicode=True):
+            if line.startswith('event: '):
+                event = line[7:]
+            elif line.startswith('data: '):
+                data = json.loads(line[6:])
+                if event == 'stroke':
+                    golpe = data['golpe']
+                    print(f"{golpe['inicio']:8.2f}s {golpe['tipo']:>14} jugador {golpe['player_position']} "
+                          f"| Padel IQ {data['metrics']['padel_iq']:.1f}")
+                else:
+                    summary = {k: v for k, v in data.items() if k != 'golpes_clasificados'}
+                    print(f"{event}: {json.dumps(summary)}")
+                if event in ('end', 'error'):
+                    break
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import requests
+from gunicorn.app.base import BaseApplication
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Punto de entrada del servidor: dos niveles de gunicorn con la misma app de main.py.
+#   api: rutas que solo esperan a Firestore o al disco (matchmaking, perfil, resultados), con muchos
+#        hilos por worker; las rutas de análisis se reenvían al nivel de análisis.
+#   analysis: rutas de análisis de video (CPU), con su propio número de procesos e hilos como límite
+#        de concurrencia, de modo que los videos en curso no ocupan los workers del nivel api.
+#   live: las rutas /api/live/, en un único proceso de análisis (ver LIVE_URL).
+# PADEL_SERVE_ROLE=all (por defecto) arranca los tres en el mismo contenedor; api, analysis y live permiten
+# desplegarlos por separado (api necesita entonces PADEL_ANALYSIS_URL y, opcionalmente, PADEL_LIVE_URL).
+ROLE = os.environ.get('PADEL_SERVE_ROLE', 'all')
+PORT = int(os.environ.get('PORT', 8080))
+API_WORKERS = int(os.environ.get('PADEL_API_WORKERS', 2))
+API_THREADS = int(os.environ.get('PADEL_API_THREADS', 32))
+API_TIMEOUT = int(os.environ.get('PADEL_API_TIMEOUT', 60))
+# Cada petición reenviada ocupa un hilo del nivel api mientras el nivel de análisis responde (hasta
+# PADEL_ANALYSIS_TIMEOUT), y cada flujo SSE mientras dura la sesión: ambos tienen un cupo propio por worker
+# y, lleno el cupo, se responde 503 en vez de esperar, para que los hilos restantes atiendan al resto de rutas
+API_MAX_FORWARDS = int(os.environ.get('PADEL_API_MAX_FORWARDS', max(1, API_THREADS // 4)))
+API_MAX_STREAMS = int(os.environ.get('PADEL_API_MAX_STREAMS', max(1, API_THREADS // 4)))
+# El análisis escala con procesos y no con hilos: los modelos de pose y de detección son globales del
+# módulo, así que dos análisis en hilos del mismo proceso se pisarían. Cada análisis descarga a su propia
+# ruta (downloader.temp_download_path), de modo que varios procesos pueden compartir el directorio de trabajo
+ANALYSIS_WORKERS = int(os.environ.get('PADEL_ANALYSIS_WORKERS', 1))
+ANALYSIS_CONCURRENCY = int(os.environ.get('PADEL_ANALYSIS_CONCURRENCY', 1))  # Hilos por proceso de análisis
+ANALYSIS_TIMEOUT = int(os.environ.get('PADEL_ANALYSIS_TIMEOUT', 300))
+ANALYSIS_PORT = int(os.environ.get('PADEL_ANALYSIS_PORT', 8081))
+BIND_HOST = os.environ.get('PADEL_BIND_HOST', '0.0.0.0')
+ANALYSIS_URL = os.environ.get('PADEL_ANALYSIS_URL')
+# Las sesiones en vivo viven en la memoria de un proceso: todas las peticiones de una sesión deben llegar
+# al mismo, así que /api/live/ se sirve siempre con un único worker. Sus hilos solo atienden frames y
+# eventos SSE; el análisis de cada sesión corre en su propio hilo.
+LIVE_PORT = int(os.environ.get('PADEL_LIVE_PORT', 8082))
+LIVE_THREADS = int(os.environ.get('PADEL_LIVE_THREADS', 8))
+# Con role=api, sin PADEL_LIVE_URL las rutas en vivo van a PADEL_ANALYSIS_URL, que debe tener un solo worker
+LIVE_URL = os.environ.get('PADEL_LIVE_URL')
+# Resultados (ResultStore) y checkpoints se escriben en el disco del nivel de análisis: con role=api sus
+# rutas de consulta se reenvían allí, salvo que PADEL_RESULTS_DIR y PADEL_CHECKPOINT_DIR estén en un
+# almacenamiento compartido por ambos niveles (PADEL_SHARED_STATE=1). Con role=all comparten el disco.
+SHARED_STATE = os.environ.get('PADEL_SHARED_STATE', '0') == '1'
+LOG_LEVEL = os.environ.get('PADEL_LOG_LEVEL', 'debug')
+
+# Rutas que ejecutan análisis de video o mantienen estado de análisis en memoria
+ANALYSIS_ROUTES = (
+    re.compile(r'^/api/calculate_padel_iq$'),
+    re.compile(r'^/api/analysis_checkpoints/[^/]+/resume$'),
+    re.compile(r'^/api/live/'),
+    re.compile(r'^/api/process_training_video$'),
+)
+LIVE_ROUTE = re.compile(r'^/api/live/')
+STREAM_ROUTE = re.compile(r'^/api/live/sessions/[^/]+/events$')
+# Consultas del estado que escribe el nivel de análisis (resultados guardados, checkpoints)
+STATE_ROUTES = (
+    re.compile(r'^/api/analyses/[^/]+$'),
+    re.compile(r'^/api/analysis_checkpoints(/[^/]+)?$'),
+)
+
+# Cabeceras de un solo salto que no se reenvían
+HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailers',
+              'transfer-encoding', 'upgrade'}
+
+def is_analysis_route(path):
+    return any(pattern.match(path) for pattern in ANALYSIS_ROUTES)
+
+def is_state_route(path):
+    return any(pattern.match(path) for pattern in STATE_ROUTES)
+
+class _RequestBody:
+    """Cuerpo de la petición leído de wsgi.input por bloques, para no cargar en memoria los videos subidos."""
+
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.remaining = length
+
+    def __len__(self):
+        return self.remaining
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.stream.read(size)
+        self.remaining -= len(data)
+        return data
+
+def _chunked_body(stream, first):
+    """Cuerpo sin Content-Length (Transfer-Encoding: chunked): se reenvía por bloques hasta el EOF de wsgi.input."""
+    yield first
+    while True:
+        data = stream.read(8192)
+        if not data:
+            return
+        yield data
+
+def request_body(environ):
+    """Cuerpo a reenviar: con longitud conocida, o en streaming hasta EOF si la petición llegó troceada."""
+    length = environ.get('CONTENT_LENGTH')
+    if length:
+        return _RequestBody(environ['wsgi.input'], int(length)) if int(length) > 0 else None
+    chunked = 'chunked' in environ.get('HTTP_TRANSFER_ENCODING', '').lower()
+    if not (chunked or environ.get('wsgi.input_terminated')):
+        return None
+    # gunicorn marca wsgi.input_terminated en todas las peticiones: sin datos no hay cuerpo que reenviar
+    first = environ['wsgi.input'].read(8192)
+    return _chunked_body(environ['wsgi.input'], first) if first else None
+
+class _UpstreamBody:
+    """Cuerpo de la respuesta del nivel de análisis, reenviado por bloques (también los eventos SSE).
+
+    Al cerrarse libera el cupo de reenvío que ocupaba la petición.
+    """
+
+    def __init__(self, upstream, slots):
+        self.upstream = upstream
+        self.slots = slots
+
+    def __iter__(self):
+        # Sin decodificar: la compresión del nivel de análisis se reenvía tal cual
+        return self.upstream.raw.stream(8192, decode_content=False)
+
+    def close(self):
+        try:
+            self.upstream.close()
+        finally:
+            self.slots.release()
+
+class AnalysisRouter:
+    """Middleware WSGI del nivel api: reenvía las rutas de análisis al nivel de análisis.
+
+    Las rutas en vivo van a live_url (un único worker), o a analysis_url si no se indica. Con
+    forward_state también se reenvían las consultas de resultados y checkpoints. Los reenvíos y los
+    flujos SSE tienen cupos separados (max_forwards, max_streams); sin cupo libre se responde 503.
+    """
+
+    def __init__(self, app, analysis_url, timeout=ANALYSIS_TIMEOUT, live_url=None, forward_state=False,
+                 max_forwards=API_MAX_FORWARDS, max_streams=API_MAX_STREAMS):
+        self.app = app
+        self.analysis_url = analysis_url.rstrip('/')
+        self.live_url = (live_url or analysis_url).rstrip('/')
+        self.timeout = timeout
+        self.forward_state = forward_state
+        self.forward_slots = threading.BoundedSemaphore(max_forwards)
+        self.stream_slots = threading.BoundedSemaphore(max_streams)
+        self.session = requests.Session()
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not (is_analysis_route(path) or (self.forward_state and is_state_route(path))):
+            return self.app(environ, start_response)
+        slots = self.stream_slots if STREAM_ROUTE.match(path) else self.forward_slots
+        if not slots.acquire(blocking=False):
+            logger.warning(f"Sin cupo para reenviar {path} al nivel de análisis")
+            start_response('503 Service Unavailable', [('Content-Type', 'application/json'), ('Retry-After', '5')])
+            return [b'{"error": "Servicio de analisis ocupado"}']
+        try:
+            return self.forward(environ, start_response, slots)
+        except BaseException:
+            slots.release()
+            raise
+
+    def forward(self, environ, start_response, slots):
+        """Reenvía la petición; el cupo se libera al cerrar la respuesta (o aquí si no hay respuesta)."""
+        path = environ.get('PATH_INFO', '')
+        url = (self.live_url if LIVE_ROUTE.match(path) else self.analysis_url) + path
+        if environ.get('QUERY_STRING'):
+            url += '?' + environ['QUERY_STRING']
+        headers = {key[5:].replace('_', '-').title(): value for key, value in environ.items()
+                   if key.startswith('HTTP_') and key[5:].replace('_', '-').lower() not in HOP_BY_HOP | {'host'}}
+        if environ.get('CONTENT_TYPE'):
+            headers['Content-Type'] = environ['CONTENT_TYPE']
+        forwarded_for = headers.get('X-Forwarded-For')
+        remote_addr = environ.get('REMOTE_ADDR', '')
+        headers['X-Forwarded-For'] = f"{forwarded_for}, {remote_addr}" if forwarded_for else remote_addr
+        body = request_body(environ)
+
+        try:
+            upstream = self.session.request(environ['REQUEST_METHOD'], url, headers=headers, data=body, stream=True,
+                                            timeout=(5, self.timeout), allow_redirects=False)
+        except requests.RequestException as e:
+            logger.error(f"Nivel de análisis no disponible para {url}: {str(e)}")
+            slots.release()
+            start_response('503 Service Unavailable', [('Content-Type', 'application/json'), ('Retry-After', '5')])
+            return [b'{"error": "Servicio de analisis no disponible"}']
+
+        response_headers = [(key, value) for key, value in upstream.raw.headers.items() if key.lower() not in HOP_BY_HOP]
+        try:
+            start_response(f"{upstream.status_code} {upstream.reason}", response_headers)
+        except BaseException:
+            upstream.close()
+            raise
+        return _UpstreamBody(upstream, slots)
+
+class PadelServer(BaseApplication):
+    """Gunicorn embebido que sirve main:app con las opciones de un nivel."""
+
+    def __init__(self, options, analysis_url=None, live_url=None, forward_state=False):
+        self.options = options
+        self.analysis_url = analysis_url
+        self.live_url = live_url
+        self.forward_state = forward_state
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from main import app
+        if self.analysis_url:
+            return AnalysisRouter(app, self.analysis_url, live_url=self.live_url, forward_state=self.forward_state)
+        return app
+
+def server_options(role, port, host=BIND_HOST):
+    """Opciones de gunicorn de cada nivel; ambos usan workers con hilos (gthread)."""
+    options = {
+        'bind': f"{host}:{port}",
+        'worker_class': 'gthread',
+        'loglevel': LOG_LEVEL,
+        'accesslog': '-',
+        'errorlog': '-'
+    }
+    if role == 'analysis':
+        options.update(workers=ANALYSIS_WORKERS, threads=ANALYSIS_CONCURRENCY, timeout=ANALYSIS_TIMEOUT,
+                       proc_name='padel-analysis')
+    elif role == 'live':
+        options.update(workers=1, threads=LIVE_THREADS, timeout=ANALYSIS_TIMEOUT, proc_name='padel-live')
+    else:
+        options.update(workers=API_WORKERS, threads=API_THREADS, timeout=API_TIMEOUT, proc_name='padel-api')
+    return options
+
+def main():
+    if ROLE in ('analysis', 'live'):
+        PadelServer(server_options(ROLE, PORT)).run()
+        return
+    if ROLE == 'api':
+        if not ANALYSIS_URL:
+            raise SystemExit("PADEL_SERVE_ROLE=api necesita PADEL_ANALYSIS_URL")
+        PadelServer(server_options('api', PORT), ANALYSIS_URL, LIVE_URL, forward_state=not SHARED_STATE).run()
+        return
+    if ROLE != 'all':
+        raise SystemExit(f"PADEL_SERVE_ROLE no soportado: {ROLE} (usa all, api, analysis o live)")
+
+    # Niveles de análisis y en vivo en procesos hijos, solo accesibles desde el contenedor
+    children = []
+    for role, port in (('analysis', ANALYSIS_PORT), ('live', LIVE_PORT)):
+        env = dict(os.environ, PADEL_SERVE_ROLE=role, PORT=str(port), PADEL_BIND_HOST='127.0.0.1')
+        children.append(subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env))
+    logger.info(f"Nivel de análisis en el puerto {ANALYSIS_PORT}, en vivo en el {LIVE_PORT}, nivel api en el {PORT}")
+    try:
+        PadelServer(server_options('api', PORT), f"http://127.0.0.1:{ANALYSIS_PORT}", f"http://127.0.0.1:{LIVE_PORT}").run()
+    finally:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.wait(timeout=30)
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,190 @@
+import atexit
 import logging
+import queue
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+class LoggingNotificationProvider:
+    """Proveedor por defecto: simula el envío registrando cada notificación."""
+
+    def send_batch(self, notifications):
+        # Aquí iría la integración con un servicio de notificaciones (por ejemplo, Firebase Cloud Messaging)
+        for notification in notifications:
+            logger.info(f"Notificación enviada a {notification['user_id']}: {notification['message']}")
+
+class InMemoryNotificationProvider:
+    """Proveedor en memoria para pruebas: guarda cada lote enviado."""
+
+    def __init__(self, failures=0, delay=0.0):
+        self.batches = []
+        self.failures = failures  # Número de envíos que fallarán antes de aceptar
+        self.delay = delay  # Latencia simulada por llamada al proveedor
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def send_batch(self, notifications):
+        with self._lock:
+            self.calls += 1
+            if self.delay:
+                time.sleep(self.delay)
+            if self.failures > 0:
+                self.failures -= 1
+                raise RuntimeError("Fallo simulado del proveedor de notificaciones")
+            self.batches.append(list(notifications))
+
+    @property
+    def sent(self):
+        """Lista plana de todas las notificaciones entregadas."""
+        with self._lock:
+            return [notification for batch in self.batches for notification in batch]
+
+class NotificationDispatcher:
+    """Despacha notificaciones en segundo plano con lotes, agrupación por usuario y reintentos."""
+
+    def __init__(self, provider=None, batch_size=50, coalesce_window=2.0, max_retries=3, backoff_base=0.5):
+        self.provider = provider or LoggingNotificationProvider()
+        self.batch_size = batch_size
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.stats = {'enqueued': 0, 'sent': 0, 'coalesced': 0, 'retries': 0, 'dropped': 0}
+
+        self._queue = queue.Queue()
+        self._pending = {}  # user_id -> {'messages': [...], 'first_time': t}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Arranca el hilo trabajador si no está activo."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, user_id, message):
+        """Encola una notificación sin bloquear la petición HTTP."""
+        self.start()
+        self._count('enqueued')
+        self._queue.put(('notify', user_id, message))
+
+    def flush(self, timeout=None):
+        """Fuerza el envío de todo lo pendiente y espera a que termine."""
+        self.start()
+        done = threading.Event()
+        self._queue.put(('flush', done, None))
+        return done.wait(timeout)
+
+    def stop(self, timeout=5.0):
+        """Envía lo pendiente y detiene el hilo trabajador."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(('stop', None, None))
+        self._thread.join(timeout)
+
+    def _count(self, stat, n=1):
+        # enqueue se llama desde los hilos de las peticiones y el resto desde el hilo trabajador
+        with self._lock:
+            self.stats[stat] += n
+
+    def _run(self):
+        while True:
+            wait = self._next_deadline()
+            try:
+                kind, first, second = self._queue.get(timeout=wait)
+            except queue.Empty:
+                self._flush_due()
+                continue
+
+            if kind == 'notify':
+                self._add_pending(first, second)
+                self._flush_due()
+            elif kind == 'flush':
+                self._flush_due(force=True)
+                first.set()
+            elif kind == 'stop':
+                self._flush_due(force=True)
+                return
+
+    def _next_deadline(self):
+        if not self._pending:
+            return None
+        oldest = min(entry['first_time'] for entry in self._pending.values())
+        return max(0.0, oldest + self.coalesce_window - time.monotonic())
+
+    def _add_pending(self, user_id, message):
+        entry = self._pending.get(user_id)
+        if entry is None:
+            self._pending[user_id] = {'messages': [message], 'first_time': time.monotonic()}
+        else:
+            entry['messages'].append(message)
+            self._count('coalesced')
+
+    def _flush_due(self, force=False):
+        now = time.monotonic()
+        due = [user_id for user_id, entry in self._pending.items()
+               if force or now - entry['first_time'] >= self.coalesce_window]
+        # Si hay suficientes usuarios pendientes para un lote completo, no esperar la ventana
+        if not force and len(self._pending) >= self.batch_size:
+            due = list(self._pending)
+
+        notifications = [self._build_notification(user_id, self._pending.pop(user_id)['messages']) for user_id in due]
+        for i in range(0, len(notifications), self.batch_size):
+            self._send_with_retry(notifications[i:i + self.batch_size])
+
+    def _build_notification(self, user_id, messages):
+        if len(messages) == 1:
+            message = messages[0]
+        else:
+            message = f"Tienes {len(messages)} notificaciones nuevas"
+        return {'user_id': user_id, 'message': message, 'messages': messages}
+
+    def _send_with_retry(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.provider.send_batch(batch)
+                self._count('sent', len(batch))
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self._count('dropped', len(batch))
+                    logger.error(f"Descartando {len(batch)} notificaciones tras {attempt + 1} intentos: {str(e)}")
+                    return
+                self._count('retries')
+                delay = self.backoff_base * (2 ** attempt)
+                logger.warning(f"Error al enviar notificaciones (intento {attempt + 1}), reintentando en {delay}s: {str(e)}")
+                time.sleep(delay)
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_dispatcher():
+    """Devuelve el despachador compartido del proceso, creándolo si hace falta."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher()
+        return _dispatcher
+
+def configure_dispatcher(provider=None, **kwargs):
+    """Reemplaza el despachador compartido (por ejemplo, con un proveedor en memoria para pruebas)."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is not None:
+            _dispatcher.stop()
+        _dispatcher = NotificationDispatcher(provider=provider, **kwargs)
+        return _dispatcher
+
+def _stop_dispatcher():
+    """Al salir del proceso, envía lo pendiente del despachador compartido vigente."""
+    if _dispatcher is not None:
+        _dispatcher.stop()
+
+# Un solo registro: configure_dispatcher reemplaza el despachador sin acumular handlers
+atexit.register(_stop_dispatcher)
+
 def send_notification(user_id, message):
-    """Simula el envío de una notificación push al usuario."""
-    # Aquí iría la integración con un servicio de notificaciones (por ejemplo, Firebase Cloud Messaging)
-    logger.info(f"Notificación enviada a {user_id}: {message}")
-    # Simulación: solo registramos la notificación
-    return True
\ No newline at end of file
+    """Encola una notificación push para el usuario; el envío real ocurre en segundo plano."""
+    get_dispatcher().enqueue(user_id, message)
+    return True
@@ -0,0 +1,17 @@
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'routes', 'padel_iq')
+
+def _register_package():
+    # Registrar routes/padel_iq como paquete sin ejecutar su __init__, que inicializa Firebase
+    if 'padel_iq' in sys.modules:
+        return
+    spec = importlib.machinery.ModuleSpec('padel_iq', None, is_package=True)
+    package = importlib.util.module_from_spec(spec)
+    package.__path__ = [PACKAGE_DIR]
+    sys.modules['padel_iq'] = package
+
+_register_package()
@@ -0,0 +1,194 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+import types
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip('mediapipe')
+pytest.importorskip('ultralytics')
+
+from padel_iq import video_processing
+from padel_iq.checkpoints import AnalysisCheckpoint, checkpoint_id
+
+FPS = 30
+DURATION = 24
+GAME_SPLITS = [8.0, 16.0]
+PLAYER_POSITION = {'side': 'left', 'zone': 'back'}
+PLAYER_COLOR = (40, 40, 200)  # BGR
+
+def _player_boxes(t):
+    """Cajas de los cuatro jugadores en el instante t, con desplazamientos suaves."""
+    boxes = []
+    for i, (x, y) in enumerate([(160, 200), (160, 380), (480, 200), (480, 380)]):
+        x += 40 * np.sin(0.6 * t + i)
+        y += 15 * np.cos(0.4 * t + i)
+        boxes.append((int(x - 30), int(y - 80), int(x + 30), int(y + 80)))
+    return boxes
+
+def _write_video(path):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (640, 480))
+    for index in range(FPS * DURATION):
+        t = index / FPS
+        frame = np.full((480, 640, 3), (60, 140, 60), dtype=np.uint8)
+        for i, (x1, y1, x2, y2) in enumerate(_player_boxes(t)):
+            cv2.rectangle(frame, (x1, y1), (x2, y2), PLAYER_COLOR, -1)
+            # Marca blanca de la muñeca que oscila dentro de la caja: de ella sale la pose
+            wx = int((x1 + x2) / 2 + 22 * np.cos(3.0 * t + i))
+            wy = int(y1 + 50 + 30 * np.sin(3.0 * t + i))
+            cv2.rectangle(frame, (wx - 5, wy - 5), (wx + 5, wy + 5), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+class StandInDetector:
+    """Detector con la interfaz de PersonDetector: cajas de los rectángulos rojos del frame."""
+    name = 'stand-in'
+    imgsz = 640
+
+    def detect(self, frame, min_confidence=0.5, imgsz=None):
+        mask = cv2.inRange(frame, (0, 0, 150), (120, 120, 255))
+        mask |= cv2.inRange(frame, (200, 200, 200), (255, 255, 255))
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w * h > 2000:
+                boxes.append((float(x), float(y), float(x + w), float(y + h), 0.9))
+        return sorted(boxes)
+
+class StandInPose:
+    """Estimador con la interfaz de MediaPipe Pose: hombro y codo fijos, muñeca en el punto más claro."""
+
+    def process(self, image):
+        gray = image[:, :, 0]
+        _, _, _, (x, y) = cv2.minMaxLoc(gray)
+        height, width = gray.shape
+        landmarks = [types.SimpleNamespace(x=0.5, y=0.5) for _ in range(33)]
+        landmarks[11] = types.SimpleNamespace(x=0.5, y=0.2)  # hombro izquierdo
+        landmarks[13] = types.SimpleNamespace(x=0.5, y=0.4)  # codo izquierdo
+        landmarks[15] = types.SimpleNamespace(x=x / width, y=y / height)  # muñeca izquierda
+        return types.SimpleNamespace(pose_landmarks=types.SimpleNamespace(landmark=landmarks))
+
+class Interrupted(Exception):
+    pass
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / 'juego.mp4')
+    _write_video(path)
+    return path
+
+@pytest.fixture(autouse=True)
+def stand_in_models(monkeypatch):
+    monkeypatch.setattr(video_processing, 'person_detector', StandInDetector())
+    monkeypatch.setattr(video_processing, 'pose', StandInPose())
+
+def _params(checkpoint_path=None):
+    params = {
+        'velocidad_umbral': 0.00005,
+        'max_segment_duration': 1.5,
+        'frame_skip': 6,
+        'scale_factor': 0.8,
+        'tracker_backend': 'motion',
+        'court_mask': False
+    }
+    if checkpoint_path:
+        params['checkpoint_path'] = checkpoint_path
+    return params
+
+def _interrupt_after(monkeypatch, stop_time):
+    """Hace fallar el segmentador en la primera muestra a partir de stop_time, como un worker que muere."""
+    process_frame = video_processing.GameSegmenter.process_frame
+
+    def failing_process_frame(self, frame, current_time, frame_index, *args, **kwargs):
+        if current_time >= stop_time:
+            raise Interrupted(f"Interrumpido en t={current_time}")
+        return process_frame(self, frame, current_time, frame_index, *args, **kwargs)
+
+    monkeypatch.setattr(video_processing.GameSegmenter, 'process_frame', failing_process_frame)
+
+def _run_until_killed(video, checkpoint_path, marker, stop_time):
+    """Proceso hijo: analiza con checkpoint y, al llegar a stop_time, avisa con marker y se queda esperando."""
+    video_processing.person_detector = StandInDetector()
+    video_processing.pose = StandInPose()
+    process_frame = video_processing.GameSegmenter.process_frame
+
+    def blocking_process_frame(self, frame, current_time, frame_index, *args, **kwargs):
+        if current_time >= stop_time:
+            open(marker, 'w').close()
+            time.sleep(3600)
+        return process_frame(self, frame, current_time, frame_index, *args, **kwargs)
+
+    video_processing.GameSegmenter.process_frame = blocking_process_frame
+    video_processing.segmentar_video_juego(video, PLAYER_POSITION, GAME_SPLITS, _params(checkpoint_path))
+
+def test_resume_after_interruption_matches_uninterrupted_run(video, tmp_path, monkeypatch):
+    expected_segments, expected_duration, expected_trajectories = video_processing.segmentar_video_juego(
+        video, PLAYER_POSITION, GAME_SPLITS, _params())
+    assert expected_segments, "el video sintético debe producir golpes"
+
+    checkpoint_path = str(tmp_path / 'checkpoint')
+    with monkeypatch.context() as patch:
+        # Fallo a mitad del tercer juego: quedan guardados los dos primeros
+        _interrupt_after(patch, 20.0)
+        with pytest.raises(Interrupted):
+            video_processing.segmentar_video_juego(video, PLAYER_POSITION, GAME_SPLITS, _params(checkpoint_path))
+
+    checkpoint = AnalysisCheckpoint(checkpoint_path)
+    assert checkpoint.read_meta()['completed_games'] == 2
+    state = checkpoint.load(_params(checkpoint_path), os.path.getsize(video))
+    assert state is not None and state['next_game'] == 2
+
+    segments, duration, trajectories = video_processing.segmentar_video_juego(
+        video, PLAYER_POSITION, GAME_SPLITS, _params(checkpoint_path))
+    assert duration == expected_duration
+    assert segments == expected_segments
+    assert trajectories == expected_trajectories
+
+def test_checkpoint_ignored_when_params_change(video, tmp_path, monkeypatch):
+    checkpoint_path = str(tmp_path / 'checkpoint')
+    with monkeypatch.context() as patch:
+        _interrupt_after(patch, 12.0)
+        with pytest.raises(Interrupted):
+            video_processing.segmentar_video_juego(video, PLAYER_POSITION, GAME_SPLITS, _params(checkpoint_path))
+
+    checkpoint = AnalysisCheckpoint(checkpoint_path)
+    changed = dict(_params(checkpoint_path), frame_skip=3)
+    assert checkpoint.load(_params(checkpoint_path), os.path.getsize(video)) is not None
+    assert checkpoint.load(changed, os.path.getsize(video)) is None
+    assert checkpoint.load(_params(checkpoint_path), os.path.getsize(video) + 1) is None
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGKILL'), reason="requiere SIGKILL (POSIX)")
+def test_resume_after_killed_worker(video, tmp_path):
+    expected = video_processing.segmentar_video_juego(video, PLAYER_POSITION, GAME_SPLITS, _params())
+
+    # Worker real que muere con SIGKILL a mitad del tercer juego: sin excepciones ni limpieza
+    checkpoint_path = str(tmp_path / 'checkpoint')
+    marker = str(tmp_path / 'stopped')
+    tests_dir = os.path.dirname(os.path.abspath(__file__))
+    script = (f"import sys; sys.path.insert(0, {tests_dir!r}); import conftest, test_checkpoints; "
+              f"test_checkpoints._run_until_killed(*sys.argv[1:4], float(sys.argv[4]))")
+    worker = subprocess.Popen([sys.executable, '-c', script, video, checkpoint_path, marker, '20.0'])
+    try:
+        deadline = time.monotonic() + 120
+        while not os.path.exists(marker):
+            assert worker.poll() is None, "el worker terminó antes de llegar al tercer juego"
+            assert time.monotonic() < deadline, "el worker no llegó al tercer juego"
+            time.sleep(0.05)
+        os.kill(worker.pid, signal.SIGKILL)
+    finally:
+        worker.kill()
+        worker.wait()
+    assert worker.returncode == -signal.SIGKILL
+
+    checkpoint = AnalysisCheckpoint(checkpoint_path)
+    assert checkpoint.read_meta()['completed_games'] == 2
+    assert video_processing.segmentar_video_juego(video, PLAYER_POSITION, GAME_SPLITS, _params(checkpoint_path)) == expected
+
+def test_checkpoint_id_is_per_user():
+    request = ('https://example.com/juego.mp4', PLAYER_POSITION, GAME_SPLITS)
+    assert checkpoint_id('ana', *request) == checkpoint_id('ana', *request)
+    assert checkpoint_id('ana', *request) != checkpoint_id('luis', *request)
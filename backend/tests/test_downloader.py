@@ -0,0 +1,176 @@
+import base64
+import hashlib
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+from padel_iq.downloader import DownloadError, RangedDownload, download_video, remove_download, temp_download_path
+
+CONTENT = os.urandom(1024 * 1024 + 12345)
+CHUNK_SIZE = 128 * 1024
+
+class VideoServer(ThreadingHTTPServer):
+    """Servidor HTTP local con rangos, ETag y x-goog-hash, y fallos inyectables por rango."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), VideoHandler)
+        self.content = CONTENT
+        self.ranges = True
+        self.etag = '"v1"'
+        self.md5 = hashlib.md5(CONTENT).digest()
+        self.failures = {}  # inicio del rango -> número de respuestas 500 antes de servirlo (-1: siempre)
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/video.mp4"
+
+class VideoHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        match = re.fullmatch(r'bytes=(\d+)-(\d+)', self.headers.get('Range', ''))
+        with server.lock:
+            server.requests.append(self.headers.get('Range'))
+            if match and server.ranges:
+                start = int(match.group(1))
+                remaining = server.failures.get(start, 0)
+                if remaining:
+                    server.failures[start] = remaining - 1 if remaining > 0 else remaining
+                    self.send_error(500)
+                    return
+
+        if match and server.ranges:
+            start, end = int(match.group(1)), min(int(match.group(2)), len(server.content) - 1)
+            body = server.content[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{len(server.content)}")
+        else:
+            body = server.content
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', server.etag)
+        self.send_header('x-goog-hash', f"crc32c=AAAAAA==,md5={base64.b64encode(server.md5).decode()}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = VideoServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _range_requests(server):
+    # Sin la consulta inicial de un byte
+    return [r for r in server.requests if r and r != 'bytes=0-0']
+
+def test_parallel_ranged_download(server, tmp_path):
+    local_path = str(tmp_path / 'video.mp4')
+    download_video(server.url, local_path, expected_sha256=hashlib.sha256(CONTENT).hexdigest(),
+                   workers=4, chunk_size=CHUNK_SIZE)
+    with open(local_path, 'rb') as f:
+        assert f.read() == CONTENT
+    assert len(_range_requests(server)) == -(-len(CONTENT) // CHUNK_SIZE)
+    assert not os.path.exists(f"{local_path}.part")
+    assert not os.path.exists(f"{local_path}.part.json")
+
+def test_transient_errors_are_retried(server, tmp_path):
+    server.failures = {CHUNK_SIZE: 2, 3 * CHUNK_SIZE: 1}
+    download = RangedDownload(server.url, str(tmp_path / 'video.mp4'), workers=2, chunk_size=CHUNK_SIZE, retries=3)
+    download.run()
+    assert download.stats['retries'] == 3
+    with open(download.local_path, 'rb') as f:
+        assert f.read() == CONTENT
+
+def test_resume_fetches_only_missing_chunks(server, tmp_path):
+    local_path = str(tmp_path / 'video.mp4')
+    server.failures = {2 * CHUNK_SIZE: -1}
+    with pytest.raises(DownloadError):
+        RangedDownload(server.url, local_path, workers=4, chunk_size=CHUNK_SIZE, retries=0).run()
+    assert os.path.exists(f"{local_path}.part") and os.path.exists(f"{local_path}.part.json")
+    assert not os.path.exists(local_path)
+
+    server.failures = {}
+    server.requests = []
+    download = RangedDownload(server.url, local_path, workers=4, chunk_size=CHUNK_SIZE, retries=0)
+    download.run()
+    total_chunks = -(-len(CONTENT) // CHUNK_SIZE)
+    assert download.stats['resumed_chunks'] == total_chunks - 1
+    assert _range_requests(server) == [f"bytes={2 * CHUNK_SIZE}-{3 * CHUNK_SIZE - 1}"]
+    with open(local_path, 'rb') as f:
+        assert f.read() == CONTENT
+
+def test_changed_remote_restarts_download(server, tmp_path):
+    local_path = str(tmp_path / 'video.mp4')
+    server.failures = {0: -1}
+    with pytest.raises(DownloadError):
+        RangedDownload(server.url, local_path, workers=2, chunk_size=CHUNK_SIZE, retries=0).run()
+
+    # Otro recurso con el mismo tamaño: el progreso guardado no vale
+    server.failures = {}
+    server.content = CONTENT[::-1]
+    server.etag = '"v2"'
+    server.md5 = hashlib.md5(server.content).digest()
+    download = RangedDownload(server.url, local_path, workers=2, chunk_size=CHUNK_SIZE, retries=0)
+    download.run()
+    assert download.stats['resumed_chunks'] == 0
+    with open(local_path, 'rb') as f:
+        assert f.read() == server.content
+
+def test_server_without_ranges_streams(server, tmp_path):
+    server.ranges = False
+    local_path = download_video(server.url, str(tmp_path / 'video.mp4'), workers=4, chunk_size=CHUNK_SIZE)
+    with open(local_path, 'rb') as f:
+        assert f.read() == CONTENT
+
+def test_checksum_mismatch_is_rejected(server, tmp_path):
+    local_path = str(tmp_path / 'video.mp4')
+    server.md5 = hashlib.md5(b'otro contenido').digest()
+    with pytest.raises(DownloadError):
+        download_video(server.url, local_path, workers=2, chunk_size=CHUNK_SIZE)
+    assert not os.path.exists(local_path)
+    assert not os.path.exists(f"{local_path}.part")
+
+    server.md5 = hashlib.md5(CONTENT).digest()
+    with pytest.raises(DownloadError):
+        download_video(server.url, local_path, expected_sha256='0' * 64, workers=2, chunk_size=CHUNK_SIZE)
+
+def test_concurrent_downloads_use_their_own_paths(server, tmp_path):
+    paths = [temp_download_path('temp_video_juego', str(tmp_path)) for _ in range(2)]
+    assert paths[0] != paths[1]
+
+    errors = []
+
+    def _download(path):
+        try:
+            download_video(server.url, path, chunk_size=CHUNK_SIZE)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=_download, args=(path,)) for path in paths]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    for path in paths:
+        with open(path, 'rb') as f:
+            assert f.read() == CONTENT
+
+    # El estado parcial de una descarga interrumpida se elimina con ella
+    with open(f"{paths[0]}.part", 'wb') as f:
+        f.write(b'x')
+    with open(f"{paths[0]}.part.json", 'w') as f:
+        f.write('{}')
+    for path in paths:
+        remove_download(path)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,48 @@
+import json
+import pytest
+
+pytest.importorskip('mediapipe')
+pytest.importorskip('ultralytics')
+
+from padel_iq import live_stream, video_processing
+from test_checkpoints import PLAYER_POSITION, StandInDetector, StandInPose, _params, _write_video
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / 'juego.mp4')
+    _write_video(path)
+    return path
+
+@pytest.fixture(autouse=True)
+def stand_in_models(monkeypatch):
+    # Lotes: modelos globales del módulo; en vivo: modelos propios de cada sesión
+    monkeypatch.setattr(video_processing, 'person_detector', StandInDetector())
+    monkeypatch.setattr(video_processing, 'pose', StandInPose())
+    monkeypatch.setattr(live_stream, 'create_detector', StandInDetector)
+    monkeypatch.setattr(live_stream, 'create_pose', StandInPose)
+
+def _json(value):
+    return json.loads(json.dumps(value, default=live_stream._json_default))
+
+def _live_params():
+    # Sin refinamiento ni calibración de cancha: en vivo no se aplican (ver LiveAnalysisSession)
+    return dict(_params(), adaptive_sampling=False, segment_refinement=False, live_flush_seconds=1.0)
+
+def test_live_session_matches_batch_analysis(video):
+    expected, expected_duration, _ = video_processing.analizar_video_juego(
+        video, PLAYER_POSITION, game_splits=[], custom_params=_live_params())
+    assert expected, "el video sintético debe producir golpes"
+
+    session = live_stream.LiveAnalysisSession('usuario', PLAYER_POSITION, _live_params(), source_url=video)
+    session.start()
+    session.thread.join(timeout=120)
+    assert session.status == 'finished'
+
+    events = [(event, json.loads(data)) for _, event, data in session.events]
+    end = events[-1][1]
+    assert events[-1][0] == 'end'
+    assert end['video_duration'] == pytest.approx(expected_duration)
+    assert end['golpes_clasificados'] == _json(expected)
+    # Un evento por golpe, en el orden en que se cierran
+    strokes = [data['golpe'] for event, data in events if event == 'stroke']
+    assert strokes == sorted(_json([golpe for golpes in expected.values() for golpe in golpes]), key=lambda g: g['inicio'])
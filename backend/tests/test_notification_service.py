@@ -0,0 +1,82 @@
+import atexit
+import threading
+
+from services import notification_service
+from services.notification_service import InMemoryNotificationProvider, NotificationDispatcher
+
+def _dispatcher(provider, **kwargs):
+    params = dict(batch_size=50, coalesce_window=60.0, max_retries=3, backoff_base=0.0)
+    params.update(kwargs)
+    return NotificationDispatcher(provider=provider, **params)
+
+def test_coalesces_messages_per_user():
+    provider = InMemoryNotificationProvider()
+    dispatcher = _dispatcher(provider)
+    for message in ('a', 'b', 'c'):
+        dispatcher.enqueue('u1', message)
+    dispatcher.enqueue('u2', 'd')
+    assert dispatcher.flush(timeout=5)
+    dispatcher.stop()
+
+    sent = {notification['user_id']: notification for notification in provider.sent}
+    assert sent['u1']['messages'] == ['a', 'b', 'c']
+    assert sent['u1']['message'] == "Tienes 3 notificaciones nuevas"
+    assert sent['u2']['message'] == 'd'
+    assert dispatcher.stats == {'enqueued': 4, 'sent': 2, 'coalesced': 2, 'retries': 0, 'dropped': 0}
+
+def test_sends_in_batches_of_batch_size():
+    provider = InMemoryNotificationProvider()
+    dispatcher = _dispatcher(provider, batch_size=4)
+    for i in range(10):
+        dispatcher.enqueue(f'u{i}', 'hola')
+    assert dispatcher.flush(timeout=5)
+    dispatcher.stop()
+
+    assert [len(batch) for batch in provider.batches] == [4, 4, 2]
+    assert sorted(notification['user_id'] for notification in provider.sent) == sorted(f'u{i}' for i in range(10))
+
+def test_retries_failed_batches_and_drops_after_max_retries():
+    provider = InMemoryNotificationProvider(failures=2)
+    dispatcher = _dispatcher(provider)
+    dispatcher.enqueue('u1', 'hola')
+    assert dispatcher.flush(timeout=5)
+    assert [n['user_id'] for n in provider.sent] == ['u1']
+    assert provider.calls == 3
+    assert dispatcher.stats['retries'] == 2
+
+    provider.failures = 10
+    dispatcher.enqueue('u2', 'adiós')
+    assert dispatcher.flush(timeout=5)
+    dispatcher.stop()
+    assert [n['user_id'] for n in provider.sent] == ['u1']
+    assert dispatcher.stats['dropped'] == 1
+    assert dispatcher.stats['sent'] == 1
+
+def test_enqueue_counts_every_notification_across_threads():
+    provider = InMemoryNotificationProvider()
+    dispatcher = _dispatcher(provider)
+    threads = [threading.Thread(target=lambda i=i: [dispatcher.enqueue(f'u{i}', str(j)) for j in range(500)])
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert dispatcher.flush(timeout=5)
+    dispatcher.stop()
+    assert dispatcher.stats['enqueued'] == 8 * 500
+    assert sum(len(n['messages']) for n in provider.sent) == 8 * 500
+
+def test_configure_dispatcher_registers_exit_handler_once(monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, 'register', registered.append)
+    monkeypatch.setattr(notification_service, '_dispatcher', None)
+    first = notification_service.configure_dispatcher(InMemoryNotificationProvider(), coalesce_window=60.0)
+    second = notification_service.configure_dispatcher(InMemoryNotificationProvider(), coalesce_window=60.0)
+    assert notification_service.get_dispatcher() is second
+    assert registered == []
+
+    # El handler de salida envía lo pendiente del despachador vigente
+    notification_service.send_notification('u1', 'hola')
+    notification_service._stop_dispatcher()
+    assert [n['user_id'] for n in second.provider.sent] == ['u1']
+    assert first.provider.sent == []
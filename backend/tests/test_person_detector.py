@@ -0,0 +1,137 @@
+import importlib.util
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip('ultralytics')
+
+from padel_iq import person_detector
+from padel_iq.person_detector import PERSON_CLASS, PersonDetector
+
+# Detecciones crudas del modelo: personas, una persona con poca confianza y un objeto de otra clase
+RAW_BOXES = [
+    (100.0, 80.0, 160.0, 240.0, 0.91, PERSON_CLASS),
+    (400.5, 90.25, 470.0, 260.0, 0.72, PERSON_CLASS),
+    (300.0, 300.0, 340.0, 330.0, 0.88, 32),
+    (500.0, 100.0, 530.0, 180.0, 0.35, PERSON_CLASS),
+]
+
+class _Tensor:
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=np.float32)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+class _Boxes:
+    def __init__(self, rows):
+        self.xyxy = _Tensor([row[:4] for row in rows] or np.zeros((0, 4)))
+        self.conf = _Tensor([row[4] for row in rows])
+        self.cls = _Tensor([row[5] for row in rows])
+
+    def __len__(self):
+        return len(self.conf.values)
+
+class StandInYOLO:
+    """Modelo con la interfaz de ultralytics.YOLO; registra las llamadas para comprobar imgsz."""
+    instances = []
+
+    def __init__(self, path, task=None):
+        self.path = path
+        self.calls = []
+        StandInYOLO.instances.append(self)
+
+    def __call__(self, frame, imgsz=None, classes=None, conf=0.25, verbose=True):
+        self.calls.append(imgsz)
+        # Como ultralytics, el umbral conf del modelo deja pasar las de confianza igual al umbral
+        rows = [row for row in RAW_BOXES if row[4] >= conf and (classes is None or row[5] in classes)]
+        return [type('Result', (), {'boxes': _Boxes(rows)})()]
+
+@pytest.fixture
+def stand_in_yolo(monkeypatch):
+    StandInYOLO.instances = []
+    monkeypatch.setattr(person_detector, 'YOLO', StandInYOLO)
+    return StandInYOLO
+
+@pytest.fixture
+def frame():
+    return np.zeros((480, 640, 3), dtype=np.uint8)
+
+def test_pytorch_detections_keep_only_confident_people(stand_in_yolo, frame):
+    detector = PersonDetector('pytorch')
+    assert detector.name == 'pytorch'
+    detections = detector.detect(frame, 0.5)
+    np.testing.assert_allclose(detections, [(100.0, 80.0, 160.0, 240.0, 0.91), (400.5, 90.25, 470.0, 260.0, 0.72)], rtol=1e-6)
+    assert all(isinstance(value, float) for detection in detections for value in detection)
+
+@pytest.mark.parametrize('backend', ['onnx', 'openvino', 'tensorrt'])
+def test_fallback_matches_pytorch(stand_in_yolo, frame, monkeypatch, backend):
+    reference = PersonDetector('pytorch').detect(frame, 0.5)
+    # Sin runtime o con la exportación fallida el detector debe dar exactamente las mismas cajas que PyTorch
+    monkeypatch.setattr(person_detector, '_runtime_available', lambda name: False)
+    without_runtime = PersonDetector(backend)
+    monkeypatch.setattr(person_detector, '_runtime_available', lambda name: True)
+
+    def failing_export(*args, **kwargs):
+        raise RuntimeError("exportación fallida")
+
+    monkeypatch.setattr(person_detector, 'export_model', failing_export)
+    failed_export = PersonDetector(backend)
+    for detector in (without_runtime, failed_export):
+        assert detector.backend == 'pytorch' and detector.name == 'pytorch'
+        assert detector.model.path == person_detector.DEFAULT_MODEL
+        assert detector.detect(frame, 0.5) == reference
+
+def test_exported_backend_uses_fixed_input_size(stand_in_yolo, frame, monkeypatch, tmp_path):
+    monkeypatch.setattr(person_detector, '_runtime_available', lambda name: True)
+    monkeypatch.setattr(person_detector, 'export_model',
+                        lambda model_path, backend, imgsz, int8, model_dir: str(tmp_path / f"model_{imgsz}.onnx"))
+    exported = PersonDetector('onnx', imgsz=640)
+    assert exported.name == 'onnx'
+    assert exported.detect(frame, 0.5) == PersonDetector('pytorch').detect(frame, 0.5)
+    # Un recorte de la cancha pide menos resolución, pero el modelo exportado tiene la entrada fija
+    exported.detect(frame, 0.5, imgsz=320)
+    assert exported.model.calls == [640, 640]
+
+    pytorch = PersonDetector('pytorch')
+    pytorch.detect(frame, 0.5, imgsz=320)
+    assert pytorch.model.calls == [320]
+
+def test_exported_model_path_separates_variants(tmp_path):
+    model_dir = str(tmp_path)
+    paths = {
+        person_detector.exported_model_path('yolov8n.pt', 'onnx', 640, False, model_dir),
+        person_detector.exported_model_path('yolov8n.pt', 'onnx', 640, True, model_dir),
+        person_detector.exported_model_path('yolov8n.pt', 'onnx', 480, False, model_dir),
+        person_detector.exported_model_path('yolov8n.pt', 'openvino', 640, False, model_dir),
+    }
+    assert len(paths) == 4
+    assert person_detector.exported_model_path('yolov8n.pt', 'onnx', 640, False, model_dir).endswith('.onnx')
+    assert person_detector.exported_model_path('yolov8n.pt', 'openvino', 640, False, model_dir).endswith('_openvino_model')
+
+def _iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+@pytest.mark.skipif(importlib.util.find_spec('onnxruntime') is None, reason="onnxruntime no está instalado")
+def test_onnx_detections_match_pytorch(tmp_path):
+    """Paridad con el modelo real: cada persona de PyTorch tiene su caja ONNX con IoU >= 0.9."""
+    import cv2
+    from ultralytics.utils import ASSETS
+
+    frame = cv2.resize(cv2.imread(os.path.join(str(ASSETS), 'bus.jpg')), (640, 480))
+    reference = PersonDetector('pytorch').detect(frame, 0.5)
+    onnx = PersonDetector('onnx', model_dir=str(tmp_path))
+    assert onnx.backend == 'onnx'
+    candidates = onnx.detect(frame, 0.5)
+    assert reference and len(candidates) == len(reference)
+    for box in reference:
+        best = max(candidates, key=lambda candidate: _iou(box, candidate))
+        assert _iou(box, best) >= 0.9
+        assert abs(box[4] - best[4]) < 0.05
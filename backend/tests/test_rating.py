@@ -0,0 +1,53 @@
+import math
+import pytest
+
+pytest.importorskip('firebase_admin')
+
+from padel_iq import rating
+from padel_iq.utils import combinar_padel_iq, nivel_jugador
+
+SESSIONS = [
+    ({'total_golpes': 20, 'tecnica': 50.0, 'ritmo': 40.0, 'fuerza': 30.0, 'repeticion': 4.0, 'padel_iq': 50.0}, 'juego'),
+    ({'total_golpes': 10, 'tecnica': 70.0, 'ritmo': 20.0, 'fuerza': 60.0, 'repeticion': 8.0, 'padel_iq': 62.0}, 'juego'),
+    ({'total_golpes': 40, 'tecnica': 30.0, 'ritmo': 80.0, 'fuerza': 10.0, 'repeticion': 1.0, 'padel_iq': 45.0}, 'entrenamiento'),
+    ({'total_golpes': 25, 'tecnica': 90.0, 'ritmo': 55.0, 'fuerza': 45.0, 'repeticion': 6.0, 'padel_iq': 80.0}, 'juego'),
+]
+
+def _batch(sessions, decay):
+    """Mismo rating recalculado desde todo el historial: la referencia de la actualización incremental."""
+    n = len(sessions)
+    weights = [rating.session_weight(metricas, tipo) * decay ** (n - 1 - i) for i, (metricas, tipo) in enumerate(sessions)]
+    total = sum(weights)
+    means = {metric: sum(w * metricas[metric] for w, (metricas, _) in zip(weights, sessions)) / total
+             for metric in rating.METRICS}
+    iq_mean = sum(w * metricas['padel_iq'] for w, (metricas, _) in zip(weights, sessions)) / total
+    variance = sum(w * (metricas['padel_iq'] - iq_mean) ** 2 for w, (metricas, _) in zip(weights, sessions)) / total
+    effective_sessions = total ** 2 / sum(w ** 2 for w in weights)
+    return means, iq_mean, math.sqrt((variance + rating.PRIOR_STD ** 2) / effective_sessions)
+
+def test_incremental_update_matches_full_history():
+    state = None
+    for i, (metricas, tipo) in enumerate(SESSIONS):
+        state = rating.update_rating(state, metricas, tipo, session_id=f's{i}', decay=0.8)
+        means, iq_mean, uncertainty = _batch(SESSIONS[:i + 1], 0.8)
+        assert state['means'] == pytest.approx(means)
+        assert state['padel_iq_mean'] == pytest.approx(iq_mean)
+        assert state['uncertainty'] == pytest.approx(uncertainty)
+        padel_iq = combinar_padel_iq(means['tecnica'], means['ritmo'], means['fuerza'], means['repeticion'])
+        assert state['padel_iq'] == pytest.approx(padel_iq)
+        assert state['player_level'] == nivel_jugador(padel_iq)
+    assert state['sessions'] == len(SESSIONS)
+
+def test_repeated_and_empty_sessions_leave_the_state_unchanged():
+    metricas, tipo = SESSIONS[0]
+    state = rating.update_rating(None, metricas, tipo, session_id='s0')
+    assert rating.update_rating(state, SESSIONS[1][0], 'juego', session_id='s0') is state
+    assert rating.update_rating(state, dict(metricas, total_golpes=0), tipo, session_id='s1') is state
+    assert rating.update_rating(None, dict(metricas, total_golpes=0), tipo) is None
+
+def test_state_without_repeticion_starts_its_mean_from_the_next_session():
+    metricas, tipo = SESSIONS[0]
+    state = rating.update_rating(None, metricas, tipo)
+    del state['means']['repeticion']
+    state = rating.update_rating(state, SESSIONS[1][0], 'juego')
+    assert state['means']['repeticion'] == SESSIONS[1][0]['repeticion']
@@ -0,0 +1,31 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from padel_iq.trajectory_store import TrajectoryStore
+
+def _point(t, player_position):
+    return {'time': t, 'position': (t, 2 * t), 'bbox': (0, 0, 10, 20), 'side': 'izquierda', 'zone': 'fondo',
+            'player_position': player_position}
+
+def test_concurrent_reads_share_the_chunk_cache(tmp_path):
+    # Bloques pequeños y caché de dos bloques: los hilos se desalojan entradas continuamente
+    store = TrajectoryStore(str(tmp_path / 'trajectories.bin'), flush_size=16, cache_chunks=2)
+    for track_id in range(4):
+        store[track_id] = []
+    for step in range(400):
+        store[step % 4].append(_point(step / 10, step % 4 + 1))
+    store.flush()
+    windows = [(track_id, start / 2, start / 2 + 3.0) for track_id in range(4) for start in range(60)]
+    expected = [store[track_id].between(lo, hi) for track_id, lo, hi in windows]
+
+    # Cambios de hilo muy frecuentes para que los accesos a la caché se intercalen
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for _ in range(20):
+                results = list(pool.map(lambda window: store[window[0]].between(window[1], window[2]), windows))
+                assert results == expected
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert len(store._cache) <= store.cache_chunks
@@ -0,0 +1,82 @@
+import os
+import cv2
+import numpy as np
+
+from padel_iq import court_region, scene_index, video_proxy
+
+FPS = 10
+
+def _write_video(path, seconds=6):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (320, 240))
+    for index in range(FPS * seconds):
+        frame = np.full((240, 320, 3), (60, 140, 60), dtype=np.uint8)
+        # Cambio de escena a mitad del video
+        if index >= FPS * seconds // 2:
+            frame[:] = (150, 60, 40)
+        cv2.circle(frame, (20 + 4 * index, 180), 10, (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+def test_scene_index_reused_across_proxy_cache_hits(tmp_path):
+    source = str(tmp_path / 'source.mp4')
+    _write_video(source)
+    cache_dir = str(tmp_path / 'proxies')
+
+    proxy = video_proxy.ensure_proxy(source, width=320, height=240, cache_dir=cache_dir)
+    index = scene_index.get_scene_index(proxy, sample_fps=2.0)
+    assert index is not None
+    mtime_ns = os.stat(proxy).st_mtime_ns
+
+    # El segundo análisis reutiliza el proxy: el índice sigue siendo válido
+    assert video_proxy.ensure_proxy(source, width=320, height=240, cache_dir=cache_dir) == proxy
+    assert os.stat(proxy).st_mtime_ns == mtime_ns
+    assert scene_index.load_scene_index(proxy, 2.0) == index
+
+    # La huella depende del contenido, no de la fecha de modificación
+    os.utime(proxy, ns=(mtime_ns, mtime_ns + 10 ** 9))
+    assert scene_index.load_scene_index(proxy, 2.0) == index
+
+def test_scene_index_invalidated_when_content_changes(tmp_path):
+    video = str(tmp_path / 'video.mp4')
+    _write_video(video)
+    index = scene_index.get_scene_index(video, sample_fps=2.0)
+    assert scene_index.load_scene_index(video, 2.0) == index
+
+    _write_video(video, seconds=8)
+    assert scene_index.load_scene_index(video, 2.0) is None
+
+def test_court_calibration_reused_across_proxy_cache_hits(tmp_path, monkeypatch):
+    source = str(tmp_path / 'source.mp4')
+    _write_video(source)
+    cache_dir = str(tmp_path / 'proxies')
+    calibrations = []
+    polygon = np.array([[40, 80], [280, 80], [310, 230], [10, 230]])
+    monkeypatch.setattr(court_region, 'calibrate_court', lambda *args: calibrations.append(args) or polygon)
+
+    for _ in range(2):
+        proxy = video_proxy.ensure_proxy(source, width=320, height=240, cache_dir=cache_dir)
+        region = court_region.get_court_region(proxy, {})
+        np.testing.assert_array_equal(region.polygon, polygon)
+        # La calibración depende del contenido, no de la fecha de modificación
+        stat = os.stat(proxy)
+        os.utime(proxy, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert len(calibrations) == 1
+
+def test_prune_removes_sidecars_with_their_proxy(tmp_path):
+    cache_dir = tmp_path / 'proxies'
+    cache_dir.mkdir()
+    old, new = str(cache_dir / 'old.mp4'), str(cache_dir / 'new.mp4')
+    for i, path in enumerate((old, new)):
+        with open(path, 'wb') as f:
+            f.write(b'\0' * 1000)
+        for sidecar in (scene_index.index_path(path), court_region.court_cache_path(path)):
+            with open(sidecar, 'w') as f:
+                f.write('{}')
+        os.utime(path, (1000 + i, 1000 + i))
+    for suffix in (scene_index.SCENE_INDEX_SUFFIX, court_region.COURT_SUFFIX):
+        with open(str(cache_dir / 'gone.mp4') + suffix, 'w') as f:
+            f.write('{}')
+
+    video_proxy.prune_cache(str(cache_dir), max_bytes=1500)
+    assert sorted(os.listdir(cache_dir)) == sorted(['new.mp4', 'new.mp4' + scene_index.SCENE_INDEX_SUFFIX,
+                                                    'new.mp4' + court_region.COURT_SUFFIX])